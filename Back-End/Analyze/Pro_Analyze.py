@@ -1,9 +1,11 @@
-from typing import Dict, Literal
+from typing import Dict, Literal, Optional
 from google.genai import types
 from pydantic import BaseModel
 from env import gemini_client, supabase
+from analyzer_pool import Analyzer, fetch_all_rows, fetch_rows_by_ids, run_analyzer
 import uuid
 import time
+import threading
 from postgrest.exceptions import APIError
 
 
@@ -53,14 +55,15 @@ category_description = {
 }
 
 
-def Pro_Analyze(story_id: str, categories: list[str]):
-    # 主文章
-    article = supabase.table("single_news").select("long").eq("story_id", story_id).execute()
-    article_content = article.data[0]["long"]
+# 每個類別的 base 知識庫（同一次執行中所有 story 共用，只查詢一次）
+_bases_cache: Dict[str, list] = {}
+_bases_lock = threading.Lock()
 
-    # 每個類別的 base 知識庫
-    bases = {}
-    for category in categories:
+
+def get_category_base(category: str) -> list:
+    with _bases_lock:
+        if category in _bases_cache:
+            return _bases_cache[category]
         try:
             builder = supabase.table("single_news") \
                 .select("story_id,news_title,short,category,generated_date") \
@@ -68,10 +71,21 @@ def Pro_Analyze(story_id: str, categories: list[str]):
                 .order("generated_date")
             response = execute_builder_with_retry(builder)
             data_rows = getattr(response, 'data', []) or []
-            bases[category] = [{"news_title": item.get("news_title", ""), "short": item.get("short", "")} for item in data_rows]
+            _bases_cache[category] = [{"news_title": item.get("news_title", ""), "short": item.get("short", "")} for item in data_rows]
         except Exception as e:
+            # 失敗時不快取，讓下一個 story 重試
             print(f"[error] Failed to fetch base knowledge for category {category}: {e}")
-            bases[category] = []
+            return []
+        return _bases_cache[category]
+
+
+def Pro_Analyze(story_id: str, categories: list[str], article_content: Optional[str] = None):
+    # 主文章（批次已讀取時直接使用）
+    if article_content is None:
+        article = supabase.table("single_news").select("long").eq("story_id", story_id).execute()
+        article_content = article.data[0]["long"]
+
+    bases = {category: get_category_base(category) for category in categories}
 
     system_instruction = f"""
     你將同時揣摩三個類別中最適合對文章進行分析的專家角色，
@@ -121,80 +135,54 @@ def Pro_Analyze(story_id: str, categories: list[str]):
     return dict(pro_analyze.parsed)
 
 
-all_require = []
-batch_size = 1000
-start = 0
+class ProAnalyzeAnalyzer(Analyzer):
+    name = "pro_analyze"
+    model_name = "gemini-2.5-flash-lite"
 
-while True:
-    temp = supabase.table("single_news").select("story_id,who_talk,position_flag").order("generated_date", desc=True).range(start, start + batch_size - 1).execute()
-    if not temp.data:
+    def fetch_pending(self):
+        all_require = fetch_all_rows(lambda: supabase.table("single_news").select("story_id,who_talk,position_flag").order("generated_date", desc=True))
         print(len(all_require))
-        break
-    all_require.extend(temp.data)
-    start += batch_size
-
-# temp = supabase.table("single_news").select("story_id,who_talk,position_flag").range(0, 999).execute()
-# all_require.extend(temp.data)
-
-require = type("Result", (), {"data": all_require})  # 模擬原本 require 結構
-
-all_data = []
-batch_size = 1000
-start = 0
-
-while True:
-    temp = supabase.table("pro_analyze").select("story_id").range(start, start + batch_size - 1).execute()
-    if not temp.data:
-        break
-    all_data.extend([row["story_id"] for row in temp.data])
-    start += batch_size
-
-# # 去重
-constraints = list(set(all_data))
-# for item in require.data:
-#     if item["story_id"] in constraints:
-#         continue
-#     if not item["position_flag"]:
-#         story_id = item["story_id"]
-#         who_talk = item["who_talk"]
-#         for category in who_talk["who_talk"]:
-#             result = Pro_Analyze(story_id,category)
-#             supabase.table("pro_analyze").insert({"analyze_id": str(uuid.uuid4()),"story_id": story_id, "category": category, "analyze": result["pro_analyze"]}).execute()
-#             print(f"Inserted pro_analyze for story_id {story_id} and category {category}")
-#     else:
-#         print(f"story_id {item['story_id']} already has position_flag {item['position_flag']}")
-        
-# print("All done.")
-
-for idx, item in enumerate(require.data):
-    if item["story_id"] in constraints:
-        continue
-    if item["who_talk"]:
-        story_id = item["story_id"]
-        who_talk = item["who_talk"]
-        results = Pro_Analyze(story_id, who_talk["who_talk"])
-
-        print(f"Index: {idx}, Story ID: {story_id}")
+
+        # 去重
+        constraints = set(row["story_id"] for row in fetch_all_rows(lambda: supabase.table("pro_analyze").select("story_id")))
+        pending = {item["story_id"]: item for item in all_require if item["story_id"] not in constraints and item["who_talk"]}
+
+        # 同批讀取主文章，分析時不再逐篇查詢
+        long_rows = fetch_rows_by_ids(supabase, "single_news", "story_id,long", list(pending))
+        return [{**pending[r["story_id"]], "long": r.get("long")} for r in long_rows]
+
+    def analyze(self, row):
+        story_id = row["story_id"]
+        results = Pro_Analyze(story_id, row["who_talk"]["who_talk"], article_content=row.get("long"))
         if not results or "analyze" not in results:
             print(f"跳過 story_id {story_id}，Pro_Analyze 未回傳有效結果")
-            continue
+            return None
+        return results
 
+    def save(self, row, results):
+        story_id = row["story_id"]
         #{'analyze': [AnalyzeItem(Category='Taiwan News', Role='結構工程技師', Analyze='該事故可能促使台灣重新檢視橋樑工程的安全標準與監管機制，避免類似事件發生，並提升公共工程品質。'), AnalyzeItem(Category='International News', Role='國際勞工安全專家', Analyze='事件突顯中國在基礎建設快速擴張下，可能存在勞工安全保障不足的問題，國際社會或將更關注中國工安標準。'), AnalyzeItem(Category='Business & Finance', Role='營建產業分析師', Analyze='或將促使在中國營運的台商重新評估其投資風險與供應鏈韌性，並可能影響相關產業的保險成本。')]}
-        for result in results["analyze"]:
-            builder = supabase.table("pro_analyze").insert({
-                "analyze_id": str(uuid.uuid4()),
-                "story_id": story_id,
-                "category": result.Category,
-                "analyze": (result.model_dump())
-            })
-            try:
-                resp = execute_builder_with_retry(builder)
-                if getattr(resp, 'error', None):
-                    print(f"寫入 pro_analyze 發生錯誤: {resp.error}")
-            except Exception as e:
-                print(f"[error] Failed to insert pro_analyze for story_id {story_id}, category {result.Category}: {e}")
-                continue
-        print(f"Inserted pro_analyze for story_id {story_id} and categories {who_talk['who_talk']}")
-        time.sleep(5)
-        # break
+        rows = [{
+            "analyze_id": str(uuid.uuid4()),
+            "story_id": story_id,
+            "category": result.Category,
+            "analyze": (result.model_dump())
+        } for result in results["analyze"]]
+        if not rows:
+            return False
+
+        # 所有類別一次寫入
+        builder = supabase.table("pro_analyze").insert(rows)
+        try:
+            resp = execute_builder_with_retry(builder)
+            if getattr(resp, 'error', None):
+                print(f"寫入 pro_analyze 發生錯誤: {resp.error}")
+                return False
+        except Exception as e:
+            print(f"[error] Failed to insert pro_analyze for story_id {story_id}: {e}")
+            return False
+        print(f"Inserted pro_analyze for story_id {story_id} and categories {row['who_talk']['who_talk']}")
+        return True
 
+if __name__ == "__main__":
+    run_analyzer(ProAnalyzeAnalyzer())
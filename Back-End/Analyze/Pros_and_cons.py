@@ -2,9 +2,9 @@ import os
 import json
 import uuid
 import argparse
-import time
 from dotenv import load_dotenv
 from supabase import create_client
+from analyzer_pool import Analyzer, fetch_all_rows, run_analyzer
 
 print("開始執行腳本...")
 
@@ -45,85 +45,6 @@ except Exception as e:
     types = None
     
     
-# CLI 參數（預設處理全部；若在執行指令後加數字，則處理該數量）
-parser = argparse.ArgumentParser(description="新聞正反方分析（預設處理全部；可於後面加數字指定篇數）")
-parser.add_argument("count", nargs="?", type=int, default=None, help="若提供數字，處理該篇數；否則預設處理全部")
-parser.add_argument("--limit", type=int, default=None, help="處理上限筆數（與位置參數二擇一，位置參數優先）")
-parser.add_argument("--delay", type=float, default=0.6, help="每則新聞呼叫 API 後等待秒數（預設0.6）")
-parser.add_argument("--no-save", action="store_true", help="僅產生結果不寫入資料庫")
-parser.add_argument("--story-id", type=str, help="指定要處理的 story_id")
-args = parser.parse_args()
-
-# 查詢 position_flag 為 true 的新聞
-try:
-    # 僅查詢 position_flag 為 true 的資料，並取得 story_id, news_title, long 與 category 欄位
-    resp = []
-    batch_size = 1000
-    start = 0
-    
-    print("開始批次查詢 position 表...")
-    while True:
-        temp = supabase.table("single_news").select("story_id, news_title, long, category, position_flag").eq("position_flag", True).range(start, start + batch_size - 1).execute()
-        if not temp.data:
-            break
-        resp.extend(temp.data)
-        start += batch_size
-        print(f"  已查詢 {len(resp)} 筆記錄...")
-except Exception as e:
-    print("查詢 single_news 時發生錯誤:", e)
-    raise SystemExit(1)
-
-if getattr(resp, "error", None):
-    print("查詢錯誤:", resp.error)
-    raise SystemExit(1)
-
-rows = resp or []
-print(f"找到 position_flag 為 true 的新聞筆數: {len(rows)}")
-
-# 查詢已經存在於 position 表中的 story_id（使用批次查詢）
-try:
-    all_require = []
-    batch_size = 1000
-    start = 0
-    
-    print("開始批次查詢 position 表...")
-    while True:
-        temp = supabase.table("position").select("story_id").range(start, start + batch_size - 1).execute()
-        if not temp.data:
-            break
-        all_require.extend(temp.data)
-        start += batch_size
-        print(f"  已查詢 {len(all_require)} 筆記錄...")
-    
-    existing_story_ids = set(row["story_id"] for row in all_require)
-    print(f"已在 position 表中的新聞筆數: {len(existing_story_ids)}")
-except Exception as e:
-    print("查詢 position 表時發生錯誤:", e)
-    existing_story_ids = set()
-
-# 過濾掉已經在 position 表中的新聞
-rows = [row for row in rows if row.get("story_id") not in existing_story_ids]
-print(f"過濾後待處理的新聞筆數: {len(rows)}")
-
-# 根據 --story-id 篩選資料
-if args.story_id:
-    test_rows = [row for row in rows if row.get("story_id") == args.story_id]
-    if not test_rows:
-        print(f"❌ 找不到指定的 story_id: {args.story_id}")
-        raise SystemExit(1)
-    print(f"將處理指定的 story_id: {args.story_id}")
-else:
-    # 決定要處理的筆數（預設全部；若提供位置參數 count 或 --limit，則以該數為準）
-    if args.count is not None:
-        test_rows = rows[: args.count]
-    elif args.limit is not None:
-        test_rows = rows[: args.limit]
-    else:
-        test_rows = rows[:]  # 預設全部
-
-print(f"執行設定: count={args.count}, limit={args.limit}, delay={args.delay}, no_save={args.no_save}")
-print(f"將處理 {len(test_rows)} 筆新聞")
-
 def analyze_pro_con_with_gemini(text: str, news_title: str = None):
     """
     將文章內容送給 Gemini，要求回傳 JSON 格式的正方/反方立場：
@@ -330,43 +251,106 @@ def pretty_print_analysis(analysis_result, story_id):
         print("📄 **分析結果：**")
         print(json.dumps(analysis_result, ensure_ascii=False, indent=2))
 
-# 主流程
-if test_rows:
-    print(f"\n\n🔍 開始分析 {len(test_rows)} 筆測試新聞...")
-    
-    successful_saves = 0
-    failed_saves = 0
-    
-    for i, r in enumerate(test_rows, 1):
-        sid = r.get("story_id")
-        title = r.get("news_title")
-        category = r.get("category")
-        long_text = r.get("long") or ""
-        
-        print(f"\n📊 進度: {i}/{len(test_rows)} - 類別: {category}")
-        
-        # 分析新聞
-        result = analyze_pro_con_with_gemini(long_text, news_title=title)
-        
+def parse_args():
+    # CLI 參數（預設處理全部；若在執行指令後加數字，則處理該數量）
+    parser = argparse.ArgumentParser(description="新聞正反方分析（預設處理全部；可於後面加數字指定篇數）")
+    parser.add_argument("count", nargs="?", type=int, default=None, help="若提供數字，處理該篇數；否則預設處理全部")
+    parser.add_argument("--limit", type=int, default=None, help="處理上限筆數（與位置參數二擇一，位置參數優先）")
+    parser.add_argument("--delay", type=float, default=0.6, help="API 呼叫平均間隔秒數（預設0.6，換算為所有 worker 共用的每分鐘上限）")
+    parser.add_argument("--workers", type=int, default=None, help="同時處理的新聞數（預設 ANALYZE_MAX_WORKERS）")
+    parser.add_argument("--no-save", action="store_true", help="僅產生結果不寫入資料庫")
+    parser.add_argument("--story-id", type=str, help="指定要處理的 story_id")
+    return parser.parse_args()
+
+
+class ProsAndConsAnalyzer(Analyzer):
+    name = "pros_and_cons"
+    model_name = "gemini-2.5-flash"
+
+    def __init__(self, args):
+        self.args = args
+
+    def fetch_pending(self):
+        args = self.args
+
+        # 查詢 position_flag 為 true 的新聞
+        try:
+            # 僅查詢 position_flag 為 true 的資料，並取得 story_id, news_title, long 與 category 欄位
+            print("開始批次查詢 single_news 表...")
+            rows = fetch_all_rows(lambda: supabase.table("single_news").select("story_id, news_title, long, category, position_flag").eq("position_flag", True))
+        except Exception as e:
+            print("查詢 single_news 時發生錯誤:", e)
+            raise SystemExit(1)
+
+        print(f"找到 position_flag 為 true 的新聞筆數: {len(rows)}")
+
+        # 查詢已經存在於 position 表中的 story_id（使用批次查詢）
+        try:
+            print("開始批次查詢 position 表...")
+            all_require = fetch_all_rows(lambda: supabase.table("position").select("story_id"))
+            existing_story_ids = set(row["story_id"] for row in all_require)
+            print(f"已在 position 表中的新聞筆數: {len(existing_story_ids)}")
+        except Exception as e:
+            print("查詢 position 表時發生錯誤:", e)
+            existing_story_ids = set()
+
+        # 過濾掉已經在 position 表中的新聞
+        rows = [row for row in rows if row.get("story_id") not in existing_story_ids]
+        print(f"過濾後待處理的新聞筆數: {len(rows)}")
+
+        # 根據 --story-id 篩選資料
+        if args.story_id:
+            test_rows = [row for row in rows if row.get("story_id") == args.story_id]
+            if not test_rows:
+                print(f"❌ 找不到指定的 story_id: {args.story_id}")
+                raise SystemExit(1)
+            print(f"將處理指定的 story_id: {args.story_id}")
+        else:
+            # 決定要處理的筆數（預設全部；若提供位置參數 count 或 --limit，則以該數為準）
+            if args.count is not None:
+                test_rows = rows[: args.count]
+            elif args.limit is not None:
+                test_rows = rows[: args.limit]
+            else:
+                test_rows = rows[:]  # 預設全部
+
+        print(f"執行設定: count={args.count}, limit={args.limit}, delay={args.delay}, workers={args.workers}, no_save={args.no_save}")
+        print(f"將處理 {len(test_rows)} 筆新聞")
+        return test_rows
+
+    def analyze(self, row):
+        print(f"\n📊 分析 story_id: {row.get('story_id')} - 類別: {row.get('category')}")
+        result = analyze_pro_con_with_gemini(row.get("long") or "", news_title=row.get("news_title"))
+
         # 顯示分析結果
-        pretty_print_analysis(result, sid)
-        
+        pretty_print_analysis(result, row.get("story_id"))
+        return result
+
+    def save(self, row, result):
         # 存入資料庫（除非 --no-save）
-        if not args.no_save:
-            if save_to_database(result, sid):
-                successful_saves += 1
-            else:
-                failed_saves += 1
-        else:
+        if self.args.no_save:
             print("（dry-run 模式，未寫入資料庫）")
-        
-        # 等待（避免呼太快）
-        time.sleep(args.delay)
-    
-    print("\n✅ 分析完成！")
-    print("📊 統計結果:")
-    print(f"   - 共處理: {len(test_rows)} 筆新聞")
-    print(f"   - 成功存入: {successful_saves} 筆")
-    print(f"   - 存入失敗: {failed_saves} 筆")
-else:
-    print("❌ 沒有找到符合條件的新聞資料。")
\ No newline at end of file
+            return True
+        return save_to_database(result, row.get("story_id"))
+
+
+# 主流程
+if __name__ == "__main__":
+    args = parse_args()
+    analyzer = ProsAndConsAnalyzer(args)
+    test_rows = analyzer.fetch_pending()
+
+    if test_rows:
+        print(f"\n\n🔍 開始分析 {len(test_rows)} 筆測試新聞...")
+
+        # --delay 為所有 worker 共用的最小呼叫間隔
+        rpm = max(1, int(60 / args.delay)) if args.delay > 0 else None
+        stats = run_analyzer(analyzer, max_workers=args.workers, rpm=rpm, rows=test_rows)
+
+        print("\n✅ 分析完成！")
+        print("📊 統計結果:")
+        print(f"   - 共處理: {stats['total']} 筆新聞")
+        print(f"   - 成功存入: {stats['saved']} 筆")
+        print(f"   - 存入失敗: {stats['failed'] + stats['skipped']} 筆")
+    else:
+        print("❌ 沒有找到符合條件的新聞資料。")
@@ -0,0 +1,176 @@
+"""
+合併分析：以一次 Gemini 呼叫同時產生 position_flag、who_talk、suicide_flag 與分類關鍵字，
+並以一次 single_news update 寫回。
+
+未通過驗證的欄位不寫入（維持 null），交由排程中後續的
+Position_flag.py / Who_talk.py / Suicide_flag.py / generate_categories_from_single_news.py 補齊。
+"""
+
+import re
+import threading
+from collections import defaultdict
+from typing import Literal, Optional
+from google.genai import types
+from pydantic import BaseModel
+from env import gemini_client, supabase
+from analyzer_pool import Analyzer, fetch_all_rows, fetch_rows_by_ids, run_analyzer
+from Suicide_flag import SYSTEM_INSTRUCTION as SUICIDE_FULL_INSTRUCTION
+# 只有 categories 需要判斷立場，categories2 直接設為 FALSE（與 Position_flag.py 相同規則）
+from Position_flag import categories as POSITION_CATEGORIES, categories2 as NON_POSITION_CATEGORIES
+
+KEYWORD_TARGET = 3
+# 沿用 Suicide_flag.py 的判斷標準，但不含其單欄位輸出規則
+SUICIDE_INSTRUCTION = SUICIDE_FULL_INSTRUCTION.split("# 輸出規則")[0].strip()
+
+ExpertCategory = Literal[
+    "Politics",
+    "International News",
+    "Science & Technology",
+    "Lifestyle & Consumer",
+    "Sports",
+    "Entertainment",
+    "Business & Finance",
+    "Health & Wellness",
+]
+
+def needs_position_flag(row) -> bool:
+    """position_flag 尚未填入且類別屬於 Position_flag.py 會處理的範圍（其他類別如 Taiwan News 不寫 position_flag）"""
+    return row["position_flag"] is None and row.get("category") in (*POSITION_CATEGORIES, *NON_POSITION_CATEGORIES)
+
+class StoryAnalysisResponse(BaseModel):
+    position_flag: bool
+    who_talk: list[ExpertCategory]
+    suicide_flag: bool
+    keywords: list[str]
+
+SYSTEM_INSTRUCTION = f"""
+你是新聞分析助理，請閱讀新聞內文並一次完成以下四項判斷，依 JSON Schema 回傳。
+
+## position_flag
+判斷該新聞是否有正反兩方討論的空間，是篇能夠產生兩極對立衝突的新聞，若有請回傳 true，若沒有請回傳 false。
+
+## who_talk
+決定接下來出場的類別專家，一定要選擇 3 個不同類別，且只能從以下 8 個類別中選擇：
+1. Politics（政治） - 包含政府政策、選舉、外交、政黨動態等。
+2. International News（國際） - 重大國際事件、地緣政治、國際組織相關新聞。
+3. Science & Technology（科學與科技） - 包含科學研究、太空探索、生物科技、AI、大數據、半導體、電子產品、電玩遊戲、網安等科技發展。
+4. Lifestyle & Consumer（生活） - 旅遊、時尚、飲食、消費趨勢等。
+5. Sports（體育） - 體育賽事、運動員動態、奧運、世界盃等。
+6. Entertainment（娛樂） - 電影、音樂、藝人新聞、流行文化等。
+7. Business & Finance（商業財經） - 經濟政策、股市、企業動態、投資市場等。
+8. Health & Wellness（健康） - 公共衛生、醫學研究、醫療技術等。
+
+## suicide_flag
+依照以下自殺報導審核準則判斷：
+{SUICIDE_INSTRUCTION}
+
+## keywords
+提出恰好 {KEYWORD_TARGET} 個最適合的分類標籤，為中文簡短詞（例如：科技、人工智慧、政治、財經、社會），不要超過四個字。
+"""
+
+def analyze_story(long_content: str) -> Optional[StoryAnalysisResponse]:
+    """以一次呼叫取得所有 per-story 欄位，失敗回傳 None"""
+    try:
+        response = gemini_client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=f"# 新聞內文：\n---\n{long_content}\n---",
+            config=types.GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                response_mime_type="application/json",
+                response_schema=StoryAnalysisResponse,
+                temperature=0.0,
+            ),
+        )
+        return response.parsed
+    except Exception as e:
+        print(f"[error] Gemini 合併分析失敗: {e}")
+        return None
+
+def clean_keywords(labels: list[str], needed_count: int, existing: set) -> list[str]:
+    """與 generate_categories_from_single_news.py 相同的清理規則，排除該新聞已有的關鍵字，不足數量時回傳空列表"""
+    cleaned = []
+    for label in labels:
+        label = re.sub(r"[^\u4e00-\u9fff\w\s]", '', label or '').strip()
+        if label and label not in cleaned and label not in existing:
+            cleaned.append(label)
+    return cleaned[:needed_count] if len(cleaned) >= needed_count else []
+
+class StoryAnalyzer(Analyzer):
+    name = "story_analysis"
+    model_name = "gemini-2.5-flash"
+
+    def __init__(self):
+        self.story_keywords = defaultdict(set)
+        self.existing_keywords = set()
+        self._keyword_lock = threading.Lock()
+
+    def fetch_pending(self):
+        rows = fetch_all_rows(lambda: supabase.table("single_news").select("story_id,category,position_flag,who_talk,suicide_flag").order("generated_date", desc=True))
+
+        for item in fetch_all_rows(lambda: supabase.table("keywords_map").select("story_id, keyword")):
+            if item.get("story_id") and item.get("keyword"):
+                self.story_keywords[item["story_id"]].add(item["keyword"])
+        self.existing_keywords = {item["keyword"] for item in fetch_all_rows(lambda: supabase.table("keywords").select("keyword")) if item.get("keyword")}
+
+        pending = {}
+        for item in rows:
+            if (needs_position_flag(item) or not item["who_talk"] or item["suicide_flag"] is None
+                    or len(self.story_keywords[item["story_id"]]) < KEYWORD_TARGET):
+                pending[item["story_id"]] = item
+        print(f"待合併分析的新聞筆數: {len(pending)}")
+
+        # 只為待處理的新聞讀取 long
+        long_rows = fetch_rows_by_ids(supabase, "single_news", "story_id,long", list(pending))
+        return [{**pending[r["story_id"]], "long": r.get("long")} for r in long_rows if r.get("long")]
+
+    def analyze(self, row):
+        return analyze_story(row["long"])
+
+    def save(self, row, result: StoryAnalysisResponse):
+        story_id = row["story_id"]
+        update = {}
+
+        if needs_position_flag(row):
+            if row.get("category") in POSITION_CATEGORIES:
+                update["position_flag"] = result.position_flag
+            elif row.get("category") in NON_POSITION_CATEGORIES:
+                update["position_flag"] = "FALSE"
+
+        who_talk = list(dict.fromkeys(result.who_talk))
+        if not row["who_talk"]:
+            if len(who_talk) == 3:
+                update["who_talk"] = {"who_talk": who_talk}
+            else:
+                print(f"[warn] story_id {story_id} who_talk 不是 3 個不同類別，留待 Who_talk.py 補齊: {who_talk}")
+
+        if row["suicide_flag"] is None:
+            update["suicide_flag"] = result.suicide_flag
+
+        if update:
+            supabase.table("single_news").update(update).eq("story_id", story_id).execute()
+            print(f"Updated story_id {story_id} with {update}")
+
+        needed = KEYWORD_TARGET - len(self.story_keywords[story_id])
+        if needed > 0:
+            labels = clean_keywords(result.keywords, needed, self.story_keywords[story_id])
+            if labels:
+                self.save_keywords(story_id, labels)
+            else:
+                print(f"[warn] story_id {story_id} 關鍵字數量不足，留待 generate_categories_from_single_news.py 補齊: {result.keywords}")
+        return True
+
+    def save_keywords(self, story_id: str, labels: list[str]):
+        with self._keyword_lock:
+            new_keywords = [kw for kw in labels if kw not in self.existing_keywords]
+            self.existing_keywords.update(new_keywords)
+        if new_keywords:
+            try:
+                supabase.table("keywords").insert([{"keyword": kw} for kw in new_keywords]).execute()
+            except Exception as e:
+                print(f"[warn] 插入關鍵字 {new_keywords} 失敗: {e}")
+        supabase.table("keywords_map").insert([{"story_id": story_id, "keyword": kw} for kw in labels]).execute()
+        print(f"Inserted keywords for story_id {story_id}: {labels}")
+
+if __name__ == "__main__":
+    run_analyzer(StoryAnalyzer())
+    print("All done.")
@@ -1,8 +1,8 @@
 import logging
-import time
 from pydantic import BaseModel
 from google.genai import types
 from env import supabase, gemini_client
+from analyzer_pool import Analyzer, fetch_all_rows, run_analyzer
 from typing import Optional
 
 # --- Pydantic Schema Definition ---
@@ -84,69 +84,47 @@ def check_suicide_flag(long_content: str) -> Optional[bool]:
         logger.error(f"失敗的內文 (前100字): {long_content[:100]}...")
         return None  # 如果 API 失敗，回傳 None，避免更新錯誤資料
 
-def process_batch():
-    """
-    批次處理資料庫中的新聞
-    """
-    batch_size = 100  # 每次處理 100 筆，可根據 API 限制調整
-    start = 0
-    total_processed = 0
+class SuicideFlagAnalyzer(Analyzer):
+    name = "suicide_flag"
+    model_name = "gemini-2.5-flash-lite"
+
+    def fetch_pending(self):
+        # 只拉取 suicide_flag 為 null 的資料
+        return fetch_all_rows(
+            lambda: supabase.table("single_news")
+            .select("story_id, long, suicide_flag")
+            .is_("suicide_flag", None),
+            batch_size=100,
+        )
 
-    while True:
-        logger.info(f"正在拉取資料... 批次從 {start} 到 {start + batch_size - 1}")
-        
+    def analyze(self, row):
+        # 使用 Gemini 判斷，失敗時回傳 None 以跳過更新
+        if not row.get("story_id"):
+            return None
+        logger.info(f"正在分析 Story ID: {row.get('story_id')}...")
+        return check_suicide_flag(row.get("long"))
+
+    def save(self, row, result):
+        story_id = row.get("story_id")
         try:
-            # 1. 批次查詢資料
-            temp_response = (
+            (
                 supabase.table("single_news")
-                .select("story_id, long, suicide_flag")
-                .is_("suicide_flag", None)  # 只拉取 suicide_flag 為 null 的資料
-                .range(start, start + batch_size - 1)
+                .update({"suicide_flag": result})
+                .eq("story_id", story_id)
                 .execute()
             )
+            logger.info(f"成功更新 Story ID: {story_id}, suicide_flag = {result}")
+            return True
+        except Exception as db_e:
+            logger.error(f"資料庫更新失敗 Story ID: {story_id}: {db_e}")
+            return False
 
-            if not temp_response.data:
-                logger.info("所有資料已處理完畢。")
-                break
-
-            logger.info(f"成功拉取 {len(temp_response.data)} 筆資料進行分析...")
-
-            for row in temp_response.data:
-                story_id = row.get("story_id")
-                long_content = row.get("long")
-
-                if not story_id:
-                    continue
-
-                # 2. 使用 Gemini 判斷
-                logger.info(f"正在分析 Story ID: {story_id}...")
-                flag_result = check_suicide_flag(long_content)
-
-                # 3. 存回資料庫
-                if flag_result is not None:  # 只有在 Gemini 成功回傳時才更新
-                    try:
-                        (
-                            supabase.table("single_news")
-                            .update({"suicide_flag": flag_result})
-                            .eq("story_id", story_id)
-                            .execute()
-                        )
-                        logger.info(f"成功更新 Story ID: {story_id}, suicide_flag = {flag_result}")
-                        total_processed += 1
-                    except Exception as db_e:
-                        logger.error(f"資料庫更新失敗 Story ID: {story_id}: {db_e}")
-                else:
-                    logger.warning(f"跳過更新 Story ID: {story_id} (因 Gemini 分析失敗)")
-                
-                time.sleep(1) # 每次 API 呼叫後暫停 1 秒，避免觸及速率限制
-
-            start += batch_size
-
-        except Exception as e:
-            logger.error(f"批次拉取或處理時發生錯誤: {e}")
-            time.sleep(10) # 如果發生錯誤，休息 10 秒後重試
-            
-    logger.info(f"批次任務完成，總共更新了 {total_processed} 筆資料。")
+def process_batch():
+    """
+    批次處理資料庫中的新聞
+    """
+    stats = run_analyzer(SuicideFlagAnalyzer())
+    logger.info(f"批次任務完成，總共更新了 {stats['saved']} 筆資料。")
 
 if __name__ == "__main__":
     logger.info("--- 開始執行自殺風險標記腳本 ---")
@@ -3,14 +3,17 @@ from google.genai.errors import ServerError
 from google.api_core.exceptions import ServiceUnavailable
 from pydantic import BaseModel
 from env import gemini_client, supabase
+from analyzer_pool import Analyzer, fetch_all_rows, fetch_rows_by_ids, run_analyzer
+from typing import Optional
 import time
 
 class InitChatResponse(BaseModel):
     who_talk: list[str]
 
-def who_talk(story_id: str, max_retries: int = 3, sleep_between: float = 2.0):
-    response = supabase.table("single_news").select("long").eq("story_id", story_id).execute()
-    article_content = response.data[0]["long"]
+def who_talk(story_id: str, max_retries: int = 3, sleep_between: float = 2.0, article_content: Optional[str] = None):
+    if article_content is None:
+        response = supabase.table("single_news").select("long").eq("story_id", story_id).execute()
+        article_content = response.data[0]["long"]
     model_name = "gemini-2.5-flash"
     
     for attempt in range(1, max_retries + 1):
@@ -44,29 +47,23 @@ def who_talk(story_id: str, max_retries: int = 3, sleep_between: float = 2.0):
     
     return None  # Should never reach here due to raise above
 
-all_require = []
-batch_size = 1000
-start = 0
-
-while True:
-    temp = supabase.table("single_news").select("story_id,who_talk,position_flag").order("generated_date", desc=True).range(start, start + batch_size - 1).execute()
-    if not temp.data:
-        break
-    all_require.extend(temp.data)
-    start += batch_size
+class WhoTalkAnalyzer(Analyzer):
+    name = "who_talk"
+    model_name = "gemini-2.5-flash"
 
-require = type("Result", (), {"data": all_require})  # 模擬原本 require 結構
+    def fetch_pending(self):
+        rows = fetch_all_rows(lambda: supabase.table("single_news").select("story_id,who_talk").order("generated_date", desc=True))
+        pending_ids = [item["story_id"] for item in rows if not item["who_talk"]]
+        return fetch_rows_by_ids(supabase, "single_news", "story_id,long", pending_ids)
 
-# ...existing code...
-for item in require.data:
-    if not item["who_talk"]:
-        story_id = item["story_id"]
-        result = who_talk(story_id)
-        supabase.table("single_news").update({"who_talk": result}).eq("story_id", story_id).execute()
-        print(f"Updated story_id {story_id} with who_talk {result['who_talk']}")
-    else:
-        print(f"story_id {item['story_id']} already has who_talk {item['who_talk']}")
-    #break
-print("All done.")
+    def analyze(self, row):
+        return who_talk(row["story_id"], article_content=row.get("long"))
 
+    def save(self, row, result):
+        supabase.table("single_news").update({"who_talk": result}).eq("story_id", row["story_id"]).execute()
+        print(f"Updated story_id {row['story_id']} with who_talk {result['who_talk']}")
+        return True
 
+if __name__ == "__main__":
+    run_analyzer(WhoTalkAnalyzer())
+    print("All done.")
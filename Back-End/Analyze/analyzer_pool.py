@@ -0,0 +1,153 @@
+"""
+分析器共用框架
+
+每個分析腳本只需實作三個部分：
+  1. fetch_pending：待處理資料來源（回傳 rows）
+  2. analyze：單筆分析（通常是一次 Gemini 呼叫），失敗回傳 None
+  3. save：結果寫入
+
+run_analyzer 以有上限的執行緒池並行執行，並透過依模型共用的速率限制器控制呼叫頻率，
+取代原本各腳本逐筆處理加固定 sleep 的做法。
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_MAX_WORKERS = int(os.getenv("ANALYZE_MAX_WORKERS", "4"))
+DEFAULT_RPM = int(os.getenv("GEMINI_RPM", "60"))  # 每分鐘最多呼叫次數（依配額調整）
+
+
+class RateLimiter:
+    """執行緒安全的滑動視窗速率限制器：每 period 秒最多 max_calls 次"""
+
+    def __init__(self, max_calls: int, period: float = 60.0):
+        self.max_calls = max(1, max_calls)
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, permits: int = 1):
+        """取得 permits 個呼叫額度，額度不足時阻塞等待"""
+        for _ in range(permits):
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    while self._calls and now - self._calls[0] >= self.period:
+                        self._calls.popleft()
+                    if len(self._calls) < self.max_calls:
+                        self._calls.append(now)
+                        break
+                    wait = self.period - (now - self._calls[0])
+                time.sleep(max(wait, 0.01))
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str, rpm: Optional[int] = None) -> RateLimiter:
+    """取得（或建立）指定模型共用的速率限制器，同一程序內所有分析器共用額度"""
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = RateLimiter(rpm or DEFAULT_RPM)
+        return _limiters[model_name]
+
+
+def fetch_all_rows(build_query: Callable[[], Any], batch_size: int = 1000) -> List[Dict]:
+    """以 range 分頁讀取查詢的所有資料（避免伺服器筆數上限截斷）"""
+    rows: List[Dict] = []
+    start = 0
+    while True:
+        temp = build_query().range(start, start + batch_size - 1).execute()
+        if not temp.data:
+            break
+        rows.extend(temp.data)
+        start += batch_size
+    return rows
+
+
+def fetch_rows_by_ids(client, table: str, columns: str, ids: List[str], id_column: str = "story_id",
+                      chunk_size: int = 200) -> List[Dict]:
+    """依 id 分段讀取指定欄位（只為待處理的 rows 讀取 long 等大型欄位），結果依 ids 順序排列"""
+    rows: List[Dict] = []
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        rows.extend(client.table(table).select(columns).in_(id_column, chunk).execute().data or [])
+    order = {row_id: idx for idx, row_id in enumerate(ids)}
+    rows.sort(key=lambda row: order.get(row.get(id_column), len(order)))
+    return rows
+
+
+class Analyzer:
+    """分析器外掛基底類別"""
+
+    name = "analyzer"
+    model_name = "gemini-2.5-flash-lite"
+    calls_per_row = 1  # 每筆分析會呼叫幾次模型（用於速率限制）
+
+    def fetch_pending(self) -> List[Dict]:
+        """回傳待處理的 rows"""
+        raise NotImplementedError
+
+    def analyze(self, row: Dict) -> Any:
+        """分析單筆資料，失敗回傳 None"""
+        raise NotImplementedError
+
+    def save(self, row: Dict, result: Any) -> bool:
+        """寫入單筆結果，回傳是否成功"""
+        raise NotImplementedError
+
+    def row_id(self, row: Dict) -> str:
+        return row.get("story_id", "")
+
+
+def run_analyzer(analyzer: Analyzer, max_workers: Optional[int] = None, rpm: Optional[int] = None,
+                 rows: Optional[List[Dict]] = None) -> Dict[str, int]:
+    """
+    以執行緒池執行分析器
+
+    Args:
+        analyzer: 分析器外掛
+        max_workers: 同時執行的最大工作數
+        rpm: 每分鐘呼叫上限（僅在該模型的限制器尚未建立時生效）
+        rows: 指定要處理的 rows，省略時使用 analyzer.fetch_pending()
+
+    Returns:
+        統計結果 {"total", "saved", "skipped", "failed"}
+    """
+    if rows is None:
+        rows = analyzer.fetch_pending()
+    stats = {"total": len(rows), "saved": 0, "skipped": 0, "failed": 0}
+    if not rows:
+        print(f"[{analyzer.name}] 沒有待處理的資料")
+        return stats
+
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    limiter = get_rate_limiter(analyzer.model_name, rpm)
+    print(f"[{analyzer.name}] 開始處理 {len(rows)} 筆資料（workers={max_workers}）")
+
+    def _work(row: Dict) -> str:
+        limiter.acquire(analyzer.calls_per_row)
+        result = analyzer.analyze(row)
+        if result is None:
+            return "skipped"
+        return "saved" if analyzer.save(row, result) else "failed"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_row = {executor.submit(_work, row): row for row in rows}
+        for done, future in enumerate(as_completed(future_to_row), 1):
+            row_id = analyzer.row_id(future_to_row[future])
+            try:
+                status = future.result()
+            except Exception as e:
+                print(f"[{analyzer.name}] ❌ {row_id} 處理時發生錯誤: {e}")
+                status = "failed"
+            stats[status] += 1
+            print(f"[{analyzer.name}] ({done}/{len(rows)}) {row_id}: {status}")
+
+    print(f"[{analyzer.name}] 完成：成功 {stats['saved']}、跳過 {stats['skipped']}、失敗 {stats['failed']}")
+    return stats
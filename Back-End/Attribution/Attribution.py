@@ -1,9 +1,15 @@
 import google.generativeai as genai
 import numpy as np
+import os
 import re
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Tuple
 from env import supabase, api_key
 
+# 添加父目錄到 Python 路徑，以便引用共用的 embedding_store
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_store import EmbeddingStore
+
 #相似度門檻
 SYSTEM_GOLDEN_THRESHOLD = 0.75
 # 使用的 Embedding 模型
@@ -31,6 +37,20 @@ def get_embeddings_batch(texts: List[str], task_type: str) -> List[List[float]]:
         print(f"批次取得 Embedding 失敗 (Task: {task_type}): {e}")
         return [[]] * len(texts)
 
+_stores: Dict[str, EmbeddingStore] = {}
+
+def get_embeddings_cached(texts: List[str], task_type: str) -> List[List[float]]:
+    """
+    與 get_embeddings_batch 相同，但先查詢本地 embedding 儲存庫，
+    只有從未 embed 過的段落才會呼叫 API。
+    """
+    if not texts:
+        return []
+    if task_type not in _stores:
+        _stores[task_type] = EmbeddingStore(EMBEDDING_MODEL, task_type)
+    vectors = _stores[task_type].get_or_embed(texts, lambda missing: get_embeddings_batch(missing, task_type))
+    return [v if v is not None else [] for v in vectors]
+
 def cosine_similarity(v1: List[float], v2: List[float]) -> float:
     """
     計算兩個 embedding 向量的餘弦相似度。
@@ -43,6 +63,49 @@ def cosine_similarity(v1: List[float], v2: List[float]) -> float:
         return 0.0
     return np.dot(v1_np, v2_np) / (norm_v1 * norm_v2)
 
+def to_normalized_matrix(embeddings: List[List[float]]) -> np.ndarray:
+    """
+    將 embedding 列表轉成已正規化的 float32 矩陣 (n, d)，
+    向量長度為 0 的列保持全 0（與任何向量的相似度皆為 0）。
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] == 0:
+        return np.zeros((len(embeddings), 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def match_sources(generated_matrix: np.ndarray, source_matrix: np.ndarray, source_keys: List[Tuple[str, str]],
+                  threshold: float = SYSTEM_GOLDEN_THRESHOLD) -> List[List[Tuple[str, str]]]:
+    """
+    以一次矩陣乘法計算所有 (整合區塊, 來源區塊) 的餘弦相似度，
+    套用門檻後依 (media, article_id) 去重，回傳每個整合區塊對應的來源列表。
+
+    Args:
+        generated_matrix: 已正規化的整合區塊矩陣 (g, d)
+        source_matrix: 已正規化的來源區塊矩陣 (s, d)
+        source_keys: 與 source_matrix 每列對齊的 (media, article_id)
+    """
+    if generated_matrix.shape[0] == 0:
+        return []
+    if source_matrix.shape[0] == 0:
+        return [[] for _ in range(generated_matrix.shape[0])]
+
+    # 來源區塊對應到唯一的 (media, article_id) 編號
+    unique_keys = list(dict.fromkeys(source_keys))
+    key_index = {key: i for i, key in enumerate(unique_keys)}
+    source_key_ids = np.fromiter((key_index[k] for k in source_keys), dtype=np.int64, count=len(source_keys))
+
+    similarities = generated_matrix @ source_matrix.T  # (g, s)
+    hits = similarities >= threshold
+
+    # (g, 唯一來源數) 的布林矩陣：任一區塊命中即視為引用該來源
+    matched = np.zeros((generated_matrix.shape[0], len(unique_keys)), dtype=bool)
+    rows, cols = np.nonzero(hits)
+    matched[rows, source_key_ids[cols]] = True
+
+    return [[unique_keys[j] for j in np.flatnonzero(row)] for row in matched]
+
 def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
     """
     接收一個 story_id，自動從 Supabase 抓取資料，
@@ -115,15 +178,15 @@ def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
 
     # --- 步驟 2: 向量化 (此步驟不變) ---
     print("步驟 2 開始：正在向量化...")
-    source_embeddings = get_embeddings_batch(source_texts_to_embed, "RETRIEVAL_DOCUMENT")
-    generated_embeddings = get_embeddings_batch(generated_texts_to_embed, "RETRIEVAL_QUERY")
+    source_embeddings = get_embeddings_cached(source_texts_to_embed, "RETRIEVAL_DOCUMENT")
+    generated_embeddings = get_embeddings_cached(generated_texts_to_embed, "RETRIEVAL_QUERY")
     
     for i, chunk in enumerate(source_chunks_db):
         chunk['embedding'] = source_embeddings[i]
     for i, chunk in enumerate(single_news_chunks_db):
         chunk['embedding'] = generated_embeddings[i]
         
-    source_chunks_db = [c for c in source_chunks_db if c.get('embedding')]
+    source_chunks_db = [c for c in source_chunks_db if len(c.get('embedding', [])) > 0]
     
     if not source_chunks_db:
         print("錯誤：所有來源區塊向量化失敗，任務中止。")
@@ -133,35 +196,23 @@ def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
 
     # --- 步驟 3 & 4: 比對 & 套用門檻 ---
     print(f"步驟 3/4 開始：使用門檻 {SYSTEM_GOLDEN_THRESHOLD} 進行比對...")
-    final_annotated_article = []
 
-    for gen_chunk in single_news_chunks_db:
-        gen_embedding = gen_chunk.get('embedding')
-        
-        if not gen_embedding:
-            final_annotated_article.append({
-                "generated_text": gen_chunk['text'],
-                "sources_data": [] # 回傳空列表
-            })
-            continue
+    # 向量化失敗的整合區塊以 0 向量表示，比對結果為空列表
+    dim = len(source_chunks_db[0]['embedding'])
+    generated_matrix = to_normalized_matrix([
+        chunk['embedding'] if len(chunk.get('embedding', [])) == dim else [0.0] * dim
+        for chunk in single_news_chunks_db
+    ])
+    source_matrix = to_normalized_matrix([chunk['embedding'] for chunk in source_chunks_db])
+    source_keys = [(chunk['media'], chunk['article_id']) for chunk in source_chunks_db]
 
-        # 【修改 3】使用一個列表來儲存 (media, article_id) 元組
-        matched_sources_tuples = []
-        
-        for source_chunk in source_chunks_db:
-            similarity = cosine_similarity(gen_embedding, source_chunk['embedding'])
-            
-            if similarity >= SYSTEM_GOLDEN_THRESHOLD:
-                # 儲存 (媒體名稱, 文章ID)
-                matched_sources_tuples.append(
-                    (source_chunk['media'], source_chunk['article_id'])
-                )
-        
-        # 使用 set() 來對元組 (tuple) 列表進行去重
-        # ('TVBS', 'id-A') 和 ('TVBS', 'id-B') 會被保留
-        # ('TVBS', 'id-A') 和 ('TVBS', 'id-A') 會被合併
-        unique_sources = list(set(matched_sources_tuples))
+    # 依 (media, article_id) 去重：
+    # ('TVBS', 'id-A') 和 ('TVBS', 'id-B') 會被保留
+    # ('TVBS', 'id-A') 和 ('TVBS', 'id-A') 會被合併
+    matched_sources = match_sources(generated_matrix, source_matrix, source_keys)
 
+    final_annotated_article = []
+    for gen_chunk, unique_sources in zip(single_news_chunks_db, matched_sources):
         # 整理結果
         final_annotated_article.append({
             "generated_text": gen_chunk['text'],
@@ -8,18 +8,84 @@ from google.genai import types
 class AttributionResponse(BaseModel):
     matching_chunk_ids: List[str]
 
+class ParagraphAttribution(BaseModel):
+    paragraph_id: str
+    matching_chunk_ids: List[str]
+
+class BatchAttributionResponse(BaseModel):
+    attributions: List[ParagraphAttribution]
+
 GENERATIVE_MODEL = "gemini-2.5-flash-lite" 
 
+# 單次請求最多分析的整合段落數（避免輸出過長）
+MAX_PARAGRAPHS_PER_REQUEST = 12
+# 單次請求的來源資料字數上限，超過時將來源切成多個分片
+MAX_SOURCE_CHARS_PER_REQUEST = 300000
+# 需要重複送出同一份來源資料時，使用 context cache 的存活時間
+SOURCE_CACHE_TTL = "600s"
+
+# 這是我們的「歸因提示」模板（逐段模式）
+USER_PROMPT_TEMPLATE = """
+【任務開始】
+
+**1. 原始來源區塊 (資料庫):**
+{source_context}
+
+**2. 待分析的整合段落:**
+{generated_paragraph}
+
+**3. 你的分析與歸因:**
+請嚴格按照你的核心原則，分析「待分析的整合段落」中的所有事實，並在「原始來源區塊」中找出所有支持這些事實的 `chunk_id`。
+
+**4. 輸出:**
+請僅回傳 JSON 物件。
+"""
+
+SYSTEM_INSTRUCTION = """
+你是一個嚴謹的新聞歸因（Attribution）專家。
+你的任務是逐一分析「待分析整合段落」中的**每一項事實主張 (claim)**，
+然後在「原始來源區塊」中，找出**所有**包含了該項主張的**具體證據**。
+
+**核心原則：**
+1.  **基於事實，而非主題：** 絕對不要因為兩個區塊都在談論「徐國勇」或「光復節」就進行匹配。匹配的唯一依據是「整合段落」中的**具體事實**（例如：「蔣萬安反問...」）是否**直接出現**在「來源區塊」中。
+2.  **接受轉述 (Paraphrasing)：** 整合段落可能是對來源的「改寫」或「總結」。例如，來源的「...賴清德是哪一國的總統？」和整合的「...反問總統賴清德的國籍...」是**有效匹配**。
+3.  **100% 嚴謹：** 如果一個來源區塊**沒有**包含整合段落中的任何具體事實，**絕對不能**將其列入。
+4.  **格式：** 永遠嚴格遵守使用者提供的 JSON 格式和 `response_schema`。
+"""
+
+# 批次模式：一次分析所有整合段落
+BATCH_USER_PROMPT_TEMPLATE = """
+【任務開始】
+
+**1. 待分析的整合段落:**
+{generated_paragraphs}
+
+**2. 你的分析與歸因:**
+請嚴格按照你的核心原則，逐一分析每個「待分析的整合段落」中的所有事實，並在「原始來源區塊」中找出所有支持這些事實的 `chunk_id`。
+每個段落都必須回傳一筆結果（沒有匹配時回傳空列表），`paragraph_id` 必須與段落標示完全相同。
+
+**3. 輸出:**
+請僅回傳 JSON 物件。
+"""
+
+SOURCE_CONTEXT_TEMPLATE = """
+**原始來源區塊 (資料庫):**
+{source_context}
+"""
+
 def chunk_text_by_paragraph(text: str) -> list[str]:
     if not text:
         return []
     chunks = re.split(r'\n\s*\n', text)
     return [chunk.strip() for chunk in chunks if chunk.strip()]
 
-def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
+def attribute_sources_for_story(story_id: str, mode: str = "batch") -> List[Dict[str, Any]]:
     """
-    接收一個 story_id，自動從 Supabase 抓取資料，
-    為「整合稿的每一段」呼叫 Gemini API 進行比對，並回傳標註好的結果。
+    接收一個 story_id，自動從 Supabase 抓取資料，呼叫 Gemini API 進行比對，並回傳標註好的結果。
+
+    mode:
+        "batch"     - 來源資料只送一次，一次請求取得所有整合段落的 chunk_id 對應（預設）
+        "paragraph" - 為「整合稿的每一段」各呼叫一次 Gemini API
     """
     
     print(f"--- 開始自動歸因任務 (Call Gemini API)：{story_id} ---")
@@ -91,77 +157,60 @@ def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
 
     # --- 步驟 2 & 3: 迭代呼叫 Gemini API 進行比對 ---
 
-    # 這是我們的「歸因提示」模板
-    USER_PROMPT_TEMPLATE = """
-    【任務開始】
+    if mode == "batch":
+        final_annotated_article = attribute_paragraphs_batch(single_news_chunks_db, source_chunks_db, chunk_id_to_source_map)
+    else:
+        final_annotated_article = attribute_paragraphs_one_by_one(single_news_chunks_db, source_context_string, chunk_id_to_source_map)
 
-    **1. 原始來源區塊 (資料庫):**
-    {source_context}
+    print("--- 自動歸因任務完成 ---")
+    return final_annotated_article
 
-    **2. 待分析的整合段落:**
-    {generated_paragraph}
+def _to_unique_sources(matching_chunk_ids: List[str], chunk_id_to_source_map: Dict[str, tuple]) -> List[tuple]:
+    """將 API 回傳的 chunk_ids 轉換回去重後的 (media, article_id)"""
+    matched_sources_tuples = []
+    for chunk_id in matching_chunk_ids:
+        if chunk_id in chunk_id_to_source_map:
+            matched_sources_tuples.append(chunk_id_to_source_map[chunk_id])
+        else:
+            print(f"    > 警告：Gemini 回傳了未知的 chunk_id: {chunk_id}")
+    return list(set(matched_sources_tuples))
 
-    **3. 你的分析與歸因:**
-    請嚴格按照你的核心原則，分析「待分析的整合段落」中的所有事實，並在「原始來源區塊」中找出所有支持這些事實的 `chunk_id`。
+def request_single_attribution(gen_chunk: Dict[str, Any], source_context_string: str) -> List[str]:
+    """單一整合段落對一份來源資料呼叫一次 API，回傳 matching_chunk_ids（失敗時拋出例外）"""
+    prompt = USER_PROMPT_TEMPLATE.format(
+        source_context=source_context_string,
+        generated_paragraph=gen_chunk['text']
+    )
+    config = types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=AttributionResponse,
+            temperature=0.0
+        )
+    response = gemini_client.models.generate_content(
+        model=GENERATIVE_MODEL,
+        contents=prompt,
+        config=config
+    )
+    return json.loads(response.text).get("matching_chunk_ids", [])
 
-    **4. 輸出:**
-    請僅回傳 JSON 物件。
-    """
-    
-    SYSTEM_INSTRUCTION = """
-    你是一個嚴謹的新聞歸因（Attribution）專家。
-    你的任務是逐一分析「待分析整合段落」中的**每一項事實主張 (claim)**，
-    然後在「原始來源區塊」中，找出**所有**包含了該項主張的**具體證據**。
-
-    **核心原則：**
-    1.  **基於事實，而非主題：** 絕對不要因為兩個區塊都在談論「徐國勇」或「光復節」就進行匹配。匹配的唯一依據是「整合段落」中的**具體事實**（例如：「蔣萬安反問...」）是否**直接出現**在「來源區塊」中。
-    2.  **接受轉述 (Paraphrasing)：** 整合段落可能是對來源的「改寫」或「總結」。例如，來源的「...賴清德是哪一國的總統？」和整合的「...反問總統賴清德的國籍...」是**有效匹配**。
-    3.  **100% 嚴謹：** 如果一個來源區塊**沒有**包含整合段落中的任何具體事實，**絕對不能**將其列入。
-    4.  **格式：** 永遠嚴格遵守使用者提供的 JSON 格式和 `response_schema`。
-    """
-    
+def attribute_paragraphs_one_by_one(single_news_chunks_db: List[Dict[str, Any]], source_context_string: str,
+                                    chunk_id_to_source_map: Dict[str, tuple]) -> List[Dict[str, Any]]:
+    """逐段模式：每個整合段落各呼叫一次 API（每次都附上完整來源資料）"""
     print("步驟 2/3 開始：迭代呼叫 Gemini API 進行比對...")
     final_annotated_article = []
 
     for gen_chunk in single_news_chunks_db:
         print(f"  > 正在分析整合區塊: {gen_chunk['chunk_id']}...")
         
-        # 1. 建構完整的提示
-        prompt = USER_PROMPT_TEMPLATE.format(
-            source_context=source_context_string,
-            generated_paragraph=gen_chunk['text']
-        )
-        
-        config = types.GenerateContentConfig(
-                system_instruction=SYSTEM_INSTRUCTION,
-                response_mime_type="application/json",
-                response_schema=AttributionResponse,
-                temperature=0.0
-            )
-        # 2. 呼叫 Gemini API
+        # 1. 呼叫 Gemini API 並解析 JSON 回應
         try:
-            response = gemini_client.models.generate_content(
-                model=GENERATIVE_MODEL,
-                contents=prompt,
-                config=config
-            )
+            matching_chunk_ids = request_single_attribution(gen_chunk, source_context_string)
             
-            # 3. 解析 JSON 回應
-            response_data = json.loads(response.text)
-            matching_chunk_ids = response_data.get("matching_chunk_ids", [])
+            # 2. 將 API 回傳的 chunk_ids 轉換回 (media, article_id) 並去重
+            unique_sources = _to_unique_sources(matching_chunk_ids, chunk_id_to_source_map)
             
-            # 4. 將 API 回傳的 chunk_ids 轉換回 (media, article_id)
-            matched_sources_tuples = []
-            for chunk_id in matching_chunk_ids:
-                if chunk_id in chunk_id_to_source_map:
-                    matched_sources_tuples.append(chunk_id_to_source_map[chunk_id])
-                else:
-                    print(f"    > 警告：Gemini 回傳了未知的 chunk_id: {chunk_id}")
-            
-            # 5. 去除重複的 (media, article_id)
-            unique_sources = list(set(matched_sources_tuples))
-            
-            # 6. 整理結果
+            # 3. 整理結果
             final_annotated_article.append({
                 "generated_text": gen_chunk['text'],
                 "sources_data": unique_sources
@@ -175,7 +224,139 @@ def attribute_sources_for_story(story_id: str) -> List[Dict[str, Any]]:
                 "sources_data": [] # 失敗時回傳空列表
             })
 
-    print("--- 自動歸因任務完成 ---")
+    return final_annotated_article
+
+def shard_source_context(source_chunks_db: List[Dict[str, Any]], max_chars: int = MAX_SOURCE_CHARS_PER_REQUEST) -> List[str]:
+    """將來源區塊組成給 API 看的「來源資料庫」字串，超過字數上限時切成多個分片"""
+    shards = []
+    current = ""
+    for chunk in source_chunks_db:
+        line = f"[{chunk['chunk_id']}]: {chunk['text']}\n\n"
+        if current and len(current) + len(line) > max_chars:
+            shards.append(current)
+            current = ""
+        current += line
+    if current:
+        shards.append(current)
+    return shards
+
+def create_source_cache(source_context: str):
+    """為來源資料建立 context cache，失敗（例如內容低於快取最小 token 數）時回傳 None"""
+    try:
+        cache = gemini_client.caches.create(
+            model=GENERATIVE_MODEL,
+            config=types.CreateCachedContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                contents=[SOURCE_CONTEXT_TEMPLATE.format(source_context=source_context)],
+                ttl=SOURCE_CACHE_TTL,
+            ),
+        )
+        print(f"    > 已建立來源資料快取: {cache.name}")
+        return cache
+    except Exception as e:
+        print(f"    > 警告：建立來源資料快取失敗，改為直接附上來源資料: {e}")
+        return None
+
+def request_batch_attribution(paragraphs: List[Dict[str, Any]], source_context: str, cache=None) -> Dict[str, List[str]]:
+    """一次請求取得多個整合段落的 chunk_id 對應，回傳 {paragraph_id: [chunk_id, ...]}"""
+    generated_paragraphs = "\n\n".join(f"[{p['chunk_id']}]: {p['text']}" for p in paragraphs)
+    prompt = BATCH_USER_PROMPT_TEMPLATE.format(generated_paragraphs=generated_paragraphs)
+
+    if cache is not None:
+        # 使用快取時，system_instruction 與來源資料已在快取中
+        config = types.GenerateContentConfig(
+            cached_content=cache.name,
+            response_mime_type="application/json",
+            response_schema=BatchAttributionResponse,
+            temperature=0.0
+        )
+    else:
+        prompt = SOURCE_CONTEXT_TEMPLATE.format(source_context=source_context) + prompt
+        config = types.GenerateContentConfig(
+            system_instruction=SYSTEM_INSTRUCTION,
+            response_mime_type="application/json",
+            response_schema=BatchAttributionResponse,
+            temperature=0.0
+        )
+
+    response = gemini_client.models.generate_content(
+        model=GENERATIVE_MODEL,
+        contents=prompt,
+        config=config
+    )
+    response_data = json.loads(response.text)
+    return {
+        item.get("paragraph_id"): item.get("matching_chunk_ids", [])
+        for item in response_data.get("attributions", [])
+    }
+
+def attribute_paragraphs_batch(single_news_chunks_db: List[Dict[str, Any]], source_chunks_db: List[Dict[str, Any]],
+                               chunk_id_to_source_map: Dict[str, tuple]) -> List[Dict[str, Any]]:
+    """
+    批次模式：來源資料只送一次，一次請求取得所有整合段落的對應。
+    段落過多時分組、來源過大時分片；同一分片需送出多次時使用 context cache。
+    """
+    paragraph_groups = [
+        single_news_chunks_db[i:i + MAX_PARAGRAPHS_PER_REQUEST]
+        for i in range(0, len(single_news_chunks_db), MAX_PARAGRAPHS_PER_REQUEST)
+    ]
+    source_shards = shard_source_context(source_chunks_db)
+    print(f"步驟 2/3 開始：批次比對（{len(paragraph_groups)} 組段落 × {len(source_shards)} 個來源分片）...")
+
+    matched: Dict[str, List[str]] = {p['chunk_id']: [] for p in single_news_chunks_db}
+    incomplete = set()
+    for shard_index, shard in enumerate(source_shards, 1):
+        cache = create_source_cache(shard) if len(paragraph_groups) > 1 else None
+        try:
+            # 每個分片各自追蹤已取得結果的段落，只重試失敗的（段落組, 分片）
+            answered = set()
+            pending = single_news_chunks_db
+            for attempt in range(2):
+                for i in range(0, len(pending), MAX_PARAGRAPHS_PER_REQUEST):
+                    group = pending[i:i + MAX_PARAGRAPHS_PER_REQUEST]
+                    try:
+                        result = request_batch_attribution(group, shard, cache)
+                    except Exception as e:
+                        print(f"    > 錯誤：分片 {shard_index} 批次 API 呼叫或 JSON 解析失敗: {e}")
+                        continue
+                    for paragraph_id, chunk_ids in result.items():
+                        if paragraph_id in matched and paragraph_id not in answered:
+                            matched[paragraph_id].extend(chunk_ids)
+                            answered.add(paragraph_id)
+                pending = [p for p in pending if p['chunk_id'] not in answered]
+                if not pending:
+                    break
+                if attempt == 0:
+                    print(f"    > 分片 {shard_index}：{len(pending)} 個段落未取得批次結果，重新批次請求")
+
+            # 仍缺漏的段落改用逐段模式補齊（只附上本分片的來源資料）
+            if pending:
+                print(f"    > 分片 {shard_index}：{len(pending)} 個段落改用逐段模式")
+            for gen_chunk in pending:
+                try:
+                    matched[gen_chunk['chunk_id']].extend(request_single_attribution(gen_chunk, shard))
+                except Exception as e:
+                    print(f"    > 錯誤：{gen_chunk['chunk_id']} 在分片 {shard_index} 的逐段比對失敗: {e}")
+                    incomplete.add(gen_chunk['chunk_id'])
+        finally:
+            if cache is not None:
+                try:
+                    gemini_client.caches.delete(name=cache.name)
+                except Exception as e:
+                    print(f"    > 警告：刪除來源資料快取失敗: {e}")
+
+    if incomplete:
+        print(f"    > 警告：{len(incomplete)} 個段落有分片比對失敗，來源可能不完整: {sorted(incomplete)}")
+
+    final_annotated_article = []
+    for gen_chunk in single_news_chunks_db:
+        unique_sources = _to_unique_sources(matched[gen_chunk['chunk_id']], chunk_id_to_source_map)
+        final_annotated_article.append({
+            "generated_text": gen_chunk['text'],
+            "sources_data": unique_sources
+        })
+        print(f"  > {gen_chunk['chunk_id']}：找到 {len(unique_sources)} 個唯一來源。")
+
     return final_annotated_article
 
 def format_attribution_to_json(annotated_result: List[Dict[str, Any]]) -> Dict[str, List[str]]:
@@ -34,6 +34,11 @@ class NewsProcessorConfig:
     BATCH_SIZE = 5  # 每次處理幾個 stories 後保存進度
     API_DELAY = 1  # API 調用間隔秒數
     MAX_CONTENT_LENGTH = 2000  # 文章內容最大長度（避免超過 token 限制）
+
+    # 批次摘要設定（多篇文章合併為一次請求）
+    BATCH_SUMMARY_ENABLED = True  # 是否啟用批次摘要模式
+    BATCH_MAX_INPUT_CHARS = 24000  # 單次請求文章內容總字數上限（約 MAX_CONTENT_LENGTH × 12）
+    BATCH_MAX_ARTICLES = 12  # 單次請求最多文章數（受輸出 token 限制）
     
     # Gemini 生成參數
     GENERATION_CONFIGS = {
@@ -43,6 +48,12 @@ class NewsProcessorConfig:
             "top_p": 0.8,
             "top_k": 25
         },
+        "batch_analysis": {
+            "temperature": 0.3,
+            "max_output_tokens": 8192,
+            "top_p": 0.8,
+            "top_k": 25
+        },
         "short_summary": {
             "temperature": 0.2,
             "max_output_tokens": 200,
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 import logging
 
+from pydantic import BaseModel
 from google import genai
 from google.genai import types  # 新版 SDK 的型別
 from core.config import NewsProcessorConfig
@@ -18,6 +19,17 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+class ArticleSummary(BaseModel):
+    article_key: str
+    core_summary: str
+    keywords: List[str]
+    key_persons: List[str]
+    key_organizations: List[str]
+    locations: List[str]
+    timeline: List[str]
+    category: str
+    confidence_score: float
+
 class NewsProcessor:
     """新聞處理器 - 負責處理新聞數據的摘要和關鍵詞萃取（新版 google-genai）"""
 
@@ -58,12 +70,14 @@ class NewsProcessor:
                 ))
         return result
 
-    def _build_generate_config(self, preset: str = "analysis") -> types.GenerateContentConfig:
+    def _build_generate_config(self, preset: str = "analysis", response_schema: Any = None) -> types.GenerateContentConfig:
         # 從 config 取出預設的生成參數（如 temperature、top_p、max_output_tokens、stop_sequences 等）
         base: Dict[str, Any] = dict(self.generation_configs.get(preset, {}))
 
         # 啟用 JSON Mode，降低下游 JSON 解析困難
         base.setdefault("response_mime_type", "application/json")
+        if response_schema is not None:
+            base["response_schema"] = response_schema
 
         # 整合 safety settings（新版放在 config 裡）
         base["safety_settings"] = self._to_safety_settings()
@@ -111,6 +125,163 @@ class NewsProcessor:
         """
         return base_prompt.strip()
 
+    def create_batch_summary_prompt(self, keyed_articles: List[tuple]) -> str:
+        """
+        創建多篇文章批次摘要的 prompt（共用同一份任務說明）
+
+        Args:
+            keyed_articles: [(article_key, article), ...]，article_key 為本批次內唯一的識別碼
+        """
+        max_chars = NewsProcessorConfig.MAX_CONTENT_LENGTH
+        article_blocks = []
+        for key, article in keyed_articles:
+            article_blocks.append(f"""
+            <article id="{key}">
+            標題：{article.get('article_title', '無標題')}
+            發布時間：{article.get('publish_date') or article.get('crawl_date', '未知時間')}
+            內容：{(article.get('content') or '無內容')[:max_chars]}
+            </article>""")
+
+        base_prompt = f"""
+            你是專業的新聞編輯，請逐篇分析以下 {len(keyed_articles)} 篇新聞文章並提取關鍵資訊，每篇的分析必須完全基於該篇的「新聞資料」，嚴禁添加任何外部資訊、個人推測或評論，也不可混用其他篇的內容。
+
+            【新聞資料】
+            {''.join(article_blocks)}
+
+            【任務要求】
+            對每一篇文章提取以下資訊：
+
+            1. 核心摘要（2-3句話概括主要事件）
+            2. 關鍵詞列表（5-8個最重要的關鍵詞）
+            3. 重要人物（提及的重要人物姓名）
+            4. 重要機構組織（提及的公司、政府部門、學術機構等）
+            5. 地點資訊（涉及的地理位置）
+            6. 時間線（重要的時間點）
+            7. 事件分類（政治、經濟、科技、社會等）
+
+            【輸出格式】
+            請輸出 JSON 陣列，每篇文章一個物件，article_key 必須與 <article id> 完全相同：
+
+            [
+                {{
+                    "article_key": "a1",
+                    "core_summary": "核心摘要內容",
+                    "keywords": ["關鍵詞1", "關鍵詞2", "關鍵詞3"],
+                    "key_persons": ["人物1", "人物2"],
+                    "key_organizations": ["組織1", "組織2"],
+                    "locations": ["地點1", "地點2"],
+                    "timeline": ["時間點1", "時間點2"],
+                    "category": "事件分類",
+                    "confidence_score": 0.95
+                }}
+            ]
+        """
+        return base_prompt.strip()
+
+    @staticmethod
+    def _estimate_article_chars(article: Dict) -> int:
+        """估算單篇文章在 prompt 中佔用的字數"""
+        content_len = min(len(article.get('content') or ''), NewsProcessorConfig.MAX_CONTENT_LENGTH)
+        return content_len + len(article.get('article_title') or '')
+
+    def split_articles_by_budget(self, articles: List[Dict]) -> List[List[Dict]]:
+        """
+        依字數預算與篇數上限切分文章，確保單次批次請求不超過 token 限制
+        """
+        budget = NewsProcessorConfig.BATCH_MAX_INPUT_CHARS
+        max_articles = NewsProcessorConfig.BATCH_MAX_ARTICLES
+
+        chunks: List[List[Dict]] = []
+        current: List[Dict] = []
+        current_chars = 0
+        for article in articles:
+            size = self._estimate_article_chars(article)
+            if current and (current_chars + size > budget or len(current) >= max_articles):
+                chunks.append(current)
+                current, current_chars = [], 0
+            current.append(article)
+            current_chars += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _attach_article_info(self, result: Dict, article: Dict) -> Dict:
+        """添加原始文章資訊"""
+        result.update({
+            "original_article_id": article.get('id'),
+            "original_title": article.get('article_title'),
+            "publish_date": article.get('publish_date') or article.get('crawl_date'),
+            "source_url": article.get('final_url'),
+            "processed_at": datetime.now().isoformat(sep=' ', timespec='minutes')
+        })
+        return result
+
+    def process_article_batch(self, articles: List[Dict]) -> List[Optional[Dict]]:
+        """
+        以單次請求處理多篇文章，回傳與 articles 對齊的結果列表（失敗者為 None）
+        """
+        keyed_articles = [(f"a{i + 1}", article) for i, article in enumerate(articles)]
+        results: List[Optional[Dict]] = [None] * len(articles)
+
+        try:
+            prompt = self.create_batch_summary_prompt(keyed_articles)
+            gen_config = self._build_generate_config("batch_analysis", response_schema=list[ArticleSummary])
+
+            response = self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=gen_config
+            )
+
+            items: List[Dict] = []
+            if response.parsed is not None:
+                parsed = response.parsed if isinstance(response.parsed, list) else [response.parsed]
+                items = [item.model_dump() for item in parsed]
+            elif getattr(response, "text", None):
+                data = json.loads(response.text.strip())
+                items = data if isinstance(data, list) else [data]
+            else:
+                logger.error("Gemini API 批次回應為空")
+                return results
+
+            key_to_index = {key: i for i, (key, _) in enumerate(keyed_articles)}
+            for item in items:
+                idx = key_to_index.get(str(item.pop("article_key", "")).strip())
+                if idx is None or results[idx] is not None:
+                    continue
+                results[idx] = self._attach_article_info(item, articles[idx])
+
+            logger.info(f"批次處理完成: 成功 {sum(r is not None for r in results)}/{len(articles)} 篇")
+
+        except Exception as e:
+            logger.error(f"批次處理文章時發生錯誤: {e}")
+
+        return results
+
+    def summarize_articles(self, articles: List[Dict]) -> List[Optional[Dict]]:
+        """
+        摘要多篇文章：批次模式下依預算切分後逐批請求，批次內缺漏的文章再以單篇模式補齊
+        """
+        if not NewsProcessorConfig.BATCH_SUMMARY_ENABLED:
+            results = []
+            for article in articles:
+                results.append(self.process_single_article(article))
+                time.sleep(NewsProcessorConfig.API_DELAY)
+            return results
+
+        results: List[Optional[Dict]] = []
+        for chunk in self.split_articles_by_budget(articles):
+            chunk_results = self.process_article_batch(chunk) if len(chunk) > 1 else [None]
+            time.sleep(NewsProcessorConfig.API_DELAY)
+
+            for article, result in zip(chunk, chunk_results):
+                if result is None:
+                    # 批次缺漏或單篇 chunk，改用單篇模式
+                    result = self.process_single_article(article)
+                    time.sleep(NewsProcessorConfig.API_DELAY)
+                results.append(result)
+        return results
+
     def process_single_article(self, article: Dict) -> Optional[Dict]:
         """
         處理單篇文章
@@ -147,13 +318,7 @@ class NewsProcessor:
                     result = json.loads(clean_text)
 
                     # 添加原始文章資訊
-                    result.update({
-                        "original_article_id": article.get('id'),
-                        "original_title": article.get('article_title'),
-                        "publish_date": article.get('publish_date') or article.get('crawl_date'),
-                        "source_url": article.get('final_url'),
-                        "processed_at": datetime.now().isoformat(sep=' ', timespec='minutes')
-                    })
+                    self._attach_article_info(result, article)
 
                     logger.info(f"成功處理文章: {article.get('article_title', '')[:50]}...")
                     return result
@@ -178,14 +343,19 @@ class NewsProcessor:
         story_id = story.get('story_id', 'unknown')
         logger.info(f"開始處理 Story {story_id}: {story.get('story_title', '')}")
 
+        articles = story.get('articles', [])
+        return self._build_story_result(story, self.summarize_articles(articles))
+
+    def _build_story_result(self, story: Dict, results: List[Optional[Dict]]) -> Dict:
+        """
+        將與 articles 對齊的摘要結果組合成 story 結果
+        """
+        story_id = story.get('story_id', 'unknown')
         articles = story.get('articles', [])
         processed_articles = []
         failed_articles = []
 
-        for i, article in enumerate(articles):
-            logger.info(f"處理 Story {story_id} 的第 {i+1}/{len(articles)} 篇文章...")
-            result = self.process_single_article(article)
-
+        for article, result in zip(articles, results):
             if result:
                 processed_articles.append(result)
             else:
@@ -195,9 +365,6 @@ class NewsProcessor:
                     "reason": "處理失敗"
                 })
 
-            # 添加延遲避免 API 速率限制
-            time.sleep(NewsProcessorConfig.API_DELAY)
-
         story_result = {
             "story_id": story_id,
             "story_title": story.get('story_title'),
@@ -213,6 +380,30 @@ class NewsProcessor:
         logger.info(f"Story {story_id} 處理完成: 成功 {len(processed_articles)}/{len(articles)} 篇")
         return story_result
 
+    def _pack_stories(self, stories: List[Dict]) -> List[List[Dict]]:
+        """
+        將文章較少的多個 stories 合併為同一組，使每組文章總量不超過單次批次預算
+        """
+        budget = NewsProcessorConfig.BATCH_MAX_INPUT_CHARS
+        max_articles = NewsProcessorConfig.BATCH_MAX_ARTICLES
+
+        groups: List[List[Dict]] = []
+        current: List[Dict] = []
+        current_chars = 0
+        current_count = 0
+        for story in stories:
+            articles = story.get('articles', [])
+            size = sum(self._estimate_article_chars(a) for a in articles)
+            if current and (current_chars + size > budget or current_count + len(articles) > max_articles):
+                groups.append(current)
+                current, current_chars, current_count = [], 0, 0
+            current.append(story)
+            current_chars += size
+            current_count += len(articles)
+        if current:
+            groups.append(current)
+        return groups
+
     def process_all_stories(self, start_index: int = 0, max_stories: Optional[int] = None):
         """
         處理所有 stories
@@ -243,6 +434,29 @@ class NewsProcessor:
 
         processed_stories = []
 
+        if NewsProcessorConfig.BATCH_SUMMARY_ENABLED:
+            # 批次模式：短 story 合併為同一請求，長 story 由 summarize_articles 自動切分
+            done = 0
+            for group in self._pack_stories(stories[start_index:end_index]):
+                done += len(group)
+                try:
+                    logger.info(f"\n=== 處理進度: {done}/{end_index-start_index}（本組 {len(group)} 個 stories）===")
+                    all_articles = [a for story in group for a in story.get('articles', [])]
+                    results = self.summarize_articles(all_articles)
+
+                    offset = 0
+                    for story in group:
+                        count = len(story.get('articles', []))
+                        processed_stories.append(self._build_story_result(story, results[offset:offset + count]))
+                        offset += count
+
+                except Exception as e:
+                    logger.error(f"處理 Story 組 {[s.get('story_id') for s in group]} 時發生嚴重錯誤: {e}")
+                    continue
+
+            logger.info("=== 新聞處理流程完成 ===")
+            return processed_stories
+
         for i in range(start_index, end_index):
             story = stories[i]
             try:
@@ -0,0 +1,116 @@
+"""
+Prompt 打包器 - 在 token 預算內挑選要放入綜合報導 prompt 的文章摘要
+
+功能：
+  1. 本地估算 token 數（不需呼叫 API）
+  2. 以字元 shingle + MinHash 去除近乎重複的通訊社稿件
+  3. 依優先度填滿設定的 token 預算
+"""
+
+import re
+import zlib
+import random
+from typing import List, Optional, Sequence, Set, Tuple
+
+# 中日韓文字大致一字一 token，其餘以英數單字計
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]')
+_WORD_RE = re.compile(r'[A-Za-z0-9]+')
+_NON_SPACE_RE = re.compile(r'\S')
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估文字的 token 數（CJK 每字約 1 token，英數單字約 1.3 token，標點約 1 token）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    words = _WORD_RE.findall(text)
+    word_chars = sum(len(w) for w in words)
+    others = len(_NON_SPACE_RE.findall(text)) - cjk - word_chars
+    return cjk + int(len(words) * 1.3 + 0.5) + max(others, 0)
+
+
+class PromptPacker:
+    """依 token 預算挑選、去重文字片段"""
+
+    def __init__(self, token_budget: int, shingle_size: int = 3, num_perm: int = 64,
+                 similarity_threshold: float = 0.8, seed: int = 42):
+        """
+        Args:
+            token_budget: 所有被選片段合計的 token 上限
+            shingle_size: 字元 shingle 長度
+            num_perm: MinHash 雜湊函數數量
+            similarity_threshold: 估計 Jaccard 相似度達此值視為重複
+            seed: MinHash 參數的亂數種子（固定以確保結果可重現）
+        """
+        self.token_budget = token_budget
+        self.shingle_size = shingle_size
+        self.similarity_threshold = similarity_threshold
+        rng = random.Random(seed)
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def shingles(self, text: str) -> Set[int]:
+        """將文字（去除空白與標點）切成字元 shingle 並雜湊"""
+        normalized = re.sub(r'[\W_]+', '', text.lower())
+        k = self.shingle_size
+        if len(normalized) <= k:
+            return {zlib.crc32(normalized.encode('utf-8'))} if normalized else set()
+        return {zlib.crc32(normalized[i:i + k].encode('utf-8')) for i in range(len(normalized) - k + 1)}
+
+    def minhash(self, shingle_set: Set[int]) -> Tuple[int, ...]:
+        """計算 MinHash 簽章"""
+        if not shingle_set:
+            return tuple(_MERSENNE_PRIME for _ in self._perms)
+        return tuple(
+            min((a * s + b) % _MERSENNE_PRIME for s in shingle_set)
+            for a, b in self._perms
+        )
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        """由 MinHash 簽章估計 Jaccard 相似度"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    def pack(self, texts: Sequence[str], priorities: Optional[Sequence[float]] = None,
+             max_items: Optional[int] = None) -> List[int]:
+        """
+        依優先度由高到低挑選片段：跳過與已選片段近乎重複者，直到填滿 token 預算
+
+        Args:
+            texts: 候選文字
+            priorities: 與 texts 對齊的優先度（越大越優先），省略時依原順序
+            max_items: 最多挑選幾個片段
+
+        Returns:
+            被選中片段在 texts 中的索引（依優先度排序）
+        """
+        if priorities is None:
+            priorities = [-i for i in range(len(texts))]
+        order = sorted(
+            (i for i, t in enumerate(texts) if t and t.strip()),
+            key=lambda i: priorities[i],
+            reverse=True,
+        )
+
+        selected: List[int] = []
+        signatures: List[Tuple[int, ...]] = []
+        used_tokens = 0
+        for i in order:
+            if max_items is not None and len(selected) >= max_items:
+                break
+            tokens = estimate_tokens(texts[i])
+            if used_tokens + tokens > self.token_budget:
+                continue
+            sig = self.minhash(self.shingles(texts[i]))
+            if any(self.similarity(sig, other) >= self.similarity_threshold for other in signatures):
+                continue
+            selected.append(i)
+            signatures.append(sig)
+            used_tokens += tokens
+        return selected
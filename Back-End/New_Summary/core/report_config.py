@@ -34,6 +34,15 @@ class ReportGeneratorConfig:
         "max_organizations": 5        # 最多包含的機構數量
     }
 
+    # 綜合報導 prompt 打包設定（控制輸入 token 數）
+    PROMPT_PACKING = {
+        "summary_token_budget": 2500,  # 核心內容摘要區塊的 token 上限
+        "max_summaries": 15,           # 最多放入幾則摘要
+        "shingle_size": 3,             # 去重用字元 shingle 長度
+        "num_perm": 64,                # MinHash 雜湊函數數量
+        "similarity_threshold": 0.8    # 估計相似度達此值視為近乎重複稿件
+    }
+
     # 綜合報導長度規範（三種版本）
     COMPREHENSIVE_LENGTHS = {
         "ultra_short": {  # 約 30 字
@@ -9,6 +9,7 @@ from pydantic import BaseModel
 from google import genai
 from google.genai import types  # 新版 SDK 型別
 from core.report_config import ReportGeneratorConfig
+from core.prompt_packer import PromptPacker, estimate_tokens
 from core.db_client import SupabaseClient
 
 logger = logging.getLogger(__name__)
@@ -44,6 +45,15 @@ class ReportGenerator:
         self.safety_settings = getattr(ReportGeneratorConfig, "SAFETY_SETTINGS", [])
         self.api_delay = getattr(ReportGeneratorConfig, "API_DELAY", 0.8)
 
+        # 綜合報導 prompt 打包器（token 預算 + 近重複摘要去除）
+        self.packing_config: Dict[str, Any] = getattr(ReportGeneratorConfig, "PROMPT_PACKING", {})
+        self.packer = PromptPacker(
+            token_budget=self.packing_config.get("summary_token_budget", 2500),
+            shingle_size=self.packing_config.get("shingle_size", 3),
+            num_perm=self.packing_config.get("num_perm", 64),
+            similarity_threshold=self.packing_config.get("similarity_threshold", 0.8),
+        )
+
     # ===== 工具：把 safety 設定轉成新版型別，與建立 GenerateContentConfig =====
     def _to_safety_settings(self) -> List[types.SafetySetting]:
         out: List[types.SafetySetting] = []
@@ -67,8 +77,40 @@ class ReportGenerator:
         base['response_schema'] = HintPromptResponse
         base["safety_settings"] = self._to_safety_settings()
         return types.GenerateContentConfig(**base)
-    def create_comprehensive_report_prompt(self, story_data: Dict, articles_data: List[Dict], version: str = "long") -> str:
-        """為多篇文章生成綜合報導的 prompt（version: "ultra_short" | "short" | "long"）"""
+
+    def pack_core_summaries(self, articles_data: List[Dict]) -> List[str]:
+        """
+        在 token 預算內挑選核心摘要：去除近乎重複的稿件，優先保留信心度高、涵蓋主要關鍵詞的摘要
+        """
+        summaries = [(a.get('core_summary') or '').strip() for a in articles_data]
+
+        keyword_counts = Counter(k for a in articles_data for k in a.get('keywords', []))
+        top_keywords = {k for k, _ in keyword_counts.most_common(10)}
+
+        priorities: List[float] = []
+        for article in articles_data:
+            try:
+                confidence = float(article.get('confidence_score') or 0)
+            except (TypeError, ValueError):
+                confidence = 0.0
+            coverage = len(top_keywords & set(article.get('keywords', []))) / len(top_keywords) if top_keywords else 0.0
+            priorities.append(confidence + coverage)
+
+        selected = self.packer.pack(summaries, priorities, max_items=self.packing_config.get("max_summaries", 15))
+        packed = [summaries[i] for i in selected]
+
+        total_tokens = sum(estimate_tokens(s) for s in summaries)
+        packed_tokens = sum(estimate_tokens(s) for s in packed)
+        logger.info(f"核心摘要打包：{len(packed)}/{len(summaries)} 則，約 {packed_tokens}/{total_tokens} tokens")
+        return packed
+
+    def create_comprehensive_report_prompt(self, story_data: Dict, articles_data: List[Dict], version: str = "long",
+                                           core_summaries: Optional[List[str]] = None) -> str:
+        """
+        為多篇文章生成綜合報導的 prompt（version: "ultra_short" | "short" | "long"）
+
+        core_summaries 為已打包的核心摘要；省略時於此呼叫 pack_core_summaries
+        """
 
         # 整合所有關鍵資訊
         all_keywords: List[str] = []
@@ -77,7 +119,6 @@ class ReportGenerator:
         all_locations: List[str] = []
         all_sourceurl: List[str] = []
         all_timeline: List[str] = []
-        core_summaries: List[str] = []
 
         for article in articles_data:
             all_keywords.extend(article.get('keywords', []))
@@ -88,7 +129,9 @@ class ReportGenerator:
             src = article.get('article_url')
             if src:
                 all_sourceurl.append(src)
-            core_summaries.append(article.get('core_summary', ''))
+
+        if core_summaries is None:
+            core_summaries = self.pack_core_summaries(articles_data)
 
         # 統計頻次並去重
         keyword_counts = Counter(all_keywords)
@@ -127,7 +170,7 @@ class ReportGenerator:
             文章數量：{len(articles_data)} 篇
 
             核心內容摘要（節錄）：
-            {chr(30).join([f"• {s}" for s in core_summaries[:15] if s])}
+            {chr(30).join([f"• {s}" for s in core_summaries if s])}
 
             主要關鍵詞：{', '.join(top_keywords) if top_keywords else '（無）'}
             重要人物：{', '.join(top_persons) if top_persons else '（無）'}
@@ -163,12 +206,15 @@ class ReportGenerator:
 
             outputs: Dict[str, Dict[str, Any]] = {}
             main_title = ""
+            # 三種版本共用同一份打包結果
+            core_summaries = self.pack_core_summaries(articles_data)
             for version, cfg_key in (
                 ("ultra_short", "comprehensive_ultra_short"),
                 ("short", "comprehensive_short"),
                 ("long", "comprehensive_long"),
             ):
-                prompt = self.create_comprehensive_report_prompt(story_data, articles_data, version=version)
+                prompt = self.create_comprehensive_report_prompt(story_data, articles_data, version=version,
+                                                                 core_summaries=core_summaries)
                 gen_cfg = self._build_generate_config_by_key(cfg_key)
 
                 response = self.client.models.generate_content(
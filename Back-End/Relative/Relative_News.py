@@ -2,28 +2,17 @@ from env import supabase, gemini_client
 from pydantic import BaseModel
 from google import genai
 from typing import List
-import uuid
 import time
 import json
-from postgrest.exceptions import APIError
+import os
+import sys
+from relation_writer import PairWriter
 
+# 添加父目錄到 Python 路徑，以便引用共用的 vector_index
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import VectorIndex, embed_texts
+from Analyze.analyzer_pool import fetch_all_rows
 
-def execute_builder_with_retry(builder, max_retries: int = 3):
-    """Execute a postgrest request builder with retry on statement timeout."""
-    for attempt in range(1, max_retries + 1):
-        try:
-            return builder.execute()
-        except APIError as e:
-            msg = str(e)
-            # Detect Postgres statement timeout and retry with backoff
-            if 'canceling statement due to statement timeout' in msg and attempt < max_retries:
-                wait = attempt * 2
-                print(f"[warn] DB statement timeout, retry {attempt}/{max_retries} after {wait}s")
-                time.sleep(wait)
-                continue
-            # Re-raise other API errors or after max retries
-            raise
-    
 
 class RelativeItem(BaseModel):
     relative_id: str
@@ -32,32 +21,78 @@ class RelativeItem(BaseModel):
 class RelativeNews(BaseModel):
     relatives: List[RelativeItem]
 
-data = supabase.table("single_news").select("story_id,category,short,generated_date").range(0, 500).order("generated_date", desc=True).execute()
-data = data.data
-all_data = []
-batch_size = 1000
-start = 0
+TOP_K_CANDIDATES = 15  # 每則新聞交給 Gemini 判斷的候選數量
+MAX_RELATED = 3  # 每則新聞最多的相關新聞數
+RECENT_STORY_LIMIT = 500  # 只為最新的這些新聞尋找相關新聞（候選池仍為全部新聞）
 
-while True:
-    temp = supabase.table("relative_news").select("src_story_id").range(start, start + batch_size - 1).execute()
-    if not temp.data:
-        print(len(all_data))
-        break
-    all_data.extend([row["src_story_id"] for row in temp.data])
-    start += batch_size
+def load_stories() -> list[dict]:
+    """讀取所有新聞作為候選池（依 generated_date 由新到舊）"""
+    return fetch_all_rows(lambda: supabase.table("single_news").select("story_id,category,short,generated_date").order("generated_date", desc=True))
 
-# 去重
-constraints = list(set(all_data))
-
-# m_data = json.dumps(data, indent=4)
-# with open("relative_json.json", "w") as f:
-#     f.write(m_data)
+class RelationGraph:
+    """
+    相關新聞關係圖（src → {dst: reason}），涵蓋資料庫既有配對與本次執行新增的配對。
+    相關性是對稱的：A 與 B 相關時，輪到 B 時可直接沿用 A → B 的配對與理由。
+    """
 
-def filter_related_news(current_story: dict, all_stories: list[dict]) -> list[dict]:
+    def __init__(self):
+        self.edges = {}
+        self.incoming = {}
+
+    def add(self, src_story_id: str, dst_story_id: str, reason: str):
+        self.edges.setdefault(src_story_id, {})[dst_story_id] = reason
+        self.incoming.setdefault(dst_story_id, {})[src_story_id] = reason
+
+    def sources(self) -> set:
+        """已有相關新聞的 src_story_id"""
+        return set(self.edges)
+
+    def reverse_edges(self, story_id: str) -> dict:
+        """指向 story_id 的配對 {src_story_id: reason}"""
+        return self.incoming.get(story_id, {})
+
+def load_relation_graph() -> RelationGraph:
+    """讀取資料庫既有的相關新聞配對"""
+    graph = RelationGraph()
+    for row in fetch_all_rows(lambda: supabase.table("relative_news").select("src_story_id,dst_story_id,reason")):
+        if row.get("src_story_id") and row.get("dst_story_id"):
+            graph.add(row["src_story_id"], row["dst_story_id"], row.get("reason") or "")
+    return graph
+
+def reuse_reverse_relations(graph: RelationGraph, index: VectorIndex, current_story: dict, stories_by_id: dict,
+                            limit: int = MAX_RELATED) -> list[dict]:
+    """沿用指向 current_story 的既有配對（依 embedding 相似度排序），最多 limit 筆"""
+    reverse = {src: reason for src, reason in graph.reverse_edges(current_story["story_id"]).items()
+               if src in stories_by_id and reason}
+    if not reverse:
+        return []
+    query = index.vector(current_story["story_id"])
+    if query is not None:
+        mask = index.mask_where(lambda story_id: story_id in reverse)
+        ordered = [story_id for story_id, _ in index.search(query, len(reverse), mask=mask)]
+        ordered += [story_id for story_id in reverse if story_id not in ordered]
+    else:
+        ordered = list(reverse)
+    return [{"story_id": story_id, "reason": reverse[story_id]} for story_id in ordered[:limit]]
+
+def build_story_index(stories: list[dict]) -> VectorIndex:
+    """以新聞 short 的 embedding 建立候選索引（已 embed 過的 short 直接從本地儲存庫讀取）"""
+    matrix = embed_texts(gemini_client, [story.get("short") or "" for story in stories])
+    return VectorIndex([story["story_id"] for story in stories], matrix)
+
+def shortlist_candidates(index: VectorIndex, current_story: dict, category_masks: dict, stories_by_id: dict,
+                         k: int = TOP_K_CANDIDATES) -> list[dict]:
+    """取同類別中與 current_story 最相似的 k 則新聞作為 Gemini 候選"""
+    mask = category_masks.get(current_story["category"])
+    hits = index.search_item(current_story["story_id"], k, mask=mask)
+    return [stories_by_id[story_id] for story_id, _ in hits]
+
+def filter_related_news(current_story: dict, all_stories: list[dict], max_related: int = MAX_RELATED) -> list[dict]:
     """
     使用 Gemini 篩選與 current_story 相關的新聞
     :param current_story: 當前新聞 story (dict, 包含 story_id,category,short,generated_date等)
     :param all_stories: 所有候選 story (list of dict)
+    :param max_related: 最多回傳幾個相關新聞
     :return: 相關 story (list of dict)
     """
 
@@ -80,7 +115,7 @@ def filter_related_news(current_story: dict, all_stories: list[dict]) -> list[di
     請判斷哪些候選新聞與當前新聞「高度相關」，並回傳各個相關新聞的編號和相關的原因(務必使用繁體中文)。
     確保回傳的編號個數與原因個數一致，要呈現1對1的狀態。
     在撰寫理由時，請不要提及「當前新聞」或「候選新聞」這些詞彙，而是直接描述，因為這是給使用者看的，希望能夠讓使用者理解為什麼這些新聞是相關的。
-    最多回傳 3 個相關新聞，且不能有重複新聞，如果違反將會受到嚴厲懲罰。
+    最多回傳 {max_related} 個相關新聞，且不能有重複新聞，如果違反將會受到嚴厲懲罰。
 
     當前新聞：
     {current_short}
@@ -132,77 +167,67 @@ def filter_related_news(current_story: dict, all_stories: list[dict]) -> list[di
     results = [
     {
         "story_id": story["story_id"],
-        "reason": next(item.reason for item in relatives if id_to_story_map[item.relative_id] == story["story_id"])
+        "reason": next(item.reason for item in relatives if id_to_story_map.get(item.relative_id) == story["story_id"])
     }
     for story in related_stories
     ]
 
     return results
 
-# print(data[0])
-# one = filter_related_news(data[0], data[1:])
-# print(one)
-# #insert database
-# response = (
-#     supabase.table("relative_news")
-#     .insert({"id": str(uuid.uuid4()),"reason":one[0]["reason"], "src_story_id": data[0]["story_id"], "dst_story_id": one[0]["story_id"]})
-#     .execute()
-# )
-
-for i, current_story in enumerate(data):
-    #constraints is a list like [0,1,2,3,4,5]
-    if current_story["story_id"] in constraints:
-        print(f"Skipping {current_story['story_id']} as it already exists in constraints.")
-        continue
-    # 將當前新聞與其他新聞進行相關性篩選
-    other_stories = data[:i] + data[i+1:]  # 排除當前新聞
-    #確保 other_stories 中的category與current_story相同
-    other_stories = [story for story in other_stories if story["category"] == current_story["category"]]
-    related_news = filter_related_news(current_story, other_stories)
-
-    if not related_news:
-        print(f"No related news found or failed for {current_story['story_id']}. Continue.")
-        continue
-
-    for j, rel in enumerate(related_news):
-        related_story_id = rel["story_id"]
-        reason = rel["reason"]
-
-        # 僅在 Supabase 中不存在相同 src/dst 組合時才插入
-        try:
-            exists_builder = (
-                supabase.table("relative_news")
-                .select("id")
-                .eq("src_story_id", current_story["story_id"])
-                .eq("dst_story_id", related_story_id)
-                .limit(1)
-            )
-            exists_check = execute_builder_with_retry(exists_builder)
-        except Exception as e:
-            print(f"[error] DB exists_check failed for src:{current_story['story_id']} dst:{related_story_id}: {e}")
-            # 跳過此相關項以避免中斷整個流程
+def main():
+    data = load_stories()
+    graph = load_relation_graph()
+    constraints = graph.sources()
+    print(f"新聞總數: {len(data)}，已有相關新聞: {len(constraints)}")
+
+    # 只處理最新的 RECENT_STORY_LIMIT 則；找不到相關新聞的舊新聞不會每次排程都重試
+    pending = [story for story in data[:RECENT_STORY_LIMIT] if story["story_id"] not in constraints]
+    if not pending:
+        print("沒有需要處理的新聞。")
+        return
+
+    index = build_story_index(data)
+    stories_by_id = {story["story_id"]: story for story in data}
+    categories = {story["category"] for story in data}
+    category_masks = {
+        category: index.mask_where(lambda story_id, c=category: stories_by_id[story_id]["category"] == c)
+        for category in categories
+    }
+
+    # 配對以小批次 upsert（已存在的 src/dst 組合會被略過），中斷後重跑會略過已寫入的新聞
+    writer = PairWriter(supabase, "relative_news", "dst_story_id")
+    reused_only = 0
+    for i, current_story in enumerate(pending):
+        story_id = current_story["story_id"]
+        # 先沿用反向配對（其他新聞已判定與本篇相關），只有剩餘名額才呼叫 Gemini
+        related_news = reuse_reverse_relations(graph, index, current_story, stories_by_id)
+        remaining = MAX_RELATED - len(related_news)
+
+        if remaining > 0:
+            # 以 embedding 相似度篩出同類別的 top-k 候選（排除已沿用者），再交給 Gemini 選出其餘相關新聞
+            reused_ids = {rel["story_id"] for rel in related_news}
+            candidates = [story for story in shortlist_candidates(index, current_story, category_masks, stories_by_id)
+                          if story["story_id"] not in reused_ids]
+            if candidates:
+                related_news += filter_related_news(current_story, candidates, remaining)[:remaining]
+                time.sleep(5)
+        else:
+            reused_only += 1
+
+        if not related_news:
+            print(f"No related news found or failed for {story_id}. Continue.")
             continue
 
-        if not getattr(exists_check, 'data', None):  # 無重複，執行插入
-            try:
-                insert_builder = (
-                    supabase.table("relative_news")
-                    .insert({
-                        "id": str(uuid.uuid4()),  # 生成唯一 ID
-                        "reason": reason,  # 插入相關原因
-                        "src_story_id": current_story["story_id"],  # 當前新聞的 story_id
-                        "dst_story_id": related_story_id  # 相關新聞的 story_id
-                    })
-                )
-                response = execute_builder_with_retry(insert_builder)
-            except Exception as e:
-                print(f"[error] DB insert failed for src:{current_story['story_id']} dst:{related_story_id}: {e}")
-                continue
-
-        # 最多插入三筆相關新聞（以處理到的順序為準）
-        print(j)
-        if j >= 2:
-            break
-
-    print(i)
-    time.sleep(5)
\ No newline at end of file
+        for rel in related_news:
+            graph.add(story_id, rel["story_id"], rel["reason"])
+        writer.add_many(story_id, related_news, "story_id")
+        print(i)
+
+    writer.flush()
+    print(f"relative_news 共寫入 {writer.written} 筆配對，{reused_only} 則新聞完全沿用反向配對（未呼叫 Gemini）")
+    if writer.pending:
+        print(f"[error] relative_news 有 {writer.pending} 筆配對寫入失敗")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 from env import supabase, gemini_client
 from pydantic import BaseModel
 from google import genai
-from typing import List
-import uuid
-import time
-    
+from typing import List, Optional
+import os
+import sys
+
+# 添加父目錄到 Python 路徑，以便引用共用的 vector_index 與分析器框架
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import VectorIndex, KeywordIndex, embed_texts, fuse_rankings
+from Analyze.analyzer_pool import Analyzer, fetch_all_rows, run_analyzer
+from relation_writer import PairWriter
+
+EMBEDDING_TOP_K = 8   # embedding 相似度取前幾個專題
+KEYWORD_TOP_K = 5     # 詞彙倒排索引取前幾個專題
+MAX_CANDIDATES = 10   # 合併後交給 Gemini 的候選專題上限
+
 
 class RelativeItem(BaseModel):
     relative_id: str
@@ -13,36 +23,29 @@ class RelativeItem(BaseModel):
 class RelativeTopics(BaseModel):
     relatives: List[RelativeItem]
 
-response = supabase.table("single_news").select("story_id,category,short,generated_date").execute()
-topics = supabase.table("topic").select("topic_id,topic_title,topic_short").execute()
-
-all_data = []
-batch_size = 1000
-start = 0
 
-while True:
-    temp = supabase.table("relative_topics").select("src_story_id").range(start, start + batch_size - 1).execute()
-    if not temp.data:
-        break
-    all_data.extend([row["src_story_id"] for row in temp.data])
-    start += batch_size
+class TopicIndex:
+    """專題候選索引：topic_title + topic_short 的 embedding 相似度與詞彙倒排索引"""
 
-# 去重
-constraints = list(set(all_data))
-topics = topics.data
-data = response.data
+    def __init__(self, topics: list[dict]):
+        self.topics_by_id = {topic["topic_id"]: topic for topic in topics}
+        ids = [topic["topic_id"] for topic in topics]
+        texts = [f"{topic.get('topic_title') or ''}\n{topic.get('topic_short') or ''}".strip() for topic in topics]
+        self.vectors = VectorIndex(ids, embed_texts(gemini_client, texts))
+        self.keywords = KeywordIndex(ids, texts)
 
-# m_data = json.dumps(data, indent=4)
-# with open("relative_json.json", "w") as f:
-#     f.write(m_data)
+    def candidates(self, story_short: str, exclude: tuple = ()) -> list[dict]:
+        """回傳與新聞最可能相關的少量候選專題"""
+        query = embed_texts(gemini_client, [story_short])[0]
+        by_embedding = self.vectors.search(query, EMBEDDING_TOP_K, exclude=exclude)
+        by_keyword = self.keywords.search(story_short, KEYWORD_TOP_K, exclude=exclude)
+        return [self.topics_by_id[topic_id] for topic_id in fuse_rankings([by_embedding, by_keyword], MAX_CANDIDATES)]
 
-# 假設 topic_news_map 是一個字典，包含專題與相關新聞的對應關係
-topic_news_map = supabase.table("topic_news_map").select("*").execute().data
 
-def filter_related_topics(current_story: dict, all_topics: list[dict]) -> list[dict]:
+def filter_related_topics(current_story: dict, all_topics: list[dict]) -> Optional[list[dict]]:
     """
-    確認 current_story 是否已在 topic_news_map 中，若在則直接視為相關專題之一。
-    否則，使用 Gemini 進行分類，最多返回兩個相關專題，並確保理由可信。
+    使用 Gemini 從候選專題中篩選相關專題，最多返回兩個相關專題，並確保理由可信。
+    Gemini 呼叫失敗時回傳 None。
     """
     current_short = current_story["short"]
     related_topics = []
@@ -50,7 +53,7 @@ def filter_related_topics(current_story: dict, all_topics: list[dict]) -> list[d
 
     # 建立候選新聞的假 ID 與真實 topic_id 的映射表
     id_to_story_map = {f"{i+1}": topic["topic_id"] for i, topic in enumerate(all_topics)}
-    
+
 
     # 使用假 ID 生成候選專題列表
     candidate_list = "\n".join(f"{i+1}. {topic['topic_short']}" for i, topic in enumerate(all_topics))
@@ -79,17 +82,21 @@ def filter_related_topics(current_story: dict, all_topics: list[dict]) -> list[d
 {candidate_list}
 """
 
-    response = gemini_client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config=genai.types.GenerateContentConfig(
-            response_mime_type="application/json",
-            response_schema=RelativeTopics,
-        ),
-    )
+    try:
+        response = gemini_client.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=prompt,
+            config=genai.types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=RelativeTopics,
+            ),
+        )
+        relatives = response.parsed.relatives
+    except Exception as e:
+        print(f"[error] Gemini generate_content failed for story {current_story.get('story_id')}: {e}")
+        return None
 
     # 將假 ID 轉換為真實的 topic_id
-    relatives = response.parsed.relatives
     for item in relatives:
         fake_id = item.relative_id
         if fake_id in id_to_story_map:
@@ -100,48 +107,64 @@ def filter_related_topics(current_story: dict, all_topics: list[dict]) -> list[d
             })
 
     # 返回最多兩個相關專題
-    return related_topics
-
-# print(data[0])
-# one = filter_related_news(data[0], data[1:])
-# print(one)
-# #insert database
-# response = (
-#     supabase.table("relative_news")
-#     .insert({"id": str(uuid.uuid4()),"reason":one[0]["reason"], "src_story_id": data[0]["story_id"], "dst_story_id": one[0]["story_id"]})
-#     .execute()
-# )
-
-for i, current_story in enumerate(data):
-    #constraints is a list like [0,1,2,3,4,5]
-    if current_story["story_id"] in constraints:
-        print(f"Skipping {current_story['story_id']} as it already exists in constraints.")
-        continue
-    # 檢查 current_story 是否已在 topic_news_map 中
-    if any(mapping["story_id"] == current_story["story_id"] for mapping in topic_news_map):
-        topic_id = next(mapping["topic_id"] for mapping in topic_news_map if mapping["story_id"] == current_story["story_id"])
-    #topics中將topic_id除外
-        other_topics = [topic for topic in topics if topic["topic_id"] != topic_id]
-    else:
-        other_topics = topics
-        topic_id = None
-    related_topics = filter_related_topics(current_story, other_topics)
-    #related_topics append topic_id
-    if topic_id:
-        related_topics.append({"topic_id": topic_id, "reason": "這篇新聞在這篇專題中。"})
-
-    for j in range(len(related_topics)):
-        related_topic_id = related_topics[j]["topic_id"]
-        reason = related_topics[j]["reason"]
-        response = (
-            supabase.table("relative_topics")
-            .insert({
-                "id": str(uuid.uuid4()),  # 生成唯一 ID
-                "reason": reason,  # 插入相關原因
-                "src_story_id": current_story["story_id"],  # 當前新聞的 story_id
-                "dst_topic_id": related_topic_id  # 相關新聞的 story_id
-            })
-            .execute()
-        )
-    print(i)
-    time.sleep(15)
\ No newline at end of file
+    return related_topics[:2]
+
+
+class RelativeTopicsAnalyzer(Analyzer):
+    name = "relative_topics"
+    model_name = "gemini-2.0-flash"
+
+    def __init__(self):
+        self.index: Optional[TopicIndex] = None
+        self.story_topic = {}
+        # 配對以小批次 upsert（已存在的 src/dst 組合會被略過），中斷後重跑會略過已寫入的新聞
+        self.writer = PairWriter(supabase, "relative_topics", "dst_topic_id")
+
+    def fetch_pending(self):
+        # 只有尚未建立相關專題的新聞需要處理，索引與對應表在此載入（而非 import 時）
+        constraints = {row["src_story_id"] for row in fetch_all_rows(lambda: supabase.table("relative_topics").select("src_story_id"))}
+        stories = fetch_all_rows(lambda: supabase.table("single_news").select("story_id,category,short,generated_date"))
+        pending = [story for story in stories if story["story_id"] not in constraints and story.get("short")]
+        print(f"新聞總數: {len(stories)}，待處理: {len(pending)}")
+        if not pending:
+            return []
+
+        topics = fetch_all_rows(lambda: supabase.table("topic").select("topic_id,topic_title,topic_short"))
+        self.index = TopicIndex(topics)
+        # 先批次 embed 所有待處理新聞，執行緒中的查詢只會讀取本地儲存庫
+        embed_texts(gemini_client, [story["short"] for story in pending])
+        self.story_topic = {
+            mapping["story_id"]: mapping["topic_id"]
+            for mapping in fetch_all_rows(lambda: supabase.table("topic_news_map").select("story_id,topic_id"))
+        }
+        return pending
+
+    def analyze(self, row):
+        # 新聞已在 topic_news_map 中時，該專題直接視為相關專題之一，不列入候選
+        topic_id = self.story_topic.get(row["story_id"])
+        candidates = self.index.candidates(row["short"], exclude=(topic_id,) if topic_id else ())
+
+        related_topics = filter_related_topics(row, candidates) if candidates else []
+        if related_topics is None:
+            return None
+        if topic_id:
+            related_topics.append({"topic_id": topic_id, "reason": "這篇新聞在這篇專題中。"})
+        return related_topics
+
+    def save(self, row, related_topics):
+        if not related_topics:
+            print(f"No related topics found for {row['story_id']}.")
+            return True
+        self.writer.add_many(row["story_id"], related_topics, "topic_id")
+        return True
+
+
+if __name__ == "__main__":
+    analyzer = RelativeTopicsAnalyzer()
+    run_analyzer(analyzer)
+    analyzer.writer.flush()
+    print(f"relative_topics 共寫入 {analyzer.writer.written} 筆配對")
+    if analyzer.writer.pending:
+        print(f"[error] relative_topics 有 {analyzer.writer.pending} 筆配對寫入失敗")
+        sys.exit(1)
+    print("All done.")
@@ -0,0 +1,141 @@
+"""
+相關新聞 / 相關專題配對的批次寫入
+
+以 (src_story_id, dst_story_id) / (src_story_id, dst_topic_id) 為唯一鍵批次 upsert，
+已存在的配對直接略過（ignore_duplicates），取代每筆配對先 select 再 insert 的做法。
+
+upsert 需要資料表上的唯一限制：
+  ALTER TABLE relative_news ADD CONSTRAINT relative_news_src_dst_key UNIQUE (src_story_id, dst_story_id);
+  ALTER TABLE relative_topics ADD CONSTRAINT relative_topics_src_dst_key UNIQUE (src_story_id, dst_topic_id);
+尚未建立時（PostgREST 回傳 42P10），自動改為先查詢同批 src 的既有配對、只 insert 新配對。
+
+建立唯一限制前需先清除既有的重複配對（每組保留一筆）：
+  DELETE FROM relative_news a USING relative_news b
+   WHERE a.src_story_id = b.src_story_id AND a.dst_story_id = b.dst_story_id AND a.id::text > b.id::text;
+  DELETE FROM relative_topics a USING relative_topics b
+   WHERE a.src_story_id = b.src_story_id AND a.dst_topic_id = b.dst_topic_id AND a.id::text > b.id::text;
+（Supabase_error_fix/relative_false.py 只處理 relative_news 且只針對超過 3 筆的 src，不足以建立唯一限制）
+"""
+
+import time
+import uuid
+import threading
+from postgrest.exceptions import APIError
+
+DEFAULT_BATCH_SIZE = 30  # 小批次寫入，中斷時最多只損失最近幾則新聞的結果
+
+
+def execute_builder_with_retry(builder, max_retries: int = 3):
+    """Execute a postgrest request builder with retry on statement timeout."""
+    for attempt in range(1, max_retries + 1):
+        try:
+            return builder.execute()
+        except APIError as e:
+            msg = str(e)
+            # Detect Postgres statement timeout and retry with backoff
+            if 'canceling statement due to statement timeout' in msg and attempt < max_retries:
+                wait = attempt * 2
+                print(f"[warn] DB statement timeout, retry {attempt}/{max_retries} after {wait}s")
+                time.sleep(wait)
+                continue
+            # Re-raise other API errors or after max retries
+            raise
+
+
+def is_missing_conflict_target(e: Exception) -> bool:
+    """upsert 的 on_conflict 欄位沒有對應的唯一限制（Postgres 42P10）"""
+    return getattr(e, "code", None) == "42P10" or "no unique or exclusion constraint" in str(e)
+
+
+class PairWriter:
+    """累積配對後一次 upsert（執行緒安全），同一批中重複的配對只保留第一筆"""
+
+    def __init__(self, client, table: str, dst_column: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            client: supabase client
+            table: 資料表名稱（relative_news / relative_topics）
+            dst_column: 目標欄位（dst_story_id / dst_topic_id）
+            batch_size: 累積幾筆後自動寫入
+        """
+        self.client = client
+        self.table = table
+        self.dst_column = dst_column
+        self.batch_size = batch_size
+        self._rows = {}
+        self._lock = threading.Lock()
+        self.written = 0
+        self.use_upsert = True  # 缺少唯一限制時改為 select 後 insert
+
+    @property
+    def pending(self) -> int:
+        """尚未成功寫入的配對數"""
+        with self._lock:
+            return len(self._rows)
+
+    def add(self, src_story_id: str, dst_id: str, reason: str):
+        """加入一筆配對，累積達 batch_size 時自動寫入"""
+        with self._lock:
+            key = (src_story_id, dst_id)
+            if key not in self._rows:
+                self._rows[key] = {
+                    "id": str(uuid.uuid4()),  # 生成唯一 ID
+                    "reason": reason,
+                    "src_story_id": src_story_id,
+                    self.dst_column: dst_id,
+                }
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def add_many(self, src_story_id: str, relatives: list[dict], id_key: str):
+        """加入同一 src 的多筆配對（relatives 為 [{id_key: ..., "reason": ...}]）"""
+        for rel in relatives:
+            self.add(src_story_id, rel[id_key], rel["reason"])
+
+    def flush(self) -> int:
+        """寫入目前累積的所有配對，回傳寫入筆數；失敗時保留資料供下次重試"""
+        with self._lock:
+            rows = list(self._rows.values())
+            if not rows:
+                return 0
+            try:
+                self._write(rows)
+            except Exception as e:
+                print(f"[error] {self.table} 批次寫入 {len(rows)} 筆失敗: {e}")
+                return 0
+            self._rows.clear()
+            self.written += len(rows)
+        print(f"{self.table} 批次寫入 {len(rows)} 筆配對")
+        return len(rows)
+
+    def _write(self, rows: list[dict]):
+        if self.use_upsert:
+            try:
+                execute_builder_with_retry(
+                    self.client.table(self.table).upsert(
+                        rows,
+                        on_conflict=f"src_story_id,{self.dst_column}",
+                        ignore_duplicates=True,
+                    )
+                )
+                return
+            except APIError as e:
+                if not is_missing_conflict_target(e):
+                    raise
+                print(f"[warn] {self.table} 缺少 (src_story_id, {self.dst_column}) 唯一限制，改為查詢既有配對後 insert")
+                self.use_upsert = False
+        self._insert_new(rows)
+
+    def _insert_new(self, rows: list[dict], chunk_size: int = 200):
+        """查詢同批 src 的既有配對，只 insert 尚不存在的配對"""
+        srcs = sorted({row["src_story_id"] for row in rows})
+        existing = set()
+        for i in range(0, len(srcs), chunk_size):
+            result = execute_builder_with_retry(
+                self.client.table(self.table).select(f"src_story_id,{self.dst_column}").in_("src_story_id", srcs[i:i + chunk_size])
+            )
+            existing.update((item["src_story_id"], item[self.dst_column]) for item in result.data or [])
+        new_rows = [row for row in rows if (row["src_story_id"], row[self.dst_column]) not in existing]
+        if new_rows:
+            execute_builder_with_retry(self.client.table(self.table).insert(new_rows))
@@ -23,7 +23,8 @@ scripts = [
         "New_Summary/scripts/quick_run.py",
         "Supabase_error_fix/news_notitle.py",
 
-        # 圖片與分析生成
+        # 圖片與分析生成（Story_analysis 一次產生各旗標與關鍵字，後續個別腳本僅補齊失敗欄位）
+        "Analyze/Story_analysis.py",
         "Category_images/generate_categories_from_single_news.py",
         "Analyze/Position_flag.py",
         "Analyze/Who_talk.py",
@@ -1,4 +1,4 @@
-import os, json, re
+import os, sys, json, re
 from supabase import create_client
 from dotenv import load_dotenv
 from google import genai
@@ -9,6 +9,10 @@ import random, hashlib
 from pathlib import Path
 from datetime import datetime
 
+# 添加父目錄到 Python 路徑，以便引用共用的 vector_index
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import KeywordIndex, VectorIndex, embed_texts
+
 # ========================================
 # 系統初始化與資料獲取
 # ========================================
@@ -20,10 +24,24 @@ def initialize_services():
     gemini = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
     return supabase, gemini
 
+def fetch_alive_topics(supabase):
+    """
+    獲取存活專題（連同已儲存的專題描述檔案）
+
+    專題描述檔案存在 topic 表的兩個欄位：
+      ALTER TABLE topic ADD COLUMN topic_profile jsonb, ADD COLUMN topic_profile_hash text;
+    欄位尚未建立時退回只讀取標題（每次重新生成描述檔案）。
+    """
+    try:
+        return supabase.table("topic").select("topic_id, topic_title, topic_profile, topic_profile_hash").eq("alive", 1).execute()
+    except Exception as e:
+        print(f"讀取已儲存的專題描述檔案失敗，將重新生成: {e}")
+        return supabase.table("topic").select("topic_id, topic_title").eq("alive", 1).execute()
+
 def fetch_data_from_database(supabase):
     """從資料庫獲取專題和新聞資料"""
-    topic = supabase.table("topic").select("topic_id, topic_title").eq("alive", 1).execute()
-    print(topic.data)
+    topic = fetch_alive_topics(supabase)
+    print([{"topic_id": t["topic_id"], "topic_title": t["topic_title"]} for t in topic.data])
     
     news = []
     batch_size = 1000
@@ -37,17 +55,22 @@ def fetch_data_from_database(supabase):
         start += batch_size
     return topic, news
 
-def get_classified_news_ids(supabase) -> set[str]:
-    """獲取已經分類的新聞 ID 集合"""
+def get_classified_news_ids(supabase, batch_size: int = 1000) -> set[str]:
+    """獲取已經分類的新聞 ID 集合（分頁讀取，避免被伺服器的單次回傳筆數上限截斷）"""
     try:
-        result = supabase.table("topic_news_map").select("story_id").execute()
-        if result.data:
-            classified_story_ids = {str(item["story_id"]) for item in result.data}
+        classified_story_ids: set[str] = set()
+        start = 0
+        while True:
+            result = supabase.table("topic_news_map").select("story_id").order("story_id").range(start, start + batch_size - 1).execute()
+            if not result.data:
+                break
+            classified_story_ids.update(str(item["story_id"]) for item in result.data)
+            start += batch_size
+        if classified_story_ids:
             print(f"找到 {len(classified_story_ids)} 個已分類的新聞")
-            return classified_story_ids
         else:
             print("沒有找到已分類的新聞")
-            return set()
+        return classified_story_ids
     except Exception as e:
         print(f"獲取已分類新聞失敗: {e}")
         return set()
@@ -92,6 +115,21 @@ class LMLabel(BaseModel):
     topic_id: Optional[str] = None
     topic_title: Optional[str] = None
 
+class StoryLabel(BaseModel):
+    story_key: str
+    topic_id: Optional[str] = None
+
+class BatchLabels(BaseModel):
+    labels: list[StoryLabel]
+
+CLASSIFY_BATCH_SIZE = 30  # 每次分類請求的新聞數（建議 20–50）
+NEWS_MAX_CHARS = 1200     # 每則新聞送入提示詞的字數上限
+TOPIC_PROFILE_VERSION = 1 # 專題描述檔案格式版本（修改描述提示詞或欄位時遞增，使已儲存的檔案失效）
+
+# 本地預篩門檻：詞彙或 embedding 任一達標的新聞才交給 LLM 分類（以 evaluate_prefilter.py 依歷史資料調整）
+PREFILTER_LEXICAL_THRESHOLD = 6.0
+PREFILTER_EMBEDDING_THRESHOLD = 0.55
+
 # ========================================
 # AI 提示詞建構
 # ========================================
@@ -115,8 +153,6 @@ def build_topic_description_prompt(topic_title: str) -> str:
 
 def build_classification_prompt(story_title: str, story_short: str, topics_payload: list[dict]) -> str:
     """建構新聞分類的 AI 提示詞"""
-    NEWS_MAX_CHARS = 1200
-    
     article = (story_title or "").strip()
     if story_short:
         article += "\n\n" + (story_short or "").strip()
@@ -138,6 +174,30 @@ def build_classification_prompt(story_title: str, story_short: str, topics_paylo
         f"【本文】\n標題：{story_title}\n內容摘錄：\n{article}\n"
     )
 
+def build_batch_classification_prompt(stories: list[dict], topics_payload: list[dict]) -> str:
+    """建構多則新聞一次分類的 AI 提示詞（候選專題清單只送一次）"""
+    topics_json = json.dumps(topics_payload, ensure_ascii=False)
+
+    articles = []
+    for story in stories:
+        article = (story["short"] or "")[:NEWS_MAX_CHARS]
+        articles.append(f"[{story['story_key']}]\n標題：{story['news_title']}\n內容摘錄：\n{article}")
+    articles_text = "\n\n".join(articles)
+
+    return (
+        "任務：根據下方提供的『候選專題清單』，為『新聞列表』中的每一則新聞各自選出最合適的一個專題；若全部不合適，該則請回 null。\n"
+        "輸出：僅輸出 JSON，且**必須完全符合**此結構（不可有多餘欄位或文字）：\n"
+        '{\"labels\": [{\"story_key\": <新聞編號>, \"topic_id\": <UUID或null>}, ...]}\n\n'
+        "規則：\n"
+        "1) **請仔細評估每個專題的描述(desc)、關鍵詞(keywords)與分類指導(guidelines)。**\n"
+        "2) **`guidelines` 中的 `includes_examples` 是正面範例，`excludes_examples` 是反面範例，這對於釐清專題邊界至關重要。**\n"
+        "3) 只能從候選清單中選；不可發明清單外的標籤。\n"
+        "4) 每則新聞獨立判斷，不要因為其他新聞的歸類而影響；若皆不合適：topic_id = null。\n"
+        "5) 每則新聞都必須回傳一筆，story_key 請原樣使用新聞列表中方括號內的編號。\n\n"
+        f"【候選專題清單（JSON 陣列）】\n{topics_json}\n\n"
+        f"【新聞列表】\n{articles_text}\n"
+    )
+
 # ========================================
 # 文字處理工具函數
 # ========================================
@@ -282,32 +342,63 @@ def generate_topic_description(gemini_client, topic_title: str) -> TopicBrief:
 
     return brief
 
-def build_topic_profiles(gemini_client, topics_to_process) -> dict[str, dict]:
-    """建立專題的 AI 描述檔案"""
+def topic_profile_hash(topic_title: str) -> str:
+    """專題描述檔案的版本雜湊（標題或描述檔案格式改變時失效）"""
+    normalized = re.sub(r"\s+", " ", (topic_title or "").strip())
+    return hashlib.md5(f"{TOPIC_PROFILE_VERSION}:{normalized}".encode("utf-8")).hexdigest()
+
+def save_topic_profile(supabase, topic_id: str, profile: dict, profile_hash: str) -> bool:
+    """將專題描述檔案與版本雜湊存回 topic 表"""
+    try:
+        supabase.table("topic").update({"topic_profile": profile, "topic_profile_hash": profile_hash}).eq("topic_id", topic_id).execute()
+        return True
+    except Exception as e:
+        print(f"儲存專題 {topic_id} 描述檔案失敗: {e}")
+        return False
+
+def build_topic_profiles(gemini_client, topics_to_process, supabase=None) -> dict[str, dict]:
+    """
+    建立專題的 AI 描述檔案
+
+    topic 資料列已有相同標題雜湊的 topic_profile 時直接沿用；新專題或標題改變的專題才重新生成，
+    並在提供 supabase 時存回 topic 表。
+    """
     topic_profiles: dict[str, dict] = {}
     
     if not topics_to_process:
         print("沒有需要處理的專題，跳過建立描述檔案")
         return topic_profiles
     
-    print(f"開始為 {len(topics_to_process)} 個專題建立描述檔案...")
-    
+    reused = 0
+    can_save = supabase is not None
     for item in topics_to_process:
         topic_title = item["topic_title"]
+        tid = str(item["topic_id"])
+        profile_hash = topic_profile_hash(topic_title)
+
+        stored = item.get("topic_profile")
+        if stored and item.get("topic_profile_hash") == profile_hash:
+            topic_profiles[tid] = {**stored, "title": topic_title}
+            reused += 1
+            continue
+
         brief = generate_topic_description(gemini_client, topic_title)
         
         print(f"[{topic_title}] {brief.short_description} (len={len(brief.short_description)}) | aliases={brief.aliases}")
         
-        tid = str(item["topic_id"])
-        topic_profiles[tid] = {
-            "title": topic_title,
+        profile = {
             "desc": brief.short_description,
             "aliases": brief.aliases,
             "keywords": brief.keywords,
             "positive_examples": brief.positive_examples,
             "negative_examples": brief.negative_examples,
         }
+        topic_profiles[tid] = {"title": topic_title, **profile}
+        if can_save:
+            # 第一次寫入失敗（例如欄位尚未建立）後不再嘗試
+            can_save = save_topic_profile(supabase, tid, profile, profile_hash)
     
+    print(f"專題描述檔案：沿用 {reused} 個，重新生成 {len(topics_to_process) - reused} 個")
     return topic_profiles
 
 # ========================================
@@ -343,6 +434,77 @@ def shuffle_topics_for_story(topics_payload: list[dict], story_id: str) -> list[
     rnd.shuffle(copied)
     return copied
 
+def shuffle_topics_for_batch(topics_payload: list[dict], story_ids: list[str]) -> list[dict]:
+    """為一批新聞產生可重現的隨機順序專題列表（每批不同順序，降低位置偏誤）"""
+    return shuffle_topics_for_story(topics_payload, ",".join(sorted(story_ids)))
+
+# ========================================
+# 本地預篩
+# ========================================
+def story_text(story: dict) -> str:
+    """新聞的標題與摘要（預篩用）"""
+    return f"{(story.get('news_title') or '').strip()}\n{(story.get('short') or '').strip()}".strip()
+
+class TopicPrefilter:
+    """
+    以專題描述檔案建立的本地評分：別名/關鍵詞片語比對、詞彙倒排索引與（可選的）embedding 相似度。
+    明顯不屬於任何專題的新聞直接標為 none，不呼叫 LLM。
+    """
+
+    def __init__(self, topic_profiles: dict[str, dict], gemini_client=None,
+                 lexical_threshold: float = PREFILTER_LEXICAL_THRESHOLD,
+                 embedding_threshold: float = PREFILTER_EMBEDDING_THRESHOLD):
+        self.gemini_client = gemini_client
+        self.lexical_threshold = lexical_threshold
+        self.embedding_threshold = embedding_threshold
+
+        ids = list(topic_profiles)
+        texts = []
+        self.phrases: dict[str, list[str]] = {}
+        for tid in ids:
+            prof = topic_profiles[tid]
+            terms = [prof.get("title", "")] + (prof.get("aliases") or []) + (prof.get("keywords") or [])
+            self.phrases[tid] = [t.strip().lower() for t in terms if t and len(t.strip()) >= 2]
+            texts.append("\n".join([prof.get("title", ""), prof.get("desc", "")] + terms[1:] + (prof.get("positive_examples") or [])))
+        self.keywords = KeywordIndex(ids, texts)
+        self.vectors = VectorIndex(ids, embed_texts(gemini_client, texts)) if gemini_client and ids else None
+
+    def score_stories(self, stories: list[dict]) -> list[dict]:
+        """回傳每則新聞的最佳專題分數 {topic_id, phrase, lexical, embedding}"""
+        texts = [story_text(story) for story in stories]
+        queries = embed_texts(self.gemini_client, texts) if self.vectors is not None and texts else None
+
+        scores = []
+        for i, text in enumerate(texts):
+            lowered = text.lower()
+            phrase_hit = next((tid for tid, phrases in self.phrases.items() if any(p in lowered for p in phrases)), None)
+            lexical = self.keywords.search(text, 1)
+            embedding = self.vectors.search(queries[i], 1) if queries is not None else []
+            scores.append({
+                "topic_id": phrase_hit or (lexical[0][0] if lexical else None) or (embedding[0][0] if embedding else None),
+                "phrase": phrase_hit is not None,
+                "lexical": lexical[0][1] if lexical else 0.0,
+                "embedding": embedding[0][1] if embedding else 0.0,
+            })
+        return scores
+
+    @staticmethod
+    def passes(score: dict, lexical_threshold: float, embedding_threshold: Optional[float]) -> bool:
+        """片語命中或任一分數達門檻即需交給 LLM（embedding_threshold 為 None 表示不使用 embedding）"""
+        if score["phrase"] or score["lexical"] >= lexical_threshold:
+            return True
+        return embedding_threshold is not None and score["embedding"] >= embedding_threshold
+
+    def route(self, stories: list[dict]) -> tuple[list[dict], list[dict]]:
+        """將新聞分為（需 LLM 分類, 直接標為 none）兩組"""
+        with_text = [story for story in stories if story_text(story)]
+        to_llm, skipped = [], [story for story in stories if not story_text(story)]
+        embedding_threshold = self.embedding_threshold if self.vectors is not None else None
+        for story, score in zip(with_text, self.score_stories(with_text)):
+            (to_llm if self.passes(score, self.lexical_threshold, embedding_threshold) else skipped).append(story)
+        print(f"本地預篩：{len(to_llm)} 篇交給 LLM 分類，{len(skipped)} 篇直接標為 none")
+        return to_llm, skipped
+
 # ========================================
 # 新聞分類處理
 # ========================================
@@ -399,70 +561,175 @@ def classify_single_news(gemini_client, story_id: str, story_title: str, story_s
     
     return result_obj
 
-def classify_all_news(gemini_client, news_data, topics_payload: list[dict], topic_profiles: dict) -> list[dict]:
-    """分類所有新聞"""
+def unassigned_result(story: dict) -> dict:
+    """未分到任何專題的分類結果"""
+    return {
+        "topic_id": None,
+        "topic_title": None,
+        "source_story": {
+            "story_id": str(story["story_id"]),
+            "news_title": (story.get("news_title") or "").strip(),
+            "short": (story.get("short") or "").strip(),
+        }
+    }
+
+def classify_news_batch(gemini_client, stories: list[dict], topics_payload: list[dict], topic_profiles: dict) -> list[dict]:
+    """
+    以一次請求分類一批新聞（stories 為 {story_id, news_title, short}，皆需有文字）
+
+    批次請求失敗或缺漏的新聞改以 classify_single_news 逐則分類。
+    """
+    keyed = [{**story, "story_key": f"n{i + 1}"} for i, story in enumerate(stories)]
+    candidates = shuffle_topics_for_batch(topics_payload, [story["story_id"] for story in stories])
+    prompt = build_batch_classification_prompt(keyed, candidates)
+
+    labels: dict[str, Optional[str]] = {}
+    try:
+        resp = gemini_client.models.generate_content(
+            model="gemini-2.5-flash-lite",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                system_instruction="你是新聞歸類助理。僅依照指示輸出 JSON（labels：每則新聞的 story_key, topic_id）。",
+                response_mime_type="application/json",
+                response_schema=BatchLabels,
+                temperature=0.1,
+            )
+        )
+        parsed = getattr(resp, "parsed", None)
+        if parsed is None:
+            parsed = BatchLabels.model_validate(json.loads(extract_json_candidate(resp.text or "") or "{}"))
+        labels = {item.story_key: item.topic_id for item in parsed.labels}
+    except Exception as e:
+        print(f"[batch {len(stories)} 則] LLM 呼叫失敗：{e} → 改為逐則分類")
+
+    results = []
+    for story in keyed:
+        if story["story_key"] not in labels:
+            results.append(classify_single_news(gemini_client, story["story_id"], story["news_title"], story["short"], topics_payload, topic_profiles))
+            continue
+
+        # 以 topic_id 為準，用 canonical title 覆寫
+        tid = labels[story["story_key"]]
+        tid = tid if (tid and tid in topic_profiles) else None
+        results.append({
+            "topic_id": tid,
+            "topic_title": topic_profiles[tid]["title"] if tid else None,
+            "source_story": {
+                "story_id": story["story_id"],
+                "news_title": story["news_title"],
+                "short": story["short"],
+            }
+        })
+        print(f"[story_id={story['story_id']}] {story['news_title']}\n  → topic_id={tid if tid else 'NONE'}")
+    return results
+
+def classify_all_news(gemini_client, news_data, topics_payload: list[dict], topic_profiles: dict, batch_size: int = CLASSIFY_BATCH_SIZE) -> list[dict]:
+    """分類所有新聞（每 batch_size 則一次請求）"""
     classified_results: list[dict] = []
     SKIP_NONE = False
 
+    stories = []
     for doc in news_data.data:
         sid = str(doc["story_id"])
         s_title = (doc.get("news_title") or "").strip()
         s_short = (doc.get("short") or "").strip()
-        
-        result = classify_single_news(gemini_client, sid, s_title, s_short, topics_payload, topic_profiles)
-        
-        if result is not None:
-            if not ((result.get("topic_id") is None) and SKIP_NONE):
+
+        if not (s_title or s_short):
+            # 空文本不需呼叫 LLM
+            result = classify_single_news(gemini_client, sid, s_title, s_short, topics_payload, topic_profiles)
+            if result is not None:
                 classified_results.append(result)
+            continue
+        stories.append({"story_id": sid, "news_title": s_title, "short": s_short})
+
+    for start in range(0, len(stories), batch_size):
+        batch = stories[start:start + batch_size]
+        print(f"分類第 {start + 1}–{start + len(batch)} / {len(stories)} 則新聞...")
+        for result in classify_news_batch(gemini_client, batch, topics_payload, topic_profiles):
+            if result is not None:
+                if not ((result.get("topic_id") is None) and SKIP_NONE):
+                    classified_results.append(result)
 
     return classified_results
 
 # ========================================
 # 資料庫操作
 # ========================================
+def is_missing_conflict_target(e: Exception) -> bool:
+    """upsert 的 on_conflict 欄位沒有對應的唯一限制（Postgres 42P10）"""
+    return getattr(e, "code", None) == "42P10" or "no unique or exclusion constraint" in str(e)
+
 def append_topic_news_mappings(supabase, topic_id: str, story_ids: list[str]) -> bool:
-    """將新的專題和新聞映射關係追加到資料庫（增量模式）"""
+    """將新的專題和新聞映射關係追加到資料庫（先查詢既有映射，只 insert 新的，不需要唯一限制）"""
     try:
         # 先檢查哪些 story_id 已經存在
-        existing_result = supabase.table("topic_news_map").select("story_id").eq("topic_id", topic_id).execute()
-        existing_story_ids = {str(item["story_id"]) for item in existing_result.data} if existing_result.data else set()
+        existing_story_ids = set()
+        for i in range(0, len(story_ids), 200):
+            existing_result = supabase.table("topic_news_map").select("story_id").eq("topic_id", topic_id).in_("story_id", story_ids[i:i + 200]).execute()
+            existing_story_ids.update(str(item["story_id"]) for item in existing_result.data or [])
         
         # 過濾出真正需要新增的 story_id
         new_story_ids = [sid for sid in story_ids if sid not in existing_story_ids]
-        
         if not new_story_ids:
-            print(f"專題 {topic_id} 沒有需要新增的新聞映射")
             return True
         
-        # 準備要插入的資料
-        mappings = [
-            {
-                "topic_id": topic_id,
-                "story_id": story_id
-            }
-            for story_id in new_story_ids
-        ]
-        
-        # 批量插入
-        result = supabase.table("topic_news_map").insert(mappings).execute()
-        
-        if result.data:
-            print(f"成功為專題 {topic_id} 新增 {len(new_story_ids)} 筆新聞映射")
-            return True
-        else:
-            print(f"為專題 {topic_id} 新增映射失敗：無資料返回")
-            return False
-            
+        supabase.table("topic_news_map").insert([{"topic_id": topic_id, "story_id": sid} for sid in new_story_ids]).execute()
+        return True
     except Exception as e:
         print(f"為專題 {topic_id} 新增映射失敗: {e}")
         return False
 
+def upsert_topic_news_mappings(supabase, mappings: list[dict], batch_size: int = 500) -> set[str]:
+    """
+    將 (topic_id, story_id) 映射批次 upsert，已存在的組合直接略過（增量模式）
+
+    upsert 需要資料表上的唯一限制：
+      ALTER TABLE topic_news_map ADD CONSTRAINT topic_news_map_topic_story_key UNIQUE (topic_id, story_id);
+    尚未建立時（PostgREST 回傳 42P10），改為逐專題先查詢既有映射再 insert。
+
+    Returns:
+        寫入失敗的 topic_id 集合
+    """
+    failed_topic_ids: set[str] = set()
+    use_upsert = True
+    for start in range(0, len(mappings), batch_size):
+        batch = mappings[start:start + batch_size]
+        if use_upsert:
+            try:
+                supabase.table("topic_news_map").upsert(batch, on_conflict="topic_id,story_id", ignore_duplicates=True).execute()
+                print(f"批次寫入 {len(batch)} 筆專題新聞映射")
+                continue
+            except Exception as e:
+                if not is_missing_conflict_target(e):
+                    print(f"批次寫入 {len(batch)} 筆專題新聞映射失敗: {e}")
+                    failed_topic_ids.update(item["topic_id"] for item in batch)
+                    continue
+                print("topic_news_map 缺少 (topic_id, story_id) 唯一限制，改為查詢既有映射後 insert")
+                use_upsert = False
+
+        by_topic: dict[str, list[str]] = {}
+        for item in batch:
+            by_topic.setdefault(item["topic_id"], []).append(item["story_id"])
+        for topic_id, story_ids in by_topic.items():
+            if not append_topic_news_mappings(supabase, topic_id, story_ids):
+                failed_topic_ids.add(topic_id)
+        print(f"批次寫入 {len(batch)} 筆專題新聞映射（select 後 insert）")
+    return failed_topic_ids
+
 def save_incremental_results_to_database(supabase, grouped_output: dict) -> dict:
     """將分類結果增量存入資料庫（不清除現有資料，只新增）"""
     saved_topics = []
     failed_topics = []
     
     print(f"\n開始增量存入資料庫...")
+
+    # 所有專題的新映射一次批次 upsert（不清除現有的，已存在的組合略過）
+    mappings = [
+        {"topic_id": topic["topic_id"], "story_id": story["story_id"]}
+        for topic in grouped_output["topics"]
+        for story in topic["stories"]
+    ]
+    failed_topic_ids = upsert_topic_news_mappings(supabase, mappings) if mappings else set()
     
     for topic in grouped_output["topics"]:
         topic_id = topic["topic_id"]
@@ -474,11 +741,7 @@ def save_incremental_results_to_database(supabase, grouped_output: dict) -> dict
         if news_count == 0:
             continue
         
-        # 準備新聞 ID 列表
-        story_ids = [story["story_id"] for story in stories]
-        
-        # 增量插入新的映射（不清除現有的）
-        if append_topic_news_mappings(supabase, topic_id, story_ids):
+        if topic_id not in failed_topic_ids:
             saved_topics.append({
                 "topic_id": topic_id,
                 "topic_title": topic_title,
@@ -586,18 +849,23 @@ def main():
             "total_topics": len(topic_data.data)
         }
     
-    # 為所有專題建立描述檔案（因為未分類的新聞可能分到任何專題）
+    # 為所有專題建立描述檔案（因為未分類的新聞可能分到任何專題；已儲存且標題未變的直接沿用）
     print(f"\n開始為所有 {len(topic_data.data)} 個專題建立描述檔案...")
-    topic_profiles = build_topic_profiles(gemini, topic_data.data)
+    topic_profiles = build_topic_profiles(gemini, topic_data.data, supabase)
     
     # 準備專題候選清單
     print("準備專題候選清單...")
     topics_payload = build_topics_payload(topic_profiles, max_aliases=6)
     
+    # 本地預篩：明顯不屬於任何專題的新聞直接標為 none
+    prefilter = TopicPrefilter(topic_profiles, gemini)
+    news_to_classify, prefilter_skipped = prefilter.route(unclassified_news)
+
     # 分類未分類的新聞
-    print(f"開始分類 {len(unclassified_news)} 篇未分類新聞...")
-    fake_news_data = type('obj', (object,), {'data': unclassified_news})
+    print(f"開始分類 {len(news_to_classify)} 篇未分類新聞...")
+    fake_news_data = type('obj', (object,), {'data': news_to_classify})
     classified_results = classify_all_news(gemini, fake_news_data, topics_payload, topic_profiles)
+    classified_results.extend(unassigned_result(story) for story in prefilter_skipped)
     
     # 分組結果
     print("分組結果...")
@@ -615,6 +883,7 @@ def main():
         "total_topics": len(topic_data.data),
         "total_news": len(news_data),
         "unclassified_news": len(unclassified_news),
+        "prefilter_skipped": len(prefilter_skipped),
         "newly_classified": sum(len(t["stories"]) for t in grouped_output["topics"]),
         "topics_with_new_news": sum(1 for g in grouped_output["topics"] if g["stories"]),
         "unassigned_news": len(grouped_output["unassigned"]),
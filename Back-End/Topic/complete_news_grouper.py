@@ -5,10 +5,14 @@
 import os
 import sys
 import json
-import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from pydantic import BaseModel
+
+# 添加父目錄到 Python 路徑，以便引用共用的 vector_index
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 載入環境變數
 
@@ -41,6 +45,36 @@ except ImportError:
     print("請先安裝 google genai SDK：pip install google-genai")
     sys.exit(1)
 
+try:
+    import numpy as np
+except ImportError:
+    print("請先安裝 numpy：pip install numpy")
+    sys.exit(1)
+
+try:
+    from vector_index import embed_texts, agglomerative_clusters
+    from Analyze.analyzer_pool import get_rate_limiter, fetch_all_rows, fetch_rows_by_ids, DEFAULT_MAX_WORKERS
+except ImportError as e:
+    print(f"無法載入 Back-End 共用模組（vector_index / Analyze.analyzer_pool）: {e}")
+    sys.exit(1)
+
+EVENT_GROUP_MAX = 5             # 每個主題最多分成幾個事件分支
+EVENT_GROUP_MIN = 3             # 新聞足夠時至少分成幾個事件分支
+EVENT_MERGE_SIMILARITY = 0.80   # 分支數已在上限內時，平均相似度仍達此值的分支繼續合併
+EVENT_MIN_SIZE = 2              # 少於此數的分支併入最相近的分支
+NAMING_SAMPLES = 6              # 命名時每個分支提供給 Gemini 的代表新聞數
+GROUPER_MODEL = 'gemini-2.5-flash'
+
+
+class EventName(BaseModel):
+    cluster_id: int
+    event_title: str
+    event_summary: str
+
+class EventNamesResponse(BaseModel):
+    groups: list[EventName]
+
+
 class NewsEventGrouper:
     """新聞事件分組器"""
     
@@ -55,6 +89,13 @@ class NewsEventGrouper:
             # 使用 fallback 方法
             print("切換到 fallback 模式...")
             self.genai_client = None
+        # 所有主題的 worker 共用同一個模型速率限制器
+        self.rate_limiter = get_rate_limiter(GROUPER_MODEL)
+
+    def generate_content(self, contents, config=None):
+        """經由共用速率限制器呼叫 Gemini"""
+        self.rate_limiter.acquire()
+        return self.genai_client.models.generate_content(model=GROUPER_MODEL, contents=contents, config=config)
         
     def fetch_topic_news_map_from_supabase(self):
         """從 Supabase 的 topic_news_map 表獲取主題新聞映射"""
@@ -124,181 +165,141 @@ class NewsEventGrouper:
             print(f"讀取 JSON 檔案時發生錯誤: {e}")
             return []
     
-    def fetch_news_from_supabase(self, story_ids):
-        """從 Supabase 獲取新聞內容"""
-        news_items = []
-        
+    def fetch_news_from_supabase(self, story_ids, chunk_size=200):
+        """從 Supabase 獲取新聞內容（以 in 查詢分段批次讀取，依 story_ids 順序回傳；失敗的分段略過）"""
+        story_ids = list(dict.fromkeys(story_ids))
         print(f"開始從 Supabase 獲取 {len(story_ids)} 則新聞...")
         
-        for i, story_id in enumerate(story_ids, 1):
+        rows = []
+        for i in range(0, len(story_ids), chunk_size):
+            chunk = story_ids[i:i + chunk_size]
             try:
-                response = self.supabase.table('single_news').select(
-                    'story_id, news_title, long'
-                ).eq('story_id', story_id).execute()
-                
-                if response.data and len(response.data) > 0:
-                    news_data = response.data[0]
-                    news_items.append({
-                        'story_id': news_data.get('story_id'),
-                        'news_title': news_data.get('news_title', ''),
-                        'content': news_data.get('long', '')
-                    })
-                    print(f"✓ {i}/{len(story_ids)}: 成功獲取 story_id {story_id}")
-                else:
-                    print(f"✗ {i}/{len(story_ids)}: story_id {story_id} 未找到對應新聞")
-                    
+                rows.extend(fetch_rows_by_ids(self.supabase, 'single_news', 'story_id, news_title, long', chunk, chunk_size=chunk_size))
             except Exception as e:
-                print(f"✗ {i}/{len(story_ids)}: 獲取 story_id {story_id} 時發生錯誤: {e}")
-                
-            # 避免請求過於頻繁
-            time.sleep(3)
+                print(f"✗ 獲取第 {i + 1}–{i + len(chunk)} 則新聞時發生錯誤: {e}")
+
+        news_items = [
+            {
+                'story_id': row.get('story_id'),
+                'news_title': row.get('news_title') or '',
+                'content': row.get('long') or ''
+            }
+            for row in rows
+        ]
+        missing = len(story_ids) - len(news_items)
+        if missing:
+            print(f"✗ {missing} 則 story_id 未找到對應新聞")
         
         print(f"成功獲取 {len(news_items)} 則新聞內容")
         return news_items
     
     def group_news_by_events_ai(self, news_items):
-        """使用 Gemini AI 將新聞分組為事件分支"""
+        """以 embedding 凝聚式分群將新聞分為事件分支，Gemini 只負責為每個分支命名與摘要"""
         if not self.genai_client or not news_items:
             return self.simple_group_news(news_items)
         
-        print("開始使用 Gemini AI 分析新聞事件...")
-        
-        # 準備新聞摘要資料供模型分析
-        news_summaries = []
-        for i, news in enumerate(news_items):
-            title = news['news_title'][:100]  # 增加標題長度
-            content = news['content'][:300]   # 增加內容長度以提供更多細節
-            summary = f"新聞{i+1}：標題：{title}；內容：{content}..."
-            news_summaries.append(summary)
-        
-        # 構建提示語
-        prompt = f"""
-請分析以下 {len(news_items)} 則新聞，將它們按照**核心事件主題**進行分組。**重要原則：避免過度細分，優先創建較少但更有意義的分組。相關或相似的事件應該合併在同一組。**
-
-**分組準則：**
-1.  **共同主題或核心事件**：新聞內容圍繞同一核心事件或議題展開，才能歸為一組。
-2.  **內容相關性**：同一組內的新聞應探討事件的不同面向、發展階段或關鍵細節。
-3.  **避免過度細分**：除非新聞內容明顯不同，否則應該合併到同一個分組。優先考慮合併相關事件。
-4.  **合理組規模**：每組建議包含 2-6 則新聞，避免創建太多小分組。
-5.  **單一歸屬**：每則新聞只能屬於一個分組。
-6.  **所有新聞必須分組**：確保編號 1 到 {len(news_items)} 的每則新聞都被分配到某個分組中。
-7.  **不要創建「其他」分組**：不要創建「其他」、「其他相關新聞」、「未分類」等籠統分組。
-8.  **控制分組數量**：總分組數應該控制在 3-5 個之間，**至少需要 3 個分組**，除非新聞內容確實太過單一。
-
-新聞資料：
-{chr(10).join(news_summaries)}
+        print("開始以 embedding 分群新聞事件...")
+        clusters, centroids, matrix = self.cluster_news(news_items)
+        if not clusters:
+            print("取得 Embedding 失敗，切換到簡單分組模式...")
+            return self.simple_group_news(news_items)
+        print(f"分群完成，共分為 {len(clusters)} 個事件分支")
 
-請嚴格按照以下 JSON 格式輸出分組結果：
-{{
-  "groups": [
-    {{
-      "event_title": "**具體事件標題 (10字以內)**",
-      "event_summary": "簡潔說明該事件核心內容 (80字以內)",
-      "news_indices": [1, 2, 3, 4, 5]
-    }},
-    {{
-      "event_title": "**另一個事件標題 (10字以內)**",
-      "event_summary": "另一個事件的說明",
-      "news_indices": [6, 7, 8]
-    }}
-    // ... 更多分組（但應該盡量少）
-  ]
-}}
+        # 每個分支依與分支中心的相似度排序，取最具代表性的新聞命名
+        representatives = []
+        for cluster, centroid in zip(clusters, centroids):
+            ranked = sorted(cluster, key=lambda i: -float(matrix[i] @ centroid))
+            representatives.append([news_items[i] for i in ranked[:NAMING_SAMPLES]])
+        names = self.name_event_groups(representatives)
+
+        event_groups = []
+        for cluster_id, cluster in enumerate(clusters):
+            group_news = [news_items[i] for i in cluster]
+            title, summary = names.get(cluster_id) or (
+                representatives[cluster_id][0]['news_title'][:10] or '相關新聞事件',
+                f'包含 {len(group_news)} 則相關新聞的事件',
+            )
+            event_groups.append({
+                'event_id': str(uuid.uuid4()),
+                'event_title': title,
+                'event_summary': summary,
+                'news_count': len(group_news),
+                'news_items': group_news
+            })
+        return event_groups
+
+    @staticmethod
+    def embedding_text(news):
+        """分群用的新聞文字（標題 + 內容前 500 字）"""
+        return f"{news['news_title']}\n{(news['content'] or '')[:500]}"
+
+    def cluster_news(self, news_items):
+        """
+        以標題與內容的 embedding 分群
+
+        Returns:
+            (分支列表 [[新聞 index]], 各分支的正規化中心向量, 新聞向量矩陣)；取得 Embedding 失敗時分支列表為空
+        """
+        matrix = embed_texts(self.genai_client, [self.embedding_text(news) for news in news_items])
+        if matrix.size == 0 or not np.linalg.norm(matrix, axis=1).any():
+            return [], [], matrix
+
+        max_groups = max(1, min(EVENT_GROUP_MAX, len(news_items) // EVENT_MIN_SIZE))
+        min_groups = min(EVENT_GROUP_MIN, max_groups)
+        clusters = agglomerative_clusters(matrix, max_groups, min_groups, EVENT_MERGE_SIMILARITY)
+
+        def centroid(cluster):
+            c = matrix[cluster].sum(axis=0)
+            norm = np.linalg.norm(c)
+            return c / norm if norm > 0 else c
 
-**評估標準：**
-* **避免過度細分**：優先將相關事件合併，不要為了細分而細分。
-* **分組的實用性**：每個分組應該有足夠的新聞數量，讓讀者能看到完整的事件全貌。
-* **標題的代表性**：分組標題應該能涵蓋該組大部分新聞的主題。
-* **確保完整分配**：每個新聞編號 (1 到 {len(news_items)}) 都必須出現在某個分組的 news_indices 中。
-* **必須至少3個分組**：除非新聞總數太少或主題過於單一，否則必須創建至少 3 個不同的分組。
+        # 過小的分支併入中心最相近的分支（不建立「其他」分組）
+        while len(clusters) > min_groups:
+            small = next((k for k in range(len(clusters) - 1, -1, -1) if len(clusters[k]) < EVENT_MIN_SIZE), None)
+            if small is None:
+                break
+            members = clusters.pop(small)
+            centroids = [centroid(cluster) for cluster in clusters]
+            target = max(range(len(clusters)), key=lambda k: float(centroids[k] @ centroid(members)))
+            clusters[target] = sorted(clusters[target] + members)
+        clusters.sort(key=lambda cluster: (-len(cluster), cluster[0]))
+        return clusters, [centroid(cluster) for cluster in clusters], matrix
+
+    def name_event_groups(self, representatives):
+        """以一次結構化請求為所有分支命名，回傳 {分支編號: (標題, 概要)}（失敗時為空）"""
+        sections = []
+        for cluster_id, group_news in enumerate(representatives):
+            lines = [f"- 標題：{news['news_title'][:100]}；內容：{(news['content'] or '')[:150]}..." for news in group_news]
+            sections.append(f"分支 {cluster_id}：\n" + "\n".join(lines))
+
+        prompt = f"""
+以下是同一主題下已分好的 {len(representatives)} 個新聞事件分支，每個分支列出最具代表性的幾則新聞。
+請為每個分支各自命名並撰寫摘要，不要調整分組，也不要合併或拆分分支。
+
+{chr(10).join(sections)}
 
 **輸出要求：**
-* **僅回傳 JSON 格式的輸出**，不包含任何額外的解釋文字。
-* `event_title` 必須為**具體且精煉**的標題，長度控制在 10 字以內。
-* `news_indices` 為新聞列表中的編號，從 1 開始。
-* **分組數量應控制在 3-5 個之間**，至少需要 3 個分組。
-* **絕對不要創建「其他」或「未分類」的分組**，所有新聞都必須分配到具體的事件分組中。
+* 每個分支都要回傳一筆，cluster_id 為上方的分支編號。
+* `event_title` 必須為**具體且精煉**的事件標題，長度控制在 10 字以內，不可使用「其他」、「未分類」等籠統名稱。
+* `event_summary` 簡潔說明該事件核心內容（80字以內）。
 """
-
         try:
-            response = self.genai_client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
+            response = self.generate_content(
+                contents=prompt,
+                config=genai.types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=EventNamesResponse,
+                )
             )
-            result_text = response.text.strip()
-            
-            # 解析 JSON 結果
-            if result_text.startswith('```json'):
-                result_text = result_text[7:-3].strip()
-            elif result_text.startswith('```'):
-                result_text = result_text[3:-3].strip()
-            
-            result = json.loads(result_text)
-            groups = result.get('groups', [])
-            
-            print(f"AI 分析完成，共分為 {len(groups)} 個事件分支")
-            
-            # 轉換為最終格式，並確保每則新聞只出現在一個分支
-            event_groups = []
-            used_news_indices = set()  # 追蹤已使用的新聞索引
-            
-            for group in groups:
-                event_title = group.get('event_title', '未命名事件')
-                event_summary = group.get('event_summary', '')
-                news_indices = group.get('news_indices', [])
-                
-                # 獲取對應的新聞項目，排除已使用的新聞
-                group_news = []
-                for idx in news_indices:
-                    if 1 <= idx <= len(news_items) and idx not in used_news_indices:
-                        group_news.append(news_items[idx - 1])  # 轉換為0-based索引
-                        used_news_indices.add(idx)  # 標記為已使用
-                
-                if group_news:  # 只添加有新聞的分組
-                    event_groups.append({
-                        'event_id': str(uuid.uuid4()),
-                        'event_title': event_title,
-                        'event_summary': event_summary,
-                        'news_count': len(group_news),
-                        'news_items': group_news
-                    })
-            
-            # 檢查是否有未分配的新聞
-            all_indices = set(range(1, len(news_items) + 1))
-            unused_indices = all_indices - used_news_indices
-            
-            if unused_indices:
-                print(f"⚠ 發現 {len(unused_indices)} 則新聞未被 AI 分組，正在將其分配到最相關的分組...")
-                
-                # 將每則未分配的新聞分配到最相關的分組
-                for unused_idx in sorted(unused_indices):
-                    unused_news = news_items[unused_idx - 1]
-                    unused_title = unused_news['news_title'][:100]
-                    
-                    # 找到最相關的分組（這裡簡單地分配到第一個分組，實際可以改進為計算相似度）
-                    if event_groups:
-                        # 分配到第一個分組
-                        target_group = event_groups[0]
-                        target_group['news_items'].append(unused_news)
-                        target_group['news_count'] = len(target_group['news_items'])
-                        print(f"  • 新聞 {unused_idx} ({unused_title[:30]}...) 已分配到分組: {target_group['event_title']}")
-                    else:
-                        # 如果沒有任何分組，創建一個新分組
-                        event_groups.append({
-                            'event_id': str(uuid.uuid4()),
-                            'event_title': '相關新聞事件',
-                            'event_summary': '相關新聞事件',
-                            'news_count': 1,
-                            'news_items': [unused_news]
-                        })
-                        print(f"  • 新聞 {unused_idx} ({unused_title[:30]}...) 已建立新分組")
-            
-            return event_groups
-            
+            parsed = response.parsed or EventNamesResponse.model_validate_json(response.text)
+            return {
+                group.cluster_id: (group.event_title, group.event_summary)
+                for group in parsed.groups
+                if 0 <= group.cluster_id < len(representatives) and group.event_title
+            }
         except Exception as e:
-            print(f"AI 分析時發生錯誤: {e}")
-            print("切換到簡單分組模式...")
-            return self.simple_group_news(news_items)
+            print(f"AI 命名事件分支時發生錯誤: {e}")
+            return {}
     
     def simple_group_news(self, news_items):
         """簡單的新聞分組（不使用 AI）"""
@@ -413,7 +414,7 @@ class NewsEventGrouper:
                 # 清除現有資料（可選 - 根據需求決定）
                 # self.supabase.table('topic_branch').delete().neq('topic_id', '').execute()
                 
-                batch_size = 50
+                batch_size = 500
                 success_count = 0
                 
                 for i in range(0, len(topic_branch_data), batch_size):
@@ -436,7 +437,7 @@ class NewsEventGrouper:
                 # 清除現有資料（可選）
                 # self.supabase.table('topic_branch_news_map').delete().neq('topic_branch_id', '').execute()
                 
-                batch_size = 100
+                batch_size = 1000
                 success_count = 0
                 
                 for i in range(0, len(topic_branch_news_map_data), batch_size):
@@ -490,81 +491,44 @@ class NewsEventGrouper:
             print("未找到有效的主題分組，程式結束")
             return
         
-        # 3. 為每個主題組獲取新聞內容，然後再用 AI 做細分
-        all_topic_events = []
-        
+        # 3. 一次查出已存在於 topic_branch 的主題，跳過已處理過的主題
+        try:
+            existing_topic_ids = {
+                row['topic_id'] for row in fetch_all_rows(lambda: self.supabase.table('topic_branch').select('topic_id'))
+            }
+        except Exception as e:
+            print(f"⚠️ 查詢已存在的 topic_branch 時發生錯誤: {e}，將嘗試處理所有主題。")
+            existing_topic_ids = set()
+        pending_topics = {}
         for topic_id, story_ids in topic_groups.items():
+            if topic_id in existing_topic_ids:
+                print(f"⏩ 主題 {topic_id} 已存在於 topic_branch，跳過處理。")
+            else:
+                pending_topics[topic_id] = story_ids
+
+        # 4. 一次批次取得所有待處理主題的新聞內容，並預先批次取得 embedding
+        all_story_ids = [story_id for story_ids in pending_topics.values() for story_id in story_ids]
+        news_by_id = {news['story_id']: news for news in self.fetch_news_from_supabase(all_story_ids)}
+        if self.genai_client and news_by_id:
+            embed_texts(self.genai_client, [self.embedding_text(news) for news in news_by_id.values()])
 
+        # 5. 以有上限的 worker 池並行處理各主題（Gemini 呼叫共用速率限制器）
+        def process_topic(item):
+            topic_id, story_ids = item
+            news_items = [news_by_id[story_id] for story_id in dict.fromkeys(story_ids) if story_id in news_by_id]
             try:
-                # 檢查 topic_branch 表中是否已存在該 topic_id
-                # 使用 limit(1) 提高查詢效率，只要有一筆資料就代表已處理過
-                check_response = self.supabase.table('topic_branch').select(
-                    'topic_branch_id'
-                ).eq('topic_id', topic_id).limit(1).execute()
-                
-                if check_response.data and len(check_response.data) > 0:
-                    print(f"⏩ 主題 {topic_id} 已存在於 topic_branch，跳過處理。")
-                    continue  # 跳過本次迴圈，進行下一個 topic_id
-                    
+                return self.process_topic(topic_id, news_items)
             except Exception as e:
-                print(f"⚠️ 檢查主題 {topic_id} 是否存在時發生錯誤: {e}，將嘗試繼續處理。")
-                
-            print(f"\n處理主題 {topic_id} ({len(story_ids)} 則新聞)...")
-            
-            # 獲取該主題的新聞內容
-            news_items = self.fetch_news_from_supabase(story_ids)
-            
-            if not news_items:
-                print(f"✗ 主題 {topic_id}: 未獲取到有效新聞內容")
-                continue
-            
-            # 為該主題生成總體標題
-            topic_title = self.generate_topic_title(news_items)
-            print(f"✓ 主題 {topic_id}: {topic_title}")
-            
-            # 如果新聞數量較少（<=3則），直接作為一個分支
-            if len(news_items) <= 3:
-                topic_summary = self.generate_topic_summary(news_items)
-                topic_event = {
-                    'topic_id': topic_id,
-                    'topic_title': topic_title,
-                    'sub_events': [
-                        {
-                            'event_id': str(uuid.uuid4()),
-                            'event_title': topic_title,
-                            'event_summary': topic_summary,
-                            'news_count': len(news_items),
-                            'news_items': news_items
-                        }
-                    ]
-                }
-                all_topic_events.append(topic_event)
-                print(f"  → 單一分支: {topic_title} ({len(news_items)} 則新聞)")
-            
-            else:
-                # 新聞數量較多，使用 AI 進行細分
-                print(f"  正在對 {len(news_items)} 則新聞進行 AI 細分...")
-                sub_events = self.group_news_by_events_ai(news_items)
-                
-                # 為每個子事件添加 topic 相關資訊
-                for sub_event in sub_events:
-                    sub_event['topic_id'] = topic_id
-                
-                topic_event = {
-                    'topic_id': topic_id,
-                    'topic_title': topic_title,
-                    'sub_events': sub_events
-                }
-                all_topic_events.append(topic_event)
-                
-                print(f"  → 細分為 {len(sub_events)} 個分支:")
-                for i, sub_event in enumerate(sub_events, 1):
-                    print(f"    分支 {i}: {sub_event['event_title']} ({sub_event['news_count']} 則新聞)")
+                print(f"✗ 主題 {topic_id} 處理時發生錯誤: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS) as pool:
+            all_topic_events = [event for event in pool.map(process_topic, pending_topics.items()) if event]
         
-        # 4. 儲存結果到 JSON
+        # 6. 儲存結果到 JSON
         # self.save_to_json(all_topic_events, output_path)
         
-        # 5. 儲存到資料庫或生成預覽
+        # 7. 所有主題處理完後一次批次儲存到資料庫或生成預覽
         if save_to_db:
             save_mode = "both"  # 同時生成預覽和儲存到資料庫
             print("\n將同時生成預覽檔案並儲存到資料庫...")
@@ -574,7 +538,7 @@ class NewsEventGrouper:
         
         self.save_to_database(all_topic_events, save_mode)
         
-        # 6. 輸出統計資訊
+        # 8. 輸出統計資訊
         print("\n" + "=" * 60)
         print("處理完成 - 統計資訊")
         print("=" * 60)
@@ -596,6 +560,52 @@ class NewsEventGrouper:
         
         return all_topic_events
     
+    def process_topic(self, topic_id, news_items):
+        """處理單一主題：生成標題並細分事件分支，回傳主題事件資料（無有效新聞時回傳 None）"""
+        print(f"\n處理主題 {topic_id} ({len(news_items)} 則新聞)...")
+        if not news_items:
+            print(f"✗ 主題 {topic_id}: 未獲取到有效新聞內容")
+            return None
+        
+        # 為該主題生成總體標題
+        topic_title = self.generate_topic_title(news_items)
+        print(f"✓ 主題 {topic_id}: {topic_title}")
+        
+        # 如果新聞數量較少（<=3則），直接作為一個分支
+        if len(news_items) <= 3:
+            topic_summary = self.generate_topic_summary(news_items)
+            print(f"  → 單一分支: {topic_title} ({len(news_items)} 則新聞)")
+            return {
+                'topic_id': topic_id,
+                'topic_title': topic_title,
+                'sub_events': [
+                    {
+                        'event_id': str(uuid.uuid4()),
+                        'event_title': topic_title,
+                        'event_summary': topic_summary,
+                        'news_count': len(news_items),
+                        'news_items': news_items
+                    }
+                ]
+            }
+        
+        # 新聞數量較多，進行事件細分
+        print(f"  正在對 {len(news_items)} 則新聞進行事件細分...")
+        sub_events = self.group_news_by_events_ai(news_items)
+        
+        # 為每個子事件添加 topic 相關資訊
+        for sub_event in sub_events:
+            sub_event['topic_id'] = topic_id
+        
+        print(f"  → 主題 {topic_id} 細分為 {len(sub_events)} 個分支:")
+        for i, sub_event in enumerate(sub_events, 1):
+            print(f"    分支 {i}: {sub_event['event_title']} ({sub_event['news_count']} 則新聞)")
+        return {
+            'topic_id': topic_id,
+            'topic_title': topic_title,
+            'sub_events': sub_events
+        }
+    
     def generate_topic_title(self, news_items):
         """為整個主題生成標題"""
         if not self.genai_client or not news_items:
@@ -618,10 +628,7 @@ class NewsEventGrouper:
 """
         
         try:
-            response = self.genai_client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
+            response = self.generate_content(contents=prompt)
             title = response.text.strip().replace('"', '').replace("'", '')
             return title if len(title) <= 20 else title[:17] + "..."
             
@@ -650,10 +657,7 @@ class NewsEventGrouper:
 """
         
         try:
-            response = self.genai_client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
+            response = self.generate_content(contents=prompt)
             summary = response.text.strip()
             return summary if len(summary) <= 100 else summary[:97] + "..."
             
@@ -689,10 +693,7 @@ class NewsEventGrouper:
 """
         
         try:
-            response = self.genai_client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
+            response = self.generate_content(contents=prompt)
             result_text = response.text.strip()
             
             # 清理 JSON 格式
@@ -0,0 +1,107 @@
+"""本地預篩離線評估
+以歷史 topic_news_map 為正例（已歸入存活專題的新聞）、未歸入任何專題的新聞為負例，
+計算不同門檻下 TopicPrefilter 的召回率（正例仍交給 LLM 的比例）與略過率（負例不需呼叫 LLM 的比例），
+用來調整 classfication.py 中的 PREFILTER_LEXICAL_THRESHOLD / PREFILTER_EMBEDDING_THRESHOLD。
+
+用法:
+  python Topic/evaluate_prefilter.py --negatives 1000 --target-recall 0.98
+"""
+
+import argparse
+import os
+import random
+import sys
+
+from classfication import (
+    initialize_services, fetch_alive_topics, build_topic_profiles, TopicPrefilter,
+    PREFILTER_LEXICAL_THRESHOLD, PREFILTER_EMBEDDING_THRESHOLD,
+)
+
+# 添加父目錄到 Python 路徑，以便引用共用的 analyzer_pool
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Analyze.analyzer_pool import fetch_all_rows, fetch_rows_by_ids
+
+LEXICAL_GRID = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 15.0]
+EMBEDDING_GRID = [None, 0.45, 0.5, 0.55, 0.6, 0.65, 0.7]
+
+
+def load_dataset(supabase, negatives: int, seed: int):
+    """回傳 (存活專題, 正例新聞, 負例新聞)"""
+    topics = fetch_alive_topics(supabase).data or []
+    alive_ids = {str(topic["topic_id"]) for topic in topics}
+
+    mappings = fetch_all_rows(lambda: supabase.table("topic_news_map").select("story_id, topic_id"))
+    mapped_ids = {str(row["story_id"]) for row in mappings}
+    positive_ids = sorted({str(row["story_id"]) for row in mappings if str(row["topic_id"]) in alive_ids})
+
+    all_ids = [str(row["story_id"]) for row in fetch_all_rows(lambda: supabase.table("single_news").select("story_id"))]
+    negative_ids = [sid for sid in all_ids if sid not in mapped_ids]
+    random.Random(seed).shuffle(negative_ids)
+
+    positives = fetch_rows_by_ids(supabase, "single_news", "story_id, news_title, short", positive_ids)
+    negative_stories = fetch_rows_by_ids(supabase, "single_news", "story_id, news_title, short", negative_ids[:negatives])
+    return topics, positives, negative_stories
+
+
+def evaluate(positive_scores: list[dict], negative_scores: list[dict]) -> list[dict]:
+    """掃描門檻組合，回傳每組的召回率與略過率"""
+    results = []
+    for lexical_threshold in LEXICAL_GRID:
+        for embedding_threshold in EMBEDDING_GRID:
+            routed_pos = sum(TopicPrefilter.passes(score, lexical_threshold, embedding_threshold) for score in positive_scores)
+            routed_neg = sum(TopicPrefilter.passes(score, lexical_threshold, embedding_threshold) for score in negative_scores)
+            results.append({
+                "lexical": lexical_threshold,
+                "embedding": embedding_threshold,
+                "recall": routed_pos / len(positive_scores) if positive_scores else 1.0,
+                "skip_rate": 1 - routed_neg / len(negative_scores) if negative_scores else 0.0,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地預篩離線評估（以 topic_news_map 歷史資料計算召回率）")
+    parser.add_argument("--negatives", type=int, default=1000, help="抽樣的負例新聞數（預設 1000）")
+    parser.add_argument("--target-recall", type=float, default=0.98, help="建議門檻時要求的最低召回率（預設 0.98）")
+    parser.add_argument("--seed", type=int, default=42, help="負例抽樣的亂數種子")
+    parser.add_argument("--no-embedding", action="store_true", help="只評估詞彙比對（不呼叫 embedding API）")
+    args = parser.parse_args()
+
+    supabase, gemini = initialize_services()
+    topics, positives, negatives = load_dataset(supabase, args.negatives, args.seed)
+    print(f"存活專題 {len(topics)} 個，正例 {len(positives)} 篇，負例 {len(negatives)} 篇")
+    if not topics or not positives:
+        print("沒有可評估的歷史資料")
+        return
+
+    topic_profiles = build_topic_profiles(gemini, topics, supabase)
+    prefilter = TopicPrefilter(topic_profiles, None if args.no_embedding else gemini)
+    positive_scores = prefilter.score_stories(positives)
+    negative_scores = prefilter.score_stories(negatives)
+
+    results = evaluate(positive_scores, negative_scores)
+    if args.no_embedding:
+        results = [r for r in results if r["embedding"] is None]
+
+    print(f"\n{'lexical':>8} {'embedding':>10} {'recall':>8} {'skip':>8}")
+    for r in results:
+        embedding = "-" if r["embedding"] is None else f"{r['embedding']:.2f}"
+        print(f"{r['lexical']:>8.1f} {embedding:>10} {r['recall']:>8.3f} {r['skip_rate']:>8.3f}")
+
+    current = next((r for r in results
+                    if r["lexical"] == PREFILTER_LEXICAL_THRESHOLD and r["embedding"] == PREFILTER_EMBEDDING_THRESHOLD), None)
+    if current:
+        print(f"\n目前門檻 lexical={PREFILTER_LEXICAL_THRESHOLD}, embedding={PREFILTER_EMBEDDING_THRESHOLD}："
+              f"召回率 {current['recall']:.3f}，略過率 {current['skip_rate']:.3f}")
+
+    eligible = [r for r in results if r["recall"] >= args.target_recall]
+    if eligible:
+        best = max(eligible, key=lambda r: (r["skip_rate"], r["recall"]))
+        print(f"建議門檻（召回率 ≥ {args.target_recall}）：lexical={best['lexical']}, embedding={best['embedding']}，"
+              f"召回率 {best['recall']:.3f}，略過率 {best['skip_rate']:.3f}")
+    else:
+        print(f"沒有門檻組合能達到召回率 {args.target_recall}")
+
+
+if __name__ == "__main__":
+    main()
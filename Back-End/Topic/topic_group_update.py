@@ -8,7 +8,12 @@ import sys
 import json
 import uuid
 from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
+from pydantic import BaseModel
+
+# 添加父目錄到 Python 路徑，以便引用共用的 vector_index
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 載入環境變數
 load_dotenv()
@@ -39,6 +44,29 @@ except ImportError:
     print("請先安裝 google-genai SDK：pip install google-generativeai")
     sys.exit(1)
 
+try:
+    import numpy as np
+    from vector_index import embed_texts, normalize_rows
+except ImportError:
+    print("請先安裝 numpy：pip install numpy")
+    sys.exit(1)
+
+OTHER_BRANCH_TITLE = '其他相關新聞'
+BRANCH_MATCH_SIMILARITY = 0.60    # 與最近分支中心的相似度達此值且領先第二名足夠多時，直接分配
+BRANCH_MATCH_MARGIN = 0.05        # 第一名與第二名分支的相似度差距低於此值時，交給 LLM 判斷
+BRANCH_REJECT_SIMILARITY = 0.40   # 與所有分支的相似度都低於此值時，直接歸入「其他新聞」
+ADJUDICATION_BATCH_SIZE = 8       # 每次 LLM 判斷的新聞數
+
+
+class BranchDecision(BaseModel):
+    news_index: int
+    branch_index: Optional[int] = None
+    confidence: float = 0.0
+    reason: str = ""
+
+class BranchDecisionsResponse(BaseModel):
+    decisions: list[BranchDecision]
+
 
 class NewsBranchUpdater:
     """新聞分支更新器"""
@@ -208,119 +236,174 @@ class NewsBranchUpdater:
             print(f"✗ 獲取現有分支時發生錯誤: {e}")
             return []
     
-    def match_news_to_branch(self, new_news, existing_branches):
+    @staticmethod
+    def news_text(news):
+        """embedding 用的新聞文字（標題 + 內容前 500 字）"""
+        return f"{news['news_title']}\n{(news['content'] or '')[:500]}"
+
+    def branch_centroids(self, branches):
         """
-        使用 AI 判斷新聞是否適合現有分支
-        
+        以分支內新聞（與分支標題、描述）的 embedding 計算正規化中心向量
+
+        新聞 embedding 存在本地 embedding 儲存庫，每次執行只需 embed 新文字。
+        Returns:
+            (n_branches, d) 矩陣；無法取得 embedding 的分支為 0 向量
+        """
+        texts = []
+        owners = []
+        for i, branch in enumerate(branches):
+            texts.append(f"{branch['topic_branch_title']}\n{branch['topic_branch_content'] or ''}")
+            owners.append(i)
+            for news in branch['news_items']:
+                texts.append(self.news_text(news))
+                owners.append(i)
+        vectors = embed_texts(self.genai_client, texts)
+        if vectors.size == 0:
+            return np.zeros((len(branches), 0), dtype=np.float32)
+        sums = np.zeros((len(branches), vectors.shape[1]), dtype=np.float32)
+        np.add.at(sums, owners, vectors)
+        return normalize_rows(sums)
+
+    def assign_news_to_branches(self, news_list, existing_branches):
+        """
+        以分支中心向量分配新聞，只有模稜兩可的新聞才交給 LLM 批次判斷
+
+        1. 與最近分支中心相似度 ≥ BRANCH_MATCH_SIMILARITY 且領先第二名 ≥ BRANCH_MATCH_MARGIN：直接分配
+        2. 與所有分支相似度 < BRANCH_REJECT_SIMILARITY：不匹配（歸入「其他新聞」）
+        3. 其餘：每 ADJUDICATION_BATCH_SIZE 則新聞一次 LLM 請求，於前兩名候選分支中判斷
+        「其他新聞」分支不參與比對。
+
+        Returns:
+            與 news_list 對齊的 [(matched_branch_id, confidence)]，不匹配時為 (None, confidence)
+        """
+        results = [(None, 0)] * len(news_list)
+        branches = [b for b in existing_branches if b['topic_branch_title'] != OTHER_BRANCH_TITLE]
+        if not self.genai_client or not branches or not news_list:
+            return results
+
+        centroids = self.branch_centroids(branches)
+        queries = embed_texts(self.genai_client, [self.news_text(news) for news in news_list])
+        if centroids.size == 0 or queries.size == 0 or centroids.shape[1] != queries.shape[1]:
+            print("  ✗ 無法取得 Embedding，改由 LLM 判斷所有新聞")
+            ambiguous = [(i, list(range(len(branches)))) for i in range(len(news_list))]
+        else:
+            ambiguous = []
+            for i, (news, scores) in enumerate(zip(news_list, queries @ centroids.T)):
+                if not queries[i].any():
+                    ambiguous.append((i, list(range(len(branches)))))
+                    continue
+                order = np.argsort(-scores)
+                best = float(scores[order[0]])
+                margin = best - float(scores[order[1]]) if len(order) > 1 else 1.0
+                if best < BRANCH_REJECT_SIMILARITY:
+                    print(f"  [{news['news_title'][:30]}] 與所有分支相似度過低 ({best:.2f})")
+                    results[i] = (None, best)
+                elif best >= BRANCH_MATCH_SIMILARITY and margin >= BRANCH_MATCH_MARGIN:
+                    print(f"  [{news['news_title'][:30]}] → {branches[order[0]]['topic_branch_title']} (相似度 {best:.2f})")
+                    results[i] = (branches[order[0]]['topic_branch_id'], best)
+                else:
+                    ambiguous.append((i, [int(k) for k in order[:2]]))
+
+        print(f"  向量比對完成：{len(news_list) - len(ambiguous)} 則直接判定，{len(ambiguous)} 則交給 AI 判斷")
+        for start in range(0, len(ambiguous), ADJUDICATION_BATCH_SIZE):
+            batch = ambiguous[start:start + ADJUDICATION_BATCH_SIZE]
+            decisions = self.adjudicate_news_batch([news_list[i] for i, _ in batch], [c for _, c in batch], branches)
+            for (i, _), decision in zip(batch, decisions):
+                results[i] = decision
+        return results
+
+    def adjudicate_news_batch(self, news_batch, candidates, branches):
+        """
+        以一次 LLM 請求判斷多則新聞各自屬於哪個候選分支
+
         Args:
-            new_news: 新新聞資訊 (dict)
-            existing_branches: 現有分支列表
-            
+            news_batch: 新聞列表
+            candidates: 與 news_batch 對齊的候選分支 index 列表（branches 中的位置）
+            branches: 分支列表（不含「其他新聞」）
+
         Returns:
-            (matched_branch_id, confidence_score) 或 (None, 0) 表示不匹配
+            與 news_batch 對齊的 [(matched_branch_id, confidence)]
         """
-        if not self.genai_client or not existing_branches:
-            return None, 0
-        
-        print(f"\n使用 AI 分析新聞: {new_news['news_title'][:30]}...")
-        
-        # 準備分支資訊
+        used = sorted({k for c in candidates for k in c})
         branches_info = []
-        for i, branch in enumerate(existing_branches):
-            # 取前3則新聞作為代表，包含完整標題和內容摘要
-            sample_news = branch['news_items'][:3]
-            news_samples = []
-            for news in sample_news:
-                # 包含完整標題和內容前300字
-                news_samples.append(
-                    f"- 標題: {news['news_title']}\n"
-                    f"  內容摘要: {news['content'][:300]}..."
-                )
-            
-            branch_info = f"""
-分支 {i+1}:
-標題: {branch['topic_branch_title']}
-描述: {branch['topic_branch_content']}
-現有新聞數: {branch['news_count']}
-範例新聞:
-{chr(10).join(news_samples)}
-"""
-            branches_info.append(branch_info)
-        
-        # 準備新聞完整內容（根據內容長度決定是否截斷）
-        news_content = new_news['content']
-        # 如果內容超過 3000 字，取前 3000 字以避免 token 超限
-        if len(news_content) > 3000:
-            news_content = news_content[:3000] + "...\n(內容過長，已截取前 3000 字)"
-            print(f"  ⚠️ 新聞內容過長 ({len(new_news['content'])} 字)，已截取前 3000 字進行分析")
-        
-        # 構建 prompt
-        prompt = f"""
-請判斷以下新聞是否適合加入現有的任一分支中。
+        for k in used:
+            branch = branches[k]
+            sample_titles = "\n".join(f"- {news['news_title']}" for news in branch['news_items'][:3])
+            branches_info.append(
+                f"分支 {k + 1}:\n標題: {branch['topic_branch_title']}\n描述: {branch['topic_branch_content']}\n"
+                f"範例新聞標題:\n{sample_titles}"
+            )
+        news_info = []
+        for j, (news, candidate) in enumerate(zip(news_batch, candidates), 1):
+            content = (news['content'] or '')[:800]
+            news_info.append(
+                f"新聞 {j}（候選分支: {', '.join(str(k + 1) for k in candidate)}）:\n"
+                f"標題: {news['news_title']}\n內容摘要: {content}..."
+            )
 
-**新聞資訊:**
-標題: {new_news['news_title']}
-完整內容: 
-{news_content}
+        prompt = f"""
+請判斷以下每則新聞是否適合加入其候選分支中的某一個分支。
 
 **現有分支:**
 {chr(10).join(branches_info)}
 
-請分析這則新聞的主題、內容和現有分支的相關性，然後以 JSON 格式回答:
+**新聞:**
+{chr(10).join(news_info)}
 
-{{
-  "matched": true/false,
-  "branch_index": 1-{len(existing_branches)} 或 null,
-  "confidence": 0.0-1.0,
-  "reason": "判斷理由（50字以內）"
-}}
+請為每則新聞回傳一筆判斷：
+- news_index: 新聞編號（1-{len(news_batch)}）
+- branch_index: 只能從該則新聞的候選分支中選；都不適合時為 null
+- confidence: 0.0-1.0
+- reason: 判斷理由（50字以內）
 
 **判斷標準:**
 1. 新聞主題與分支核心主題高度相關 (confidence > 0.7)
 2. 新聞可以為該分支提供新的發展或角度 (confidence > 0.6)
 3. 新聞與分支現有新聞有明確關聯 (confidence > 0.5)
-4. 如果相關性較低 (confidence < 0.5)，設定 matched 為 false
-
-只回傳 JSON，不要其他說明。
+4. 如果相關性較低 (confidence < 0.5)，branch_index 設為 null
 """
-        
+        results = [(None, 0)] * len(news_batch)
         try:
             response = self.genai_client.models.generate_content(
                 model='gemini-2.5-flash',
                 contents=prompt,
                 config=types.GenerateContentConfig(
-                    temperature=0.0
+                    temperature=0.0,
+                    response_mime_type="application/json",
+                    response_schema=BranchDecisionsResponse,
                 )
             )
-            result_text = response.text.strip()
-            
-            # 解析 JSON
-            if result_text.startswith('```json'):
-                result_text = result_text[7:-3].strip()
-            elif result_text.startswith('```'):
-                result_text = result_text[3:-3].strip()
-            
-            result = json.loads(result_text)
-            
-            matched = result.get('matched', False)
-            branch_index = result.get('branch_index')
-            confidence = result.get('confidence', 0.0)
-            reason = result.get('reason', '')
-            
-            print(f"  AI 判斷: {'匹配' if matched else '不匹配'}")
-            if matched and branch_index:
-                branch = existing_branches[branch_index - 1]
-                print(f"  匹配分支: {branch['topic_branch_title']}")
-                print(f"  信心度: {confidence:.2f}")
-                print(f"  理由: {reason}")
-                return branch['topic_branch_id'], confidence
-            else:
-                print(f"  理由: {reason}")
-                return None, confidence
-                
+            parsed = response.parsed or BranchDecisionsResponse.model_validate_json(response.text)
         except Exception as e:
-            print(f"  ✗ AI 分析時發生錯誤: {e}")
-            return None, 0
+            print(f"  ✗ AI 批次判斷時發生錯誤: {e}")
+            return results
+
+        for decision in parsed.decisions:
+            j = decision.news_index - 1
+            if not 0 <= j < len(news_batch):
+                continue
+            k = decision.branch_index - 1 if decision.branch_index else None
+            title = news_batch[j]['news_title'][:30]
+            if k is not None and k in candidates[j]:
+                print(f"  [{title}] AI 判斷 → {branches[k]['topic_branch_title']} (信心度 {decision.confidence:.2f}，{decision.reason})")
+                results[j] = (branches[k]['topic_branch_id'], decision.confidence)
+            else:
+                print(f"  [{title}] AI 判斷不匹配：{decision.reason}")
+                results[j] = (None, decision.confidence)
+        return results
+
+    def match_news_to_branch(self, new_news, existing_branches):
+        """
+        判斷單則新聞是否適合現有分支（向量比對，模稜兩可時由 AI 判斷）
+        
+        Args:
+            new_news: 新新聞資訊 (dict)
+            existing_branches: 現有分支列表
+            
+        Returns:
+            (matched_branch_id, confidence_score) 或 (None, 0) 表示不匹配
+        """
+        return self.assign_news_to_branches([new_news], existing_branches)[0]
     
     def get_or_create_other_branch(self, topic_id, test_mode=False):
         """
@@ -337,7 +420,7 @@ class NewsBranchUpdater:
             # 1. 檢查是否已有「其他新聞」分支
             response = self.supabase.table('topic_branch').select(
                 'topic_branch_id'
-            ).eq('topic_id', topic_id).eq('topic_branch_title', '其他相關新聞').execute()
+            ).eq('topic_id', topic_id).eq('topic_branch_title', OTHER_BRANCH_TITLE).execute()
             
             if response.data and len(response.data) > 0:
                 branch_id = response.data[0]['topic_branch_id']
@@ -356,7 +439,7 @@ class NewsBranchUpdater:
             branch_data = {
                 'topic_id': topic_id,
                 'topic_branch_id': new_branch_id,
-                'topic_branch_title': '其他相關新聞',
+                'topic_branch_title': OTHER_BRANCH_TITLE,
                 'topic_branch_content': '包含與主題相關但不屬於其他特定分支的新聞'
             }
             
@@ -427,7 +510,7 @@ class NewsBranchUpdater:
             # 1. 找到「其他新聞」分支
             response = self.supabase.table('topic_branch').select(
                 'topic_branch_id, topic_branch_title'
-            ).eq('topic_id', topic_id).eq('topic_branch_title', '其他相關新聞').execute()
+            ).eq('topic_id', topic_id).eq('topic_branch_title', OTHER_BRANCH_TITLE).execute()
             
             if not response.data:
                 print("✓ 該主題沒有「其他新聞」分支")
@@ -663,16 +746,17 @@ class NewsBranchUpdater:
         # 2. 獲取現有分支
         existing_branches = self.fetch_existing_branches(topic_id)
         
-        # 3. 處理每則新聞
+        # 3. 以分支中心向量一次判斷所有新聞（模稜兩可的才批次交給 AI）
+        print(f"\n比對 {len(new_news_list)} 則新聞與現有分支...")
+        assignments = self.assign_news_to_branches(new_news_list, existing_branches)
+
+        # 4. 分配每則新聞
         matched_count = 0
         other_count = 0
         
-        for i, news in enumerate(new_news_list, 1):
+        for i, (news, (matched_branch_id, confidence)) in enumerate(zip(new_news_list, assignments), 1):
             print(f"\n[{i}/{len(new_news_list)}] 處理新聞: {news['news_title'][:40]}...")
             
-            # 嘗試匹配現有分支
-            matched_branch_id, confidence = self.match_news_to_branch(news, existing_branches)
-            
             if matched_branch_id and confidence >= confidence_threshold:
                 # 分配到匹配的分支
                 if self.assign_news_to_branch(news['story_id'], matched_branch_id, test_mode):
@@ -685,7 +769,7 @@ class NewsBranchUpdater:
                     if self.assign_news_to_branch(news['story_id'], other_branch_id, test_mode):
                         other_count += 1
         
-        # 4. 輸出統計
+        # 5. 輸出統計
         print("\n" + "=" * 60)
         print("處理完成 - 統計資訊")
         print("=" * 60)
@@ -702,7 +786,7 @@ class NewsBranchUpdater:
             'failed_count': len(new_news_list) - matched_count - other_count
         }
         
-        # 5. 分析「其他新聞」分支是否可組成新分支
+        # 6. 分析「其他新聞」分支是否可組成新分支
         if analyze_other_branch:
             print("\n" + "=" * 60)
             print("檢查「其他新聞」分支")
@@ -731,7 +815,7 @@ class NewsBranchUpdater:
                     else:
                         print("✓ 已跳過創建新分支")
         
-        # 6. 更新主題的 update_date
+        # 7. 更新主題的 update_date
         # 只有在非測試模式，且確實有新聞變動（有匹配、有新增到其他、或有創建新分支）時才更新
         has_changes = (
             matched_count > 0 or 
@@ -866,7 +950,7 @@ class NewsBranchUpdater:
                         cohesion_score = analysis['cohesion_score']
                         
                         # 跳過「其他新聞」分支本身
-                        if branch['topic_branch_title'] == '其他相關新聞':
+                        if branch['topic_branch_title'] == OTHER_BRANCH_TITLE:
                             continue
                         
                         # 如果內聚性過低，移動新聞
@@ -0,0 +1,163 @@
+"""
+本地 embedding 儲存庫：內容雜湊 → float32 向量
+
+每個命名空間（模型 + task_type）一個目錄：
+  vectors.f32  - 依列附加的 float32 原始資料，以 np.memmap 唯讀映射（查詢不複製）
+  index.tsv    - 每行「內容雜湊<TAB>列號」，僅附加
+  meta.json    - 模型、task_type 與向量維度
+
+同一段文字在同一命名空間中只會被 embed 一次；Attribution、Relative 等相似度計算共用此儲存庫。
+寫入以執行緒鎖保護，請避免多個程序同時寫入同一命名空間。
+
+用法（子目錄腳本）:
+  sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+  from embedding_store import EmbeddingStore
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_ROOT = os.getenv("EMBEDDING_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embeddings"))
+
+
+def content_hash(text: str) -> str:
+    """以 sha256 計算內容雜湊"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """以內容雜湊為鍵、memmap 為儲存的 embedding 快取"""
+
+    def __init__(self, model: str, task_type: str = "", root: Optional[str] = None):
+        """
+        Args:
+            model: embedding 模型名稱（不同模型的向量不可混用）
+            task_type: embedding task_type（例如 RETRIEVAL_DOCUMENT / RETRIEVAL_QUERY）
+            root: 儲存根目錄，預設為 Back-End/embeddings 或環境變數 EMBEDDING_STORE_DIR
+        """
+        self.model = model
+        self.task_type = task_type
+        namespace = re.sub(r"[^\w.-]+", "_", f"{model}__{task_type}" if task_type else model)
+        self.path = os.path.join(root or DEFAULT_ROOT, namespace)
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._index_path = os.path.join(self.path, "index.tsv")
+        self._meta_path = os.path.join(self.path, "meta.json")
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._mmap: Optional[np.memmap] = None
+        self._mmap_rows = 0
+        self.dim: Optional[int] = None
+        self._load()
+
+    # ===== 載入與映射 =====
+    def _load(self):
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f).get("dim")
+
+        rows_on_disk = self._rows_on_disk()
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as f:
+                for line in f:
+                    key, _, row = line.rstrip("\n").partition("\t")
+                    # 向量先寫、索引後寫；中斷時可能留下超出向量檔的索引，直接忽略
+                    if row.isdigit() and int(row) < rows_on_disk:
+                        self._index[key] = int(row)
+
+    def _rows_on_disk(self) -> int:
+        if not self.dim or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+    def _vectors(self) -> np.ndarray:
+        """取得目前所有向量的唯讀 memmap（有新資料寫入時重新映射）"""
+        rows = self._rows_on_disk()
+        if self._mmap is None or self._mmap_rows != rows:
+            if rows == 0:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._mmap_rows = rows
+        return self._mmap
+
+    # ===== 查詢 =====
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, text: str) -> bool:
+        return content_hash(text) in self._index
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """取得單段文字的向量（memmap 上的唯讀 view，不複製），不存在時回傳 None"""
+        row = self._index.get(content_hash(text))
+        if row is None:
+            return None
+        return self._vectors()[row]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """批次取得向量，不存在的位置為 None"""
+        vectors = self._vectors() if self._index else None
+        out: List[Optional[np.ndarray]] = []
+        for text in texts:
+            row = self._index.get(content_hash(text))
+            out.append(None if row is None else vectors[row])
+        return out
+
+    # ===== 寫入 =====
+    def add(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """附加新向量；已存在或空向量的項目會被略過"""
+        with self._lock:
+            new_keys: List[str] = []
+            new_vectors: List[np.ndarray] = []
+            for text, vector in zip(texts, vectors):
+                if vector is None or len(vector) == 0:
+                    continue
+                key = content_hash(text)
+                if key in self._index or key in new_keys:
+                    continue
+                arr = np.asarray(vector, dtype=np.float32)
+                if self.dim is None:
+                    self.dim = int(arr.shape[0])
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"model": self.model, "task_type": self.task_type, "dim": self.dim}, f)
+                if arr.shape[0] != self.dim:
+                    raise ValueError(f"向量維度不符：預期 {self.dim}，實際 {arr.shape[0]}")
+                new_keys.append(key)
+                new_vectors.append(arr)
+
+            if not new_keys:
+                return
+
+            start_row = self._rows_on_disk()
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(new_vectors).tobytes())
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                for offset, key in enumerate(new_keys):
+                    f.write(f"{key}\t{start_row + offset}\n")
+            for offset, key in enumerate(new_keys):
+                self._index[key] = start_row + offset
+
+    def get_or_embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[Optional[np.ndarray]]:
+        """
+        取得向量，只對尚未儲存的文字呼叫 embed_fn（同一批中重複的文字只 embed 一次）
+
+        Args:
+            texts: 要取得向量的文字
+            embed_fn: 接收文字列表、回傳對齊向量列表的函式；失敗項目可回傳空列表
+
+        Returns:
+            與 texts 對齊的向量列表，embed 失敗的位置為 None
+        """
+        cached = self.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        if missing:
+            self.add(missing, embed_fn(missing))
+            cached = self.get_many(texts)
+        return cached
@@ -0,0 +1,644 @@
+"""
+共用翻譯引擎：新聞（Translate/Translate.py）與專題（Topic/translate_topic.py）共用
+
+  TableDescriptor  - 資料表描述：更新鍵、來源欄位、目標欄位（{field}_{lang}_lang）與查詢範圍欄位
+  REGISTRY         - 所有需要翻譯的資料表；STORY_TABLES / TOPIC_TABLES 為兩個腳本各自處理的範圍
+  TranslationEngine- 翻譯債查詢 → 批次結構化翻譯（含翻譯記憶）→ 依資料列寫回，以及心智圖整棵翻譯
+
+用法（子目錄腳本）:
+  sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+  from translation_engine import TranslationEngine, STORY_TABLES
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import postgrest.exceptions
+from google.genai import types
+from pydantic import BaseModel
+
+class MindMapNode(BaseModel):
+    id: str
+    label: str
+    description: str
+
+class MindMapDetailGroup(BaseModel):
+    key: str
+    nodes: list[MindMapNode]
+
+class MindMapTreeResponse(BaseModel):
+    center_node: MindMapNode
+    main_nodes: list[MindMapNode]
+    detailed_nodes: list[MindMapDetailGroup]
+
+class MindMapNodesResponse(BaseModel):
+    nodes: list[MindMapNode]
+
+def mind_map_node_slots(mind_map_detail):
+    """列出心智圖所有節點的 (位置, 節點)，位置為 ("center",) / ("main", i) / ("detailed", key, i)"""
+    slots = [(("center",), mind_map_detail.get("center_node", {}) or {})]
+    slots += [(("main", i), node) for i, node in enumerate(mind_map_detail.get("main_nodes", []) or [])]
+    for key, nodes in (mind_map_detail.get("detailed_nodes", {}) or {}).items():
+        slots += [(("detailed", key, i), node) for i, node in enumerate(nodes)]
+    return slots
+
+def mind_map_translated(translated_detail, mind_map_detail):
+    """檢查已存在的翻譯是否與原心智圖節點一一對應且皆不為空"""
+    if not translated_detail:
+        return False
+    translated = {slot: node for slot, node in mind_map_node_slots(translated_detail)}
+    for slot, _ in mind_map_node_slots(mind_map_detail):
+        node = translated.get(slot) or {}
+        if not node.get("label") or not node.get("description"):
+            return False
+    return True
+
+class TranslatedSegment(BaseModel):
+    id: str
+    text: str
+
+class BatchTranslationResponse(BaseModel):
+    segments: list[TranslatedSegment]
+
+# 提示詞中使用的語言名稱（沿用原本 id → indonesia 的寫法）
+LANG_NAMES = {"en": "en", "id": "indonesia", "jp": "jp"}
+BATCH_MAX_CHARS = 20000     # 單次批次翻譯請求的原文字數上限
+BATCH_MAX_SEGMENTS = 150    # 單次批次翻譯請求的段落數上限
+JOB_BATCH_SIZE = 100        # 每批寫回前累積的資料列數
+TRANSLATE_WORKERS = int(os.getenv("TRANSLATE_WORKERS", "6"))  # 同時進行的翻譯請求上限（所有語言共用）
+MEMORY_MAX_CHARS = 80       # 不超過此長度的文字（關鍵字、術語、角色名稱等）使用翻譯記憶
+MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.jsonl"))
+
+def split_segments(segments, max_chars=BATCH_MAX_CHARS, max_segments=BATCH_MAX_SEGMENTS):
+    """依字數與段落數上限將段落切成多個請求（超長段落單獨成一個請求）"""
+    chunk, chunk_chars = [], 0
+    for seg_id, text in segments:
+        if chunk and (chunk_chars + len(text) > max_chars or len(chunk) >= max_segments):
+            yield chunk
+            chunk, chunk_chars = [], 0
+        chunk.append((seg_id, text))
+        chunk_chars += len(text)
+    if chunk:
+        yield chunk
+
+class TranslationMemory:
+    """
+    翻譯記憶：(原文, 目標語言) → 譯文，同時保存在本地 JSON Lines 檔與 Supabase translation_memory 表。
+    查詢時先查本地，再向 Supabase 批次查詢；新譯文同時寫入兩邊，讓重複出現的短字串只翻譯一次。
+
+    Supabase 資料表：
+      translation_memory(source_hash text, lang text, source text, translation text,
+                         UNIQUE (source_hash, lang))
+    資料表不存在或無法連線時只使用本地檔案。
+    """
+
+    def __init__(self, supabase, path=MEMORY_PATH, table="translation_memory"):
+        self.supabase = supabase
+        self.path = path
+        self.table = table
+        self.remote_enabled = supabase is not None
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                        self._entries[(item["source_hash"], item["lang"])] = item["translation"]
+                    except (ValueError, KeyError):
+                        continue
+
+    @staticmethod
+    def source_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _disable_remote(self, e):
+        if self.remote_enabled:
+            print(f"[warn] 無法使用 Supabase {self.table}，僅使用本地翻譯記憶: {e}")
+        self.remote_enabled = False
+
+    def lookup(self, texts, lang):
+        """回傳 {原文: 譯文}，只包含記憶中已有的項目"""
+        hashes = {text: self.source_hash(text) for text in dict.fromkeys(texts)}
+        found = {text: self._entries[(h, lang)] for text, h in hashes.items() if (h, lang) in self._entries}
+
+        missing = [h for text, h in hashes.items() if text not in found]
+        if missing and self.remote_enabled:
+            remote = []
+            try:
+                for i in range(0, len(missing), 200):
+                    remote.extend(self.supabase.table(self.table).select("source_hash,source,translation")
+                                  .eq("lang", lang).in_("source_hash", missing[i:i + 200]).execute().data or [])
+            except Exception as e:
+                self._disable_remote(e)
+            # 遠端找到的項目也存到本地，下次不必再查詢
+            self._store_local([(item["source"], item["translation"]) for item in remote if item.get("translation")], lang)
+            found.update({text: self._entries[(h, lang)] for text, h in hashes.items()
+                          if text not in found and (h, lang) in self._entries})
+        return found
+
+    def _store_local(self, pairs, lang):
+        with self._lock:
+            new_items = []
+            for source, translation in pairs:
+                key = (self.source_hash(source), lang)
+                if key not in self._entries:
+                    self._entries[key] = translation
+                    new_items.append({"source_hash": key[0], "lang": lang, "source": source, "translation": translation})
+            if new_items:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in new_items:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        return new_items
+
+    def add(self, pairs, lang):
+        """新增 [(原文, 譯文)] 到本地與 Supabase"""
+        new_items = self._store_local([(s, t) for s, t in pairs if s and t], lang)
+        if new_items and self.remote_enabled:
+            try:
+                self.supabase.table(self.table).upsert(new_items, on_conflict="source_hash,lang", ignore_duplicates=True).execute()
+            except Exception as e:
+                self._disable_remote(e)
+
+class RowJob:
+    """一筆資料列在某語言下的翻譯工作：待翻譯段落與寫回方式"""
+
+    def __init__(self, table, match, segments, build_update=None, label=""):
+        self.table = table
+        self.match = match              # 更新時的 eq 條件 {column: value}
+        self.segments = segments        # {段落名稱: 原文}
+        self.build_update = build_update or (lambda lang, t: {f"{name}_{lang}_lang": t[name] for name in t})
+        self.label = label
+
+class TableDescriptor:
+    """需要翻譯的資料表描述"""
+
+    def __init__(self, table, key_columns, fields, scope_column, segments=None, build_update=None,
+                 one_per=None, scope_via=None):
+        """
+        Args:
+            table: 資料表名稱
+            key_columns: 寫回時的 eq 條件欄位
+            fields: 來源欄位，目標欄位為 {field}_{lang}_lang，任一目標欄位為 null 即視為翻譯債
+            scope_column: 依 id 限定範圍時比對的欄位（story_id / src_story_id / topic_id ...）
+            segments: row → {段落名稱: 原文}，預設為每個來源欄位一段
+            build_update: (row, lang, 譯文 dict) → update 內容，預設寫入 {段落名稱}_{lang}_lang
+            one_per: 同一值只處理第一筆資料列（例如每則新聞只有一組立場）
+            scope_via: (對照表, 對照表中的 id 欄位)：以新聞 id 經對照表取得本表的 scope_column 值
+        """
+        self.table = table
+        self.key_columns = key_columns
+        self.fields = fields
+        self.scope_column = scope_column
+        self.segments = segments or (lambda row: {field: row.get(field) or "" for field in fields})
+        self.build_update = build_update
+        self.one_per = one_per
+        self.scope_via = scope_via
+
+    def target_columns(self, lang_list):
+        return [f"{field}_{lang}_lang" for field in self.fields for lang in lang_list]
+
+    def select_columns(self, lang_list):
+        return ",".join(dict.fromkeys(self.key_columns + [self.scope_column] + self.fields + self.target_columns(lang_list)))
+
+    def missing_langs(self, row, lang_list):
+        """回傳任一目標欄位仍為 null 的語言"""
+        return [lang for lang in lang_list if any(row.get(f"{field}_{lang}_lang") is None for field in self.fields)]
+
+    def jobs_for(self, rows, lang_list):
+        """將資料列轉成 {lang: [RowJob]}"""
+        jobs = {lang: [] for lang in lang_list}
+        seen = set()
+        for row in rows:
+            if self.one_per:
+                if row.get(self.one_per) in seen:
+                    continue
+                seen.add(row.get(self.one_per))
+            match = {column: row.get(column) for column in self.key_columns}
+            label = " ".join(f"{column} '{value}'" for column, value in match.items()) + " "
+            segments = self.segments(row)
+            build_update = None
+            if self.build_update:
+                build_update = lambda lang, t, row=row: self.build_update(row, lang, t)
+            for lang in self.missing_langs(row, lang_list):
+                jobs[lang].append(RowJob(self.table, match, segments, build_update, label))
+        return jobs
+
+def list_segments(*fields):
+    """list[str] 欄位的每個元素各為一段（立場的正反論點）"""
+    def segments(row):
+        return {f"{field}.{i}": text for field in fields for i, text in enumerate(row.get(field) or [])}
+    return segments
+
+def list_update(*fields):
+    def build_update(row, lang, t):
+        return {f"{field}_{lang}_lang": [t[f"{field}.{i}"] for i in range(len(row.get(field) or []))] for field in fields}
+    return build_update
+
+def analyze_segments(row):
+    analyze = row.get("analyze") or {}
+    return {"Role": analyze.get("Role", ""), "Analyze": analyze.get("Analyze", "")}
+
+def analyze_update(row, lang, t):
+    category = (row.get("analyze") or {}).get("Category", "")
+    return {f"analyze_{lang}_lang": {"Category": category, "Role": t["Role"], "Analyze": t["Analyze"]}}
+
+REGISTRY = {
+    # 新聞
+    "single_news": TableDescriptor("single_news", ["story_id"], ["news_title", "ultra_short", "long"], "story_id"),
+    "relative_news": TableDescriptor("relative_news", ["src_story_id", "dst_story_id"], ["reason"], "src_story_id"),
+    "relative_topics": TableDescriptor("relative_topics", ["src_story_id", "dst_topic_id"], ["reason"], "src_story_id"),
+    "term": TableDescriptor("term", ["term_id"], ["term", "definition", "example"], "term_id", scope_via=("term_map", "story_id")),
+    "position": TableDescriptor("position", ["story_id"], ["positive", "negative"], "story_id",
+                                list_segments("positive", "negative"), list_update("positive", "negative"), one_per="story_id"),
+    "pro_analyze": TableDescriptor("pro_analyze", ["analyze_id"], ["analyze"], "story_id", analyze_segments, analyze_update),
+    "generated_image": TableDescriptor("generated_image", ["story_id"], ["description"], "story_id", one_per="story_id"),
+    "keywords_map": TableDescriptor("keywords_map", ["story_id", "keyword"], ["keyword"], "story_id"),
+    # 專題
+    "topic": TableDescriptor("topic", ["topic_id"], ["topic_title", "topic_short", "topic_long", "report"], "topic_id"),
+    "topic_branch": TableDescriptor("topic_branch", ["topic_branch_id", "topic_id"], ["topic_branch_title", "topic_branch_content"], "topic_id"),
+    "pro_analyze_topic": TableDescriptor("pro_analyze_topic", ["analyze_id"], ["analyze"], "topic_id", analyze_segments, analyze_update),
+}
+
+STORY_TABLES = ["single_news", "relative_news", "relative_topics", "term", "position", "pro_analyze", "generated_image", "keywords_map"]
+TOPIC_TABLES = ["topic", "topic_branch", "pro_analyze_topic"]
+
+class TranslationEngine:
+    def __init__(self, supabase, gemini_client, lang_list=None, max_workers=TRANSLATE_WORKERS):
+        self.supabase = supabase
+        self.gemini_client = gemini_client
+        self.lang_list = lang_list or ["en","id","jp"]
+        self.max_workers = max(1, max_workers)
+        self.memory = TranslationMemory(supabase)
+
+    def execute_with_retry(self, query, max_retries=3, initial_delay=1):
+        """Execute a Supabase query with retry logic"""
+        for attempt in range(max_retries):
+            try:
+                return query.execute()
+            except postgrest.exceptions.APIError as e:
+                if attempt == max_retries - 1:  # Last attempt
+                    raise  # Re-raise the last error if all retries failed
+                delay = initial_delay * (2 ** attempt)  # Exponential backoff
+                print(f"API Error occurred. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
+                time.sleep(delay)
+        return None  # This will only be reached if all retries fail
+        
+    def callgemini(self, prompt,config):
+        try:
+            response = self.gemini_client.models.generate_content(
+                model="gemini-2.5-flash-lite",
+                contents=prompt,
+                config=config
+            )
+            return response.text
+        except Exception as e:
+            print(f"翻譯時發生錯誤: {e}")
+            return None
+    
+    # ===== 批次翻譯 =====
+    def map_concurrent(self, func, items):
+        """以有上限的執行緒池同時執行 func(item)，依 items 順序回傳結果"""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers == 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(func, items))
+
+    def translate_chunk(self, lang, chunk):
+        """以一次結構化請求翻譯一組段落 [(segment_id, 原文)]，回傳 {segment_id: 譯文}"""
+        lang_name = LANG_NAMES[lang]
+        config = types.GenerateContentConfig(
+            system_instruction=f"你是一個專業的翻譯專家，請將提供的每一段文字準確且流暢地翻譯成{lang_name}。請確保翻譯後的文本符合{lang_name}語法和用詞習慣，並保持原文的意思和風格，務必保持分段。每一段都要翻譯，並原樣保留該段的 id。",
+            response_mime_type="application/json",
+            response_schema=BatchTranslationResponse
+        )
+        prompt = f"請將以下 JSON 中每個 text 翻譯成{lang_name}，依 id 回傳:\n" + json.dumps(
+            [{"id": seg_id, "text": text} for seg_id, text in chunk], ensure_ascii=False)
+        response_text = self.callgemini(prompt, config)
+        if response_text is None:
+            print(f"{lang} 批次翻譯失敗（{len(chunk)} 段）")
+            return {}
+        translated = {}
+        try:
+            expected = {seg_id for seg_id, _ in chunk}
+            for item in json.loads(response_text).get("segments", []):
+                if item.get("id") in expected and item.get("text"):
+                    translated[item["id"]] = item["text"]
+        except Exception as e:
+            print(f"解析 {lang} 批次翻譯結果時發生錯誤: {e}")
+        return translated
+
+    def translate_segments_by_lang(self, segments_by_lang):
+        """
+        同時翻譯多種語言的段落
+
+        Args:
+            segments_by_lang: {lang: [(segment_id, 原文)]}
+
+        Returns:
+            {lang: {segment_id: 譯文}}，失敗或缺漏的段落不在結果中
+        """
+        requests = [(lang, chunk) for lang, segments in segments_by_lang.items() for chunk in split_segments(segments)]
+        results = {lang: {} for lang in segments_by_lang}
+        # 所有 (語言, 分段) 請求互不相依，經由同一個有上限的執行緒池同時送出
+        for (lang, _), translated in zip(requests, self.map_concurrent(lambda request: self.translate_chunk(*request), requests)):
+            results[lang].update(translated)
+        return results
+
+    def translate_segments(self, lang, segments):
+        """以批次請求翻譯單一語言的多段文字，回傳 {segment_id: 譯文}"""
+        return self.translate_segments_by_lang({lang: segments})[lang]
+
+    def translate_texts_by_lang(self, texts_by_lang):
+        """
+        翻譯多種語言的文字，回傳 {lang: {原文: 譯文}}（缺漏的不在結果中）
+
+        相同原文只送出一次；短字串先查翻譯記憶，新翻譯的短字串再寫回翻譯記憶。
+        缺漏的段落會再以較小的請求補翻一次。
+        """
+        translated = {}
+        segments_by_lang = {}
+        for lang, texts in texts_by_lang.items():
+            texts = list(dict.fromkeys(text for text in texts if text))
+            short_texts = [text for text in texts if len(text) <= MEMORY_MAX_CHARS]
+            translated[lang] = self.memory.lookup(short_texts, lang) if short_texts else {}
+            if translated[lang]:
+                print(f"{lang}: 翻譯記憶命中 {len(translated[lang])} 段")
+            pending = [text for text in texts if text not in translated[lang]]
+            segments_by_lang[lang] = [(f"s{i}", text) for i, text in enumerate(pending)]
+
+        by_id = self.translate_segments_by_lang(segments_by_lang)
+        missing = {lang: [(seg_id, text) for seg_id, text in segments if seg_id not in by_id[lang]]
+                   for lang, segments in segments_by_lang.items()}
+        missing = {lang: segments for lang, segments in missing.items() if segments}
+        if missing:
+            for lang, segments in missing.items():
+                print(f"{lang}: {len(segments)} 段文字缺漏，重新請求")
+            for lang, retried in self.translate_segments_by_lang(missing).items():
+                by_id[lang].update(retried)
+
+        for lang, segments in segments_by_lang.items():
+            new_pairs = [(text, by_id[lang][seg_id]) for seg_id, text in segments if seg_id in by_id[lang]]
+            translated[lang].update(new_pairs)
+            self.memory.add([(text, t) for text, t in new_pairs if len(text) <= MEMORY_MAX_CHARS], lang)
+        return translated
+
+    def translate_texts(self, lang, texts):
+        """翻譯單一語言的一批文字，回傳 {原文: 譯文}"""
+        return self.translate_texts_by_lang({lang: texts})[lang]
+
+    def run_jobs(self, jobs_by_lang):
+        """
+        執行翻譯工作：所有語言的段落同時以批次請求翻譯，再把同一 (table, row) 各語言的結果合併成一次 update。
+        仍缺漏譯文的語言不寫入（維持空值，下次執行再處理）。
+        """
+        texts_by_lang = {lang: [text for job in jobs for text in job.segments.values() if text]
+                         for lang, jobs in jobs_by_lang.items() if jobs}
+        if not texts_by_lang:
+            return
+        for lang, texts in texts_by_lang.items():
+            print(f"{lang}: {len(jobs_by_lang[lang])} 筆資料、{len(texts)} 段文字待翻譯")
+        translated = self.translate_texts_by_lang(texts_by_lang)
+
+        updates = {}
+        for lang, jobs in jobs_by_lang.items():
+            for job in jobs:
+                result = {name: (translated[lang].get(text) if text else "") for name, text in job.segments.items()}
+                if any(value is None for value in result.values()):
+                    print(f"{job.label} 的{lang}翻譯不完整，跳過更新")
+                    continue
+                key = (job.table, tuple(job.match.items()))
+                if key not in updates:
+                    updates[key] = (job, {}, [])
+                updates[key][1].update(job.build_update(lang, result))
+                updates[key][2].append(lang)
+
+        for job, update_data, langs in updates.values():
+            try:
+                query = self.supabase.table(job.table).update(update_data)
+                for column, value in job.match.items():
+                    query = query.eq(column, value)
+                self.execute_with_retry(query)
+                print(f"翻譯成功，已更新{job.label}的 {'/'.join(langs)} {job.table}資料")
+            except Exception as e:
+                print(f"更新翻譯後的{job.table}資料時發生錯誤: {e}")
+
+    def select_in(self, table, columns, column, values, chunk_size=200):
+        """依 column in values 分段讀取資料"""
+        rows = []
+        values = list(dict.fromkeys(v for v in values if v))
+        for i in range(0, len(values), chunk_size):
+            query = self.supabase.table(table).select(columns).in_(column, values[i:i + chunk_size])
+            rows.extend(self.execute_with_retry(query).data or [])
+        return rows
+
+    def fetch_debt(self, descriptor, ids=None, batch_size=1000):
+        """
+        翻譯債查詢：只讀取任一目標語言欄位仍為 null 的資料列（以及判斷所需的欄位）
+
+        Args:
+            descriptor: 資料表描述
+            ids: 只查詢 scope 在 ids 中的資料（經 scope_via 對照），None 表示整張表
+        """
+        select = descriptor.select_columns(self.lang_list)
+        debt_filter = ",".join(f"{column}.is.null" for column in descriptor.target_columns(self.lang_list))
+
+        def build():
+            return self.supabase.table(descriptor.table).select(select).or_(debt_filter)
+
+        if ids is not None:
+            if descriptor.scope_via:
+                via_table, via_column = descriptor.scope_via
+                ids = [row.get(descriptor.scope_column) for row in self.select_in(via_table, descriptor.scope_column, via_column, ids)]
+            rows = []
+            ids = list(dict.fromkeys(v for v in ids if v))
+            for i in range(0, len(ids), 200):
+                rows.extend(self.execute_with_retry(build().in_(descriptor.scope_column, ids[i:i + 200])).data or [])
+            return rows
+
+        # 收集完才會寫回，分頁期間結果集不變
+        rows = []
+        start = 0
+        while True:
+            temp = self.execute_with_retry(build().range(start, start + batch_size - 1)).data
+            if not temp:
+                break
+            rows.extend(temp)
+            start += batch_size
+        return rows
+
+    def collect_jobs(self, tables, ids=None):
+        """收集 tables 中待翻譯的欄位，回傳 {lang: [RowJob]}"""
+        jobs = {lang: [] for lang in self.lang_list}
+        for table in tables:
+            descriptor = REGISTRY[table]
+            try:
+                rows = self.fetch_debt(descriptor, ids)
+            except Exception as e:
+                print(f"取得{table}資料時發生錯誤: {e}")
+                continue
+            for lang, table_jobs in descriptor.jobs_for(rows, self.lang_list).items():
+                jobs[lang].extend(table_jobs)
+        return jobs
+
+    def translate_rows(self, tables, ids):
+        """翻譯指定 id（story_id / topic_id）在 tables 中的待翻譯欄位"""
+        self.run_jobs(self.collect_jobs(tables, ids))
+
+    def translate_debt(self, tables, job_batch_size=JOB_BATCH_SIZE):
+        """只處理翻譯債：以 job_batch_size 筆資料列為一批，所有語言同時翻譯後寫回"""
+        jobs_by_lang = self.collect_jobs(tables)
+        for lang, jobs in jobs_by_lang.items():
+            print(f"{lang}: 翻譯債共 {len(jobs)} 筆資料")
+        # 依資料列分批（同一列的各語言工作在同一批，才能合併成一次 update）
+        rows = list(dict.fromkeys((job.table, tuple(job.match.items())) for jobs in jobs_by_lang.values() for job in jobs))
+        for start in range(0, len(rows), job_batch_size):
+            batch = set(rows[start:start + job_batch_size])
+            self.run_jobs({
+                lang: [job for job in jobs if (job.table, tuple(job.match.items())) in batch]
+                for lang, jobs in jobs_by_lang.items()
+            })
+
+    def translate_mindmap_debt(self, batch_size=1000):
+        """翻譯所有仍有 mind_map_detail_{lang}_lang 為 null 的專題心智圖"""
+        debt_filter = ",".join(f"mind_map_detail_{lang}_lang.is.null" for lang in self.lang_list)
+        topic_ids = []
+        start = 0
+        while True:
+            query = (self.supabase.table("topic").select("topic_id").not_.is_("mind_map_detail", "null")
+                     .or_(debt_filter).range(start, start + batch_size - 1))
+            temp = self.execute_with_retry(query).data
+            if not temp:
+                break
+            topic_ids.extend(item.get("topic_id") for item in temp)
+            start += batch_size
+        print(f"共有 {len(topic_ids)} 個專題心智圖待翻譯")
+        for topic_id in topic_ids:
+            self.translate_mindmap(topic_id)
+
+    # ===== 心智圖 =====
+    def request_mindmap_tree(self, mind_map_detail, lang_name):
+        """整棵心智圖一次翻譯，回傳 {位置: {"label", "description"}}（只包含 id 對得上且不為空的節點）"""
+        source = {
+            "center_node": mind_map_detail.get("center_node", {}),
+            "main_nodes": mind_map_detail.get("main_nodes", []),
+            "detailed_nodes": [{"key": key, "nodes": nodes} for key, nodes in (mind_map_detail.get("detailed_nodes", {}) or {}).items()],
+        }
+        prompt = f"請將以下心智圖所有節點的標籤和描述翻譯成{lang_name}，保持相同的結構、key 與每個節點的 id:\n{json.dumps(source, ensure_ascii=False)}\n"
+        config = types.GenerateContentConfig(
+            system_instruction=f"你是一個專業的翻譯專家，請將提供的心智圖中心節點、主要節點與詳細節點的標籤和描述準確且流暢地翻譯成{lang_name}。請確保翻譯後的文本符合{lang_name}語法和用詞習慣，並保持原文的意思和風格。不要新增、刪除或改動任何節點的 id。",
+            response_mime_type="application/json",
+            response_schema=MindMapTreeResponse
+        )
+        response_text = self.callgemini(prompt, config)
+        if response_text is None:
+            return {}
+        try:
+            data = json.loads(response_text)
+            translated_tree = {
+                "center_node": data.get("center_node", {}),
+                "main_nodes": data.get("main_nodes", []),
+                "detailed_nodes": {group.get("key"): group.get("nodes", []) for group in data.get("detailed_nodes", [])},
+            }
+        except Exception as e:
+            print(f"解析心智圖翻譯結果時發生錯誤: {e}")
+            return {}
+
+        # 依位置對齊，並確認節點 id 與原文一致
+        translated = {slot: node for slot, node in mind_map_node_slots(translated_tree)}
+        aligned = {}
+        for slot, node in mind_map_node_slots(mind_map_detail):
+            candidate = translated.get(slot) or {}
+            if candidate.get("id") == node.get("id") and candidate.get("label") and candidate.get("description"):
+                aligned[slot] = candidate
+        return aligned
+
+    def request_mindmap_nodes(self, nodes, lang_name):
+        """只翻譯指定的節點，回傳 {節點 id: {"label", "description"}}"""
+        source = [{"id": node.get("id", ""), "label": node.get("label", ""), "description": node.get("description", "")} for node in nodes]
+        prompt = f"請將以下心智圖節點的標籤和描述翻譯成{lang_name}，保留每個節點的 id:\n{json.dumps(source, ensure_ascii=False)}\n"
+        config = types.GenerateContentConfig(
+            system_instruction=f"你是一個專業的翻譯專家，請將提供的心智圖節點的標籤和描述準確且流暢地翻譯成{lang_name}。請確保翻譯後的文本符合{lang_name}語法和用詞習慣，並保持原文的意思和風格。",
+            response_mime_type="application/json",
+            response_schema=MindMapNodesResponse
+        )
+        response_text = self.callgemini(prompt, config)
+        if response_text is None:
+            return {}
+        try:
+            return {node["id"]: node for node in json.loads(response_text).get("nodes", [])
+                    if node.get("id") and node.get("label") and node.get("description")}
+        except Exception as e:
+            print(f"解析心智圖節點翻譯結果時發生錯誤: {e}")
+            return {}
+
+    def translate_mindmap(self, topic_id):
+        """每種語言以一次結構化請求翻譯整棵心智圖，只對缺漏或空白的節點重新請求"""
+        try:
+            columns = ",".join(["mind_map_detail"] + [f"mind_map_detail_{lang}_lang" for lang in self.lang_list])
+            response = self.supabase.table("topic").select(columns).eq("topic_id", topic_id).execute().data
+        except Exception as e:
+            print(f"取得topic資料時發生錯誤: {e}")
+            return None
+        
+        if not response:
+            print(f"未找到id '{topic_id}' 的topic資料")
+            return None
+        
+        mind_map_detail = response[0].get("mind_map_detail") or {}
+        slots = mind_map_node_slots(mind_map_detail)
+        if not mind_map_detail or not slots[0][1]:
+            print(f"topic_id '{topic_id}' 沒有 mind_map_detail 資料")
+            return None
+
+        pending_langs = []
+        for lang in self.lang_list:
+            if mind_map_translated(response[0].get(f"mind_map_detail_{lang}_lang"), mind_map_detail):
+                print(f"topic_id '{topic_id}' 的{lang} mind_map_detail資料已存在，跳過翻譯")
+            else:
+                pending_langs.append(lang)
+
+        # 各語言同時請求，完成的語言合併成一次 update
+        results = self.map_concurrent(lambda lang: self.translate_mindmap_lang(topic_id, mind_map_detail, slots, lang), pending_langs)
+        update_data = {f"mind_map_detail_{lang}_lang": result for lang, result in zip(pending_langs, results) if result is not None}
+        if not update_data:
+            return None
+        try:
+            self.supabase.table("topic").update(update_data).eq("topic_id", topic_id).execute()
+            print(f"翻譯成功，已更新topic_id '{topic_id}' 的{'、'.join(update_data)}資料")
+        except Exception as e:
+            print(f"更新mind_map_detail資料時發生錯誤: {e}")
+            return None
+
+    def translate_mindmap_lang(self, topic_id, mind_map_detail, slots, lang):
+        """翻譯單一語言的心智圖，回傳翻譯後的 mind_map_detail；仍有節點未翻譯時回傳 None"""
+        lang_name = LANG_NAMES[lang]
+        translated = self.request_mindmap_tree(mind_map_detail, lang_name)
+
+        missing = [(slot, node) for slot, node in slots if slot not in translated]
+        if missing:
+            print(f"topic_id '{topic_id}' 的{lang} mind_map_detail 有 {len(missing)} 個節點缺漏或為空，重新請求")
+            retried = self.request_mindmap_nodes([node for _, node in missing], lang_name)
+            for slot, node in missing:
+                if node.get("id") in retried:
+                    translated[slot] = retried[node["id"]]
+            missing = [(slot, node) for slot, node in slots if slot not in translated]
+        if missing:
+            print(f"topic_id '{topic_id}' 的{lang} mind_map_detail 仍有 {len(missing)} 個節點未翻譯，跳過更新")
+            return None
+
+        def build_node(slot, node):
+            return {'id': node.get("id", ""), 'label': translated[slot]["label"], 'description': translated[slot]["description"]}
+
+        return {
+            'center_node': build_node(("center",), mind_map_detail.get("center_node", {})),
+            'main_nodes': [build_node(("main", i), node) for i, node in enumerate(mind_map_detail.get("main_nodes", []) or [])],
+            'detailed_nodes': {
+                key: [build_node(("detailed", key, i), node) for i, node in enumerate(nodes)]
+                for key, nodes in (mind_map_detail.get("detailed_nodes", {}) or {}).items()
+            },
+        }
@@ -0,0 +1,264 @@
+"""
+向量相似度檢索：以 embedding 為新聞、專題等文字建立 top-k 候選索引
+
+  embed_texts      - 以 google-genai 取得文字 embedding（經由 embedding_store 快取，只 embed 新文字）
+  normalize_rows   - 將向量矩陣逐列正規化（0 向量保持為 0）
+  VectorIndex      - 已正規化矩陣上的 top-k 餘弦相似度查詢（可依條件遮罩候選）
+  KeywordIndex     - 以中文二字詞與英數詞建立的倒排索引（IDF 加權的詞彙比對）
+  fuse_rankings    - 以 reciprocal rank fusion 合併多個排序結果
+  agglomerative_clusters - 平均連結的凝聚式分群（指定群數上限與合併門檻）
+
+資料量為數萬筆以內，直接以矩陣乘法加 argpartition 做精確 top-k，
+不需額外的 ANN 套件；呼叫端只把 top-k 候選交給 LLM 做最終判斷。
+
+用法（子目錄腳本）:
+  sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+  from vector_index import VectorIndex, embed_texts
+"""
+
+import math
+import re
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-004"
+DEFAULT_TASK_TYPE = "SEMANTIC_SIMILARITY"
+EMBED_BATCH_SIZE = 100  # 單次 embed_content 請求的文字上限
+
+_stores: Dict[Tuple[str, str], EmbeddingStore] = {}
+
+
+def _get_store(model: str, task_type: str) -> EmbeddingStore:
+    key = (model, task_type)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(model, task_type)
+    return _stores[key]
+
+
+def embed_texts(client, texts: Sequence[str], model: str = DEFAULT_EMBEDDING_MODEL,
+                task_type: str = DEFAULT_TASK_TYPE, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """
+    取得文字的正規化 embedding 矩陣，只對本地儲存庫中沒有的文字呼叫 API
+
+    Args:
+        client: google-genai Client（各目錄 env.py 中的 gemini_client）
+        texts: 要 embed 的文字
+        model: embedding 模型名稱
+        task_type: embedding task_type
+        batch_size: 每次請求的文字數
+
+    Returns:
+        (len(texts), d) 的 float32 矩陣；空白文字或 embed 失敗的列為 0 向量
+    """
+    from google.genai import types
+
+    def _embed(missing: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for i in range(0, len(missing), batch_size):
+            chunk = missing[i:i + batch_size]
+            try:
+                response = client.models.embed_content(
+                    model=model,
+                    contents=chunk,
+                    config=types.EmbedContentConfig(task_type=task_type),
+                )
+                vectors.extend(e.values or [] for e in response.embeddings)
+            except Exception as e:
+                print(f"[warn] 批次取得 Embedding 失敗（{len(chunk)} 筆）: {e}")
+                vectors.extend([] for _ in chunk)
+        return vectors
+
+    store = _get_store(model, task_type)
+    non_empty = [t for t in texts if t and t.strip()]
+    found = dict(zip(non_empty, store.get_or_embed(non_empty, _embed))) if non_empty else {}
+
+    dim = store.dim or 0
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        vector = found.get(text)
+        if vector is not None:
+            matrix[i] = vector
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """逐列正規化為單位向量（原地修改 float32 矩陣），0 向量保持為 0"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class VectorIndex:
+    """已正規化向量上的 top-k 餘弦相似度索引"""
+
+    def __init__(self, ids: Sequence[str], matrix: np.ndarray):
+        """
+        Args:
+            ids: 與 matrix 每列對齊的項目 id
+            matrix: (n, d) 向量矩陣（會再正規化一次）
+        """
+        if len(ids) != len(matrix):
+            raise ValueError(f"ids 數量 ({len(ids)}) 與向量數量 ({len(matrix)}) 不符")
+        self.ids = list(ids)
+        self.matrix = normalize_rows(matrix)
+        self.position = {item_id: i for i, item_id in enumerate(self.ids)}
+        # 0 向量（embed 失敗）永遠不作為候選
+        self.valid = np.linalg.norm(self.matrix, axis=1) > 0 if self.matrix.size else np.zeros(len(self.ids), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def vector(self, item_id: str) -> Optional[np.ndarray]:
+        """取得索引中項目的向量，不存在或為 0 向量時回傳 None"""
+        i = self.position.get(item_id)
+        if i is None or not self.valid[i]:
+            return None
+        return self.matrix[i]
+
+    def search(self, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+               exclude: Sequence[str] = ()) -> List[Tuple[str, float]]:
+        """
+        查詢與 query 最相似的 k 個項目
+
+        Args:
+            query: 查詢向量 (d,)，不需事先正規化
+            k: 回傳數量上限
+            mask: 與 ids 對齊的布林陣列，只有 True 的項目可作為候選
+            exclude: 要排除的 id（例如查詢本身）
+
+        Returns:
+            [(id, 相似度), ...]，依相似度由高到低排列
+        """
+        if k <= 0 or not len(self.ids) or query is None:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self.matrix.shape[1]:
+            return []
+
+        allowed = self.valid.copy()
+        if mask is not None:
+            allowed &= mask
+        for item_id in exclude:
+            i = self.position.get(item_id)
+            if i is not None:
+                allowed[i] = False
+        candidates = np.flatnonzero(allowed)
+        if candidates.size == 0:
+            return []
+
+        scores = self.matrix[candidates] @ (query / norm)
+        if candidates.size > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in top]
+
+    def search_item(self, item_id: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """以索引中既有項目為查詢（自動排除自己）"""
+        return self.search(self.vector(item_id), k, mask=mask, exclude=(item_id,))
+
+    def mask_where(self, predicate: Callable[[str], bool]) -> np.ndarray:
+        """依 id 條件建立候選遮罩"""
+        return np.fromiter((predicate(item_id) for item_id in self.ids), dtype=bool, count=len(self.ids))
+
+
+_CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+_WORD = re.compile(r"[a-z0-9]+(?:[.'-][a-z0-9]+)*")
+
+
+def lexical_tokens(text: str) -> set:
+    """將文字切成詞彙集合：中文取相鄰二字（單字詞保留單字），英數取完整單字"""
+    text = (text or "").lower()
+    tokens = set(_WORD.findall(text))
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class KeywordIndex:
+    """詞彙倒排索引：以查詢與文件共有詞彙的 IDF 總和計分"""
+
+    def __init__(self, ids: Sequence[str], texts: Sequence[str]):
+        self.ids = list(ids)
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for i, text in enumerate(texts):
+            for token in lexical_tokens(text):
+                self.postings[token].append(i)
+        n = max(len(self.ids), 1)
+        self.idf = {token: math.log(1 + n / len(docs)) for token, docs in self.postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, text: str, k: int, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """回傳與 text 共有詞彙分數最高的 k 個項目（沒有共同詞彙的項目不列入）"""
+        scores: Dict[int, float] = defaultdict(float)
+        for token in lexical_tokens(text):
+            for i in self.postings.get(token, ()):
+                scores[i] += self.idf[token]
+        excluded = set(exclude)
+        ranked = sorted(((self.ids[i], score) for i, score in scores.items() if self.ids[i] not in excluded),
+                        key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+
+def fuse_rankings(rankings: Sequence[Sequence[Tuple[str, float]]], limit: int, rrf_k: int = 60) -> List[str]:
+    """以 reciprocal rank fusion 合併多個 [(id, 分數)] 排序，回傳前 limit 個 id"""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, (item_id, _) in enumerate(ranking):
+            fused[item_id] += 1.0 / (rrf_k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:limit]
+
+
+def agglomerative_clusters(matrix: np.ndarray, max_clusters: int, min_clusters: int = 1,
+                           merge_threshold: float = 1.0) -> List[List[int]]:
+    """
+    以餘弦相似度做平均連結（average linkage）的凝聚式分群，結果可重現（同分時取較小的 index）
+
+    先合併到 max_clusters 群以內；之後只要最相近兩群的平均相似度仍 ≥ merge_threshold 就繼續合併，
+    但不少於 min_clusters 群。
+
+    Returns:
+        [[列 index, ...], ...]，依群大小由大到小排列（同大小依最小 index）
+    """
+    matrix = normalize_rows(np.array(matrix, dtype=np.float32))
+    n = len(matrix)
+    if n == 0:
+        return []
+    clusters = [[i] for i in range(n)]
+    sizes = np.ones(n)
+    sim = (matrix @ matrix.T).astype(np.float64)
+    np.fill_diagonal(sim, -np.inf)
+
+    count = n
+    while count > max(min_clusters, 1):
+        a, b = divmod(int(np.argmax(sim)), n)
+        if count <= max_clusters and sim[a, b] < merge_threshold:
+            break
+        a, b = min(a, b), max(a, b)
+        # Lance–Williams 更新：合併後與其他群的平均相似度
+        merged = (sizes[a] * sim[a] + sizes[b] * sim[b]) / (sizes[a] + sizes[b])
+        sim[a], sim[:, a] = merged, merged
+        sim[a, a] = -np.inf
+        sim[b], sim[:, b] = -np.inf, -np.inf
+        sizes[a] += sizes[b]
+        clusters[a].extend(clusters[b])
+        clusters[b] = []
+        count -= 1
+
+    result = [sorted(cluster) for cluster in clusters if cluster]
+    result.sort(key=lambda cluster: (-len(cluster), cluster[0]))
+    return result